@@ -5,9 +5,15 @@ MUED Snowflake AI App API Package
 from api.main import app
 from api.models import (
     ArticleRecommendation,
+    BatchRecommendationRequest,
+    CacheStatsResponse,
     HealthResponse,
+    LivenessResponse,
+    PoolStatsResponse,
     RecommendationRequest,
     RecommendationResponse,
+    RelatedArticlesResponse,
+    SearchMode,
 )
 
 __version__ = "1.0.0"
@@ -15,6 +21,12 @@ __all__ = [
     "app",
     "ArticleRecommendation",
     "RecommendationRequest",
+    "BatchRecommendationRequest",
     "RecommendationResponse",
     "HealthResponse",
+    "LivenessResponse",
+    "CacheStatsResponse",
+    "PoolStatsResponse",
+    "RelatedArticlesResponse",
+    "SearchMode",
 ]
@@ -0,0 +1,101 @@
+"""
+Snowflake呼び出し用のサーキットブレーカー
+連続して失敗（エラーまたはレイテンシ予算超過）したら一定時間呼び出しを止め、
+その後1回だけ試行して回復を確認する
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+# 連続失敗がこの回数に達したらブレーカーを開く
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# 開いてから試行を再開するまでの秒数
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """closed → open → half_open → closed の状態を持つスレッドセーフなブレーカー"""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """現在の状態（closed / open / half_open）"""
+        with self._lock:
+            if (
+                self._state == OPEN
+                and self._clock() - self._opened_at >= self.reset_seconds
+            ):
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        呼び出してよいか
+
+        open の間は False を返します。reset_seconds 経過後は1回だけ試行を許可し
+        （half_open）、その結果で closed に戻るか再び open になります。
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if (
+                not self._trial_in_progress
+                and self._clock() - self._opened_at >= self.reset_seconds
+            ):
+                self._state = HALF_OPEN
+                self._trial_in_progress = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """成功を記録（half_open なら closed に戻る）"""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        """失敗を記録（閾値に達するか試行が失敗したら open にする）"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opens += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._trial_in_progress = False
+
+    def stats(self) -> dict[str, Any]:
+        """状態（0: closed, 1: open, 2: half_open）と開いた回数を返す"""
+        state = self.state
+        with self._lock:
+            return {
+                "state": {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}[state],
+                "consecutive_failures": self._failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,54 @@
+"""
+Snowflake呼び出し用の専用スレッドプール
+ブロッキングなSnowpark呼び出しをイベントループ外で実行し、同時実行数を制限する
+"""
+
+import asyncio
+import functools
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, TypeVar
+
+T = TypeVar("T")
+
+# ウェアハウスへの同時クエリ数の上限
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """スレッドプールを取得（未作成または停止済みなら作成）"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="snowflake"
+        )
+    return _executor
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    ブロッキングな関数をSnowflake用スレッドプールで実行
+
+    Args:
+        func: 実行する関数（Snowparkのクエリを発行するもの）
+        *args: 位置引数
+        **kwargs: キーワード引数
+
+    Returns:
+        関数の戻り値
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_executor() -> None:
+    """実行中のクエリを待たずにスレッドプールを停止"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
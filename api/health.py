@@ -0,0 +1,202 @@
+"""
+Snowflake接続のバックグラウンド・ヘルスプローブ
+一定間隔で SELECT 1 を送って結果を保持し、ヘルスチェックは保持した状態だけで答える
+（ロードバランサーのプローブごとにクエリを発行しない）
+プローブはセッションプールとDB用スレッドを使わず、専用のスレッドとセッションで送る
+（負荷でプールが埋まっていても readiness が落ちない）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+# プローブの間隔とタイムアウト
+HEALTH_PROBE_SECONDS = float(os.getenv("HEALTH_PROBE_SECONDS", "15"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+# 最後の成功からこの時間が経つと ready でなくなる（デフォルトはプローブ3回分）
+HEALTH_PROBE_STALE_SECONDS = float(
+    os.getenv("HEALTH_PROBE_STALE_SECONDS", str(HEALTH_PROBE_SECONDS * 3))
+)
+
+
+class HealthProber:
+    """
+    最後のプローブの結果を保持し、liveness / readiness を答える
+
+    readiness は起動時のウォームアップ完了（mark_warm）と最近のプローブ成功の両方が必要です。
+    """
+
+    def __init__(
+        self,
+        stale_seconds: float = HEALTH_PROBE_STALE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._session_factory = session_factory
+        self._session: Optional[Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Optional[Future] = None
+        self._started_at = clock()
+        self._lock = threading.Lock()
+        self._ok = False
+        self._warm = False
+        self._last_probe_at: Optional[float] = None
+        self._last_success_at: Optional[float] = None
+        self._last_latency: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self.probes = 0
+        self.failures = 0
+        self.warmup_seconds: Optional[float] = None
+
+    def probe(self, session: Session) -> bool:
+        """
+        SELECT 1 で接続を確認して結果を記録
+
+        Returns:
+            成功した場合はTrue
+        """
+        start = self._clock()
+        try:
+            session.sql("SELECT 1").collect()
+        except Exception as e:
+            self.record_failure(str(e), self._clock() - start)
+            return False
+        self.record_success(self._clock() - start)
+        return True
+
+    async def probe_dedicated(
+        self, timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS
+    ) -> bool:
+        """
+        専用スレッドと専用セッションでプローブ（タイムアウトは失敗として記録）
+
+        Returns:
+            成功した場合はTrue
+        """
+        if self._inflight is not None and not self._inflight.done():
+            # 前回のプローブがまだ応答を待っている
+            self.record_failure("前回のプローブが完了していません")
+            return False
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="health-probe"
+            )
+        self._inflight = self._executor.submit(self._probe_own_session)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._inflight), timeout)
+        except asyncio.TimeoutError:
+            self.record_failure("プローブがタイムアウトしました", timeout)
+            return False
+
+    def _probe_own_session(self) -> bool:
+        if self._session is None:
+            try:
+                self._session = self._session_factory()
+            except Exception as e:
+                self.record_failure(str(e))
+                return False
+        if self.probe(self._session):
+            return True
+        # 切れたセッションは閉じて次回つなぎ直す
+        self._close_session()
+        return False
+
+    def _close_session(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """専用スレッドを止めて専用セッションを閉じる"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._close_session()
+
+    def mark_warm(self) -> None:
+        """起動時のウォームアップが完了したことを記録"""
+        with self._lock:
+            self._warm = True
+            self.warmup_seconds = self._clock() - self._started_at
+
+    def record_success(self, latency: float) -> None:
+        """成功したプローブを記録"""
+        with self._lock:
+            now = self._clock()
+            self._ok = True
+            self._last_probe_at = now
+            self._last_success_at = now
+            self._last_latency = latency
+            self._last_error = None
+            self.probes += 1
+
+    def record_failure(self, error: str, latency: Optional[float] = None) -> None:
+        """失敗（タイムアウトを含む）したプローブを記録"""
+        with self._lock:
+            self._ok = False
+            self._last_probe_at = self._clock()
+            self._last_latency = latency
+            self._last_error = error
+            self.probes += 1
+            self.failures += 1
+
+    @property
+    def ready(self) -> bool:
+        """最後のプローブが成功し、その結果が古すぎないか"""
+        with self._lock:
+            return self._is_ready(self._clock())
+
+    def snapshot(self) -> dict[str, Any]:
+        """保持している状態を返す（クエリは発行しない）"""
+        with self._lock:
+            now = self._clock()
+            return {
+                "ready": self._is_ready(now),
+                "warm": self._warm,
+                "database_connected": self._ok,
+                "uptime_seconds": now - self._started_at,
+                "last_probe_latency_ms": (
+                    self._last_latency * 1000
+                    if self._last_latency is not None
+                    else None
+                ),
+                "last_probe_age_seconds": (
+                    now - self._last_probe_at
+                    if self._last_probe_at is not None
+                    else None
+                ),
+                "last_error": self._last_error,
+            }
+
+    def stats(self) -> dict[str, Any]:
+        """メトリクス用の数値の統計"""
+        snapshot = self.snapshot()
+        return {
+            "ready": int(snapshot["ready"]),
+            "last_probe_latency_ms": snapshot["last_probe_latency_ms"] or 0.0,
+            "warmup_seconds": self.warmup_seconds or 0.0,
+            "probes": self.probes,
+            "probe_failures": self.failures,
+        }
+
+    def _is_ready(self, now: float) -> bool:
+        return (
+            self._warm
+            and self._ok
+            and self._last_success_at is not None
+            and now - self._last_success_at <= self.stale_seconds
+        )
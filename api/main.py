@@ -3,39 +3,333 @@ MUED Snowflake AI App 用 FastAPI アプリケーション
 記事推薦のためのREST APIを提供
 """
 
-from contextlib import asynccontextmanager
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from snowflake.snowpark import Session
-
-from api.models import ArticleRecommendation, HealthResponse, RecommendationResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from api.breaker import CircuitBreaker
+from api.executor import run_db, shutdown_executor
+from api.health import HEALTH_PROBE_SECONDS, HEALTH_PROBE_TIMEOUT_SECONDS, HealthProber
+from api.metrics import METRICS_QUERY_STATS_SECONDS, ApiMetrics, stats_lines
+from api.models import (
+    BatchRecommendationRequest,
+    CacheStatsResponse,
+    HealthResponse,
+    LivenessResponse,
+    PoolStatsResponse,
+    RecommendationResponse,
+    RelatedArticlesResponse,
+    SearchMode,
+)
+from api.pool import PoolTimeoutError, SessionPool
+from api.sampling import SAMPLER_REFRESH_SECONDS, ArticleSampler, load_eligible_posts
+from api.search import (
+    SEARCH_LATENCY_BUDGET_SECONDS,
+    USE_CORTEX,
+    hybrid_search,
+    lexical_search,
+    query_embedding_cache,
+    vector_search,
+)
+from api.serialization import (
+    dumps,
+    json_response,
+    lowercase_columns,
+    project_recommendations,
+    recommendation_payload,
+    records_from_arrow,
+)
+from api.singleflight import SingleFlight
+from src.cache import DataVersion, ResultCache, fetch_data_version
 from src.config import get_snowflake_session
+from src.queries import (
+    RANDOM_POSTS,
+    RELATED_ARTICLES,
+    STUDENT_RECOMMENDATIONS,
+    STUDENT_RECOMMENDATIONS_BATCH,
+    add_query_listener,
+    fetch_arrow,
+    remove_query_listener,
+)
+from src.replica import (
+    LOCAL_REPLICA,
+    LOCAL_REPLICA_FOLLOW_SECONDS,
+    LOCAL_REPLICA_REFRESH_SECONDS,
+    LocalReplica,
+)
 
-# グローバルセッション変数
-snowflake_session: Optional[Session] = None
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+# uvicornがルートロガーを設定しない場合も起動・同期のログを出す
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# グローバルセッションプール
+session_pool: Optional[SessionPool] = None
+
+# 検索結果キャッシュ（BLOG_POSTSのMAX(updated_at)が変わると無効化）
+result_cache = ResultCache()
+data_version = DataVersion()
+
+# 同じ (mode, query, limit) の同時検索を1回の実行に合流させる
+search_flight = SingleFlight()
+
+# 検索の失敗・予算超過が続いたらSnowflakeへの検索を止めるブレーカー
+search_breaker = CircuitBreaker()
+
+# 事前計算済みの推薦の読み込みが失敗し続けたら問い合わせを止めるブレーカー
+# （開いている間はクエリなしの /recommend をサンプリングプールから返す）
+student_recs_breaker = CircuitBreaker()
+
+# BLOG_POSTSのローカルレプリカ（LOCAL_REPLICA=true のとき）
+local_replica = LocalReplica() if LOCAL_REPLICA else None
+
+# ランダム推薦用のサンプリングプール（レプリカがあればそこから読み込む）
+# 公開役の世代をまだ受け取っていないワーカーはSQLで読み込む
+article_sampler = (
+    ArticleSampler(
+        load=lambda session: (
+            local_replica.eligible_posts()
+            if local_replica.ready
+            else load_eligible_posts(session)
+        ),
+        fetch_version=lambda session: (
+            local_replica.version
+            if local_replica.ready
+            else fetch_data_version(session)
+        ),
+    )
+    if local_replica
+    else ArticleSampler()
+)
+
+# Snowflake接続のヘルスプローブ（/health はこの結果だけで答える）
+health_prober = HealthProber(session_factory=get_snowflake_session)
+
+# レイテンシ・クエリ・キャッシュ・プールのメトリクス（/metrics）
+metrics = ApiMetrics()
+metrics.add_collector(
+    lambda: stats_lines(
+        "result_cache",
+        result_cache.stats(),
+        counters=("hits", "misses", "evictions", "invalidations", "stale_hits"),
+    )
+)
+metrics.add_collector(
+    lambda: stats_lines(
+        "query_embedding_cache",
+        query_embedding_cache.stats(),
+        counters=("hits", "table_hits", "misses", "evictions"),
+    )
+)
+metrics.add_collector(
+    lambda: stats_lines(
+        "search_singleflight",
+        search_flight.stats(),
+        counters=("calls", "coalesced"),
+    )
+)
+metrics.add_collector(
+    lambda: stats_lines(
+        "search_breaker",
+        search_breaker.stats(),
+        counters=("opens", "rejected"),
+    )
+)
+metrics.add_collector(
+    lambda: stats_lines(
+        "student_recs_breaker",
+        student_recs_breaker.stats(),
+        counters=("opens", "rejected"),
+    )
+)
+metrics.add_collector(
+    lambda: stats_lines(
+        "health", health_prober.stats(), counters=("probes", "probe_failures")
+    )
+)
+metrics.add_collector(
+    lambda: (
+        stats_lines(
+            "local_replica",
+            local_replica.sync_stats(),
+            counters=(
+                "syncs",
+                "full_reloads",
+                "rows_fetched",
+                "follows",
+                "compactions",
+            ),
+        )
+        if local_replica
+        else []
+    )
+)
+metrics.add_collector(
+    lambda: (
+        stats_lines(
+            "session_pool",
+            session_pool.stats(),
+            counters=(
+                "checkouts",
+                "waits",
+                "wait_ms_total",
+                "connects",
+                "reconnects",
+                "validation_failures",
+            ),
+        )
+        if session_pool
+        else []
+    )
+)
+
+
+async def warm_up() -> None:
+    """
+    セッションプールとサンプリングプールを裏で準備し、完了したら ready にする
+
+    Snowflakeに接続できるまで再試行し、その間もプロセスは起動して
+    /health/live に応答します（/health/ready は503のまま）。
+    ローカルレプリカは前回のスナップショットを先に読み込み、接続後に差分を同期します。
+    """
+    if local_replica:
+        try:
+            await run_db(local_replica.load)
+        except Exception as e:
+            logger.warning("Failed to load local replica: %s", e)
+
+    while True:
+        try:
+            await run_db(session_pool.open)
+            break
+        except Exception as e:
+            logger.warning("Failed to connect to Snowflake: %s", e)
+            await asyncio.sleep(HEALTH_PROBE_SECONDS)
+    logger.info("Connected to Snowflake")
+
+    # 複数ワーカーのときは公開役の1プロセスだけが同期し、他は共有メモリの世代を使う
+    if local_replica and local_replica.claim_publisher():
+        try:
+            await run_db(session_pool.run, local_replica.sync)
+        except Exception as e:
+            logger.warning("Failed to sync local replica: %s", e)
+
+    try:
+        await run_db(session_pool.run, article_sampler.refresh)
+    except Exception as e:
+        # 読み込めなくてもSQLのランダム抽出で応答できる（定期更新で再試行）
+        logger.warning("Failed to load random recommendation pool: %s", e)
+    health_prober.mark_warm()
+
+
+async def sync_replica_periodically() -> None:
+    """
+    ローカルレプリカに更新日時のウォーターマーク以降の変更を定期的に取り込む
+
+    公開役でないワーカーはSnowflakeに問い合わせず、公開役が共有メモリに出した
+    新しい世代に切り替えるだけです。
+    """
+    while True:
+        if not local_replica.claim_publisher():
+            await asyncio.sleep(LOCAL_REPLICA_FOLLOW_SECONDS)
+            try:
+                if await run_db(local_replica.follow):
+                    logger.info("Attached local replica %s", local_replica.generation)
+            except Exception as e:
+                logger.warning("Failed to attach local replica: %s", e)
+            continue
+
+        # 最初の同期は warm_up で行う
+        await asyncio.sleep(LOCAL_REPLICA_REFRESH_SECONDS)
+        try:
+            fetched = await run_db(session_pool.run, local_replica.sync)
+            logger.info("Synced local replica (%d rows fetched)", fetched)
+        except Exception as e:
+            logger.warning("Failed to sync local replica: %s", e)
+            continue
+        # 差分セグメントが増えたらスレッドで圧縮する（検索は古いセグメントで続く）
+        try:
+            if await run_db(local_replica.compact_if_due):
+                logger.info("Compacted local replica %s", local_replica.sync_stats())
+        except Exception as e:
+            logger.warning("Failed to compact local replica: %s", e)
+
+
+async def refresh_sampler_periodically() -> None:
+    """データバージョンを定期的に確認し、変わっていればサンプリングプールを更新"""
+    while True:
+        # 最初の読み込みは warm_up で行う
+        await asyncio.sleep(SAMPLER_REFRESH_SECONDS)
+        try:
+            if await run_db(session_pool.run, article_sampler.refresh):
+                logger.info("Refreshed random recommendation pool")
+        except Exception as e:
+            logger.warning("Failed to refresh random recommendation pool: %s", e)
+
+
+async def probe_health_periodically() -> None:
+    """Snowflake接続を定期的に確認し、結果をヘルスチェック用に保持"""
+    while True:
+        try:
+            # プールとDB用スレッドが埋まっていても専用のスレッドとセッションで確認する
+            await health_prober.probe_dedicated(HEALTH_PROBE_TIMEOUT_SECONDS)
+        except Exception as e:
+            health_prober.record_failure(str(e))
+        await asyncio.sleep(HEALTH_PROBE_SECONDS)
+
+
+async def collect_query_stats_periodically() -> None:
+    """記録したクエリのコンパイル/実行時間をクエリ履歴から定期的に取り込む"""
+    while True:
+        await asyncio.sleep(METRICS_QUERY_STATS_SECONDS)
+        try:
+            await run_db(session_pool.run, metrics.collect_query_stats)
+        except Exception as e:
+            logger.warning("Failed to collect query statistics: %s", e)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """アプリケーションのライフサイクルを管理"""
-    global snowflake_session
-    # 起動時の処理
-    try:
-        snowflake_session = get_snowflake_session()
-        print(" Connected to Snowflake")
-    except Exception as e:
-        print(f"L Failed to connect to Snowflake: {e}")
-        raise
+    global session_pool
+    # 起動時の処理（接続しないので即座にトラフィックを受けられる）
+    session_pool = SessionPool(factory=get_snowflake_session)
+
+    add_query_listener(metrics.observe_query)
+    background_tasks = [
+        asyncio.create_task(warm_up()),
+        asyncio.create_task(probe_health_periodically()),
+        asyncio.create_task(refresh_sampler_periodically()),
+        asyncio.create_task(collect_query_stats_periodically()),
+    ]
+    if local_replica:
+        background_tasks.append(asyncio.create_task(sync_replica_periodically()))
 
     yield
 
     # 終了時の処理
-    if snowflake_session:
-        snowflake_session.close()
-        print(" Closed Snowflake connection")
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    remove_query_listener(metrics.observe_query)
+    health_prober.close()
+    shutdown_executor()
+    if session_pool:
+        session_pool.close()
+        logger.info("Closed Snowflake connection")
 
 
 # FastAPIアプリケーションの作成
@@ -56,6 +350,23 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """エンドポイント（ルートのパステンプレート）ごとのレイテンシを記録"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        metrics.observe_request(
+            request.method, path, status, time.perf_counter() - start
+        )
+
+
 def get_random_recommendations(session: Session, limit: int = 5) -> list[dict]:
     """
     特定のクエリがない場合にランダムな推薦を取得
@@ -67,115 +378,252 @@ def get_random_recommendations(session: Session, limit: int = 5) -> list[dict]:
     Returns:
         推薦辞書のリスト
     """
-    sql = f"""
-    SELECT
-        id as article_id,
-        1.0 as score,
-        title,
-        summary,
-        url
-    FROM BLOG_POSTS
-    WHERE summary IS NOT NULL
-    ORDER BY RANDOM()
-    LIMIT {limit}
-    """
-
     try:
-        results = session.sql(sql).to_pandas()
-        return results.to_dict("records")
+        return records_from_arrow(fetch_arrow(session, RANDOM_POSTS, [limit]))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"データベースエラー: {str(e)}")
 
 
-# Cortexの利用可能性の設定
-USE_CORTEX = False  # TODO: SnowflakeアカウントでCortexが利用可能になったらTrueに設定
+def get_related_articles(session: Session, article_id: str, limit: int) -> list[dict]:
+    """
+    事前計算された関連記事を取得
+
+    Args:
+        session: Snowflakeセッション
+        article_id: 基準となる記事ID
+        limit: 関連記事数
+
+    Returns:
+        推薦辞書のリスト（関連順）
+    """
+    return records_from_arrow(
+        fetch_arrow(session, RELATED_ARTICLES, [article_id, limit])
+    )
 
 
-def get_similar_recommendations(
-    session: Session, query: str, limit: int = 5
+def get_student_recommendations(
+    session: Session, student_id: str, limit: int
 ) -> list[dict]:
     """
-    類似度に基づいて推薦を取得
+    学生ごとに事前計算された推薦を取得
 
     Args:
         session: Snowflakeセッション
-        query: 検索クエリ
+        student_id: 学生ID
         limit: 推薦数
 
     Returns:
-        推薦辞書のリスト
+        推薦辞書のリスト（履歴のない学生は空）
     """
-    try:
-        safe_query = query.replace("'", "''")
-
-        if USE_CORTEX:
-            # ========== CORTEXバージョン（ベクトル検索） ==========
-            # クエリの埋め込みを生成
-            query_embedding_sql = f"""
-            SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_768(
-                'e5-base-v2',
-                '{safe_query}'
-            ) as query_emb
-            """
-
-            # ベクトル類似度を使用して類似記事を検索
-            search_sql = f"""
-            WITH query_vector AS (
-                {query_embedding_sql}
+    return records_from_arrow(
+        fetch_arrow(session, STUDENT_RECOMMENDATIONS, [student_id, limit])
+    )
+
+
+async def get_personalized_recommendations(
+    pool: SessionPool, student_id: str, limit: int
+) -> Optional[list[dict]]:
+    """
+    学生ごとの事前計算済み推薦を結果キャッシュ経由で取得
+
+    テーブルが無い、Snowflakeが停止しているなどで読めない場合、検索の
+    レイテンシ予算（SEARCH_LATENCY_BUDGET_SECONDS）内に読めない場合や
+    ブレーカーが開いている場合はNoneを返し、呼び出し側はサンプリングプールに
+    フォールバックします。
+
+    Args:
+        pool: Snowflakeセッションプール
+        student_id: 学生ID
+        limit: 推薦数
+
+    Returns:
+        推薦辞書のリスト（履歴のない学生は空、読めなかった場合はNone）
+    """
+    if not student_recs_breaker.allow():
+        return None
+
+    cache_key = ("student", student_id, limit)
+
+    async def load() -> list[dict]:
+        version = await run_db(pool.run, data_version.current)
+        recommendations = result_cache.get(cache_key, version)
+        if recommendations is None:
+            recommendations = await run_db(
+                pool.run, get_student_recommendations, student_id, limit
             )
-            SELECT
-                b.id as article_id,
-                VECTOR_COSINE_DISTANCE(b.emb, q.query_emb) as score,
-                b.title,
-                b.summary,
-                b.url
-            FROM BLOG_POSTS b, query_vector q
-            WHERE b.emb IS NOT NULL
-              AND b.summary IS NOT NULL
-            ORDER BY score DESC
-            LIMIT {limit}
-            """
-        else:
-            # ========== 現在のバージョン（テキスト検索） ==========
-            # フォールバックとしてのテキストベース検索
-            search_sql = f"""
-            SELECT
-                id as article_id,
-                CASE
-                    WHEN LOWER(title) LIKE LOWER('%{safe_query}%') THEN 1.0
-                    WHEN LOWER(summary) LIKE LOWER('%{safe_query}%') THEN 0.7
-                    WHEN LOWER(body_markdown) LIKE LOWER('%{safe_query}%') THEN 0.5
-                    ELSE 0.0
-                END as score,
-                title,
-                summary,
-                url
-            FROM BLOG_POSTS
-            WHERE
-                summary IS NOT NULL
-                AND (
-                    LOWER(title) LIKE LOWER('%{safe_query}%')
-                    OR LOWER(summary) LIKE LOWER('%{safe_query}%')
-                    OR LOWER(body_markdown) LIKE LOWER('%{safe_query}%')
-                )
-            ORDER BY
-                score DESC,
-                published_at DESC
-            LIMIT {limit}
-            """
+            result_cache.set(cache_key, recommendations, version)
+        return recommendations
+
+    try:
+        # ウェアハウスの再開中などにプールのタイムアウトまで待たせない
+        recommendations = await asyncio.wait_for(load(), SEARCH_LATENCY_BUDGET_SECONDS)
+    except asyncio.TimeoutError:
+        student_recs_breaker.record_failure()
+        logger.warning(
+            "Student recommendations took over %.1fs, falling back",
+            SEARCH_LATENCY_BUDGET_SECONDS,
+        )
+        return None
+    except Exception as e:
+        student_recs_breaker.record_failure()
+        logger.warning("Student recommendations unavailable, falling back: %s", e)
+        return None
+    student_recs_breaker.record_success()
+    return recommendations
+
+
+async def get_personalized_recommendations_batch(
+    pool: SessionPool, student_ids: list[str], limit: int
+) -> Optional[dict[str, list[dict]]]:
+    """
+    複数の学生の事前計算済み推薦を1回の集合クエリで取得
 
-        results = session.sql(search_sql).to_pandas()
+    get_personalized_recommendations と同じブレーカーとレイテンシ予算を使い、
+    読めない場合はNoneを返します（呼び出し側は学生ごとにサンプリングプールに
+    フォールバックします）。
+
+    Returns:
+        学生IDごとの推薦辞書のリスト（読めなかった場合はNone）
+    """
+    if not student_recs_breaker.allow():
+        return None
+
+    try:
+        batched = await asyncio.wait_for(
+            run_db(pool.run, get_student_recommendations_batch, student_ids, limit),
+            SEARCH_LATENCY_BUDGET_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        student_recs_breaker.record_failure()
+        logger.warning(
+            "Batched student recommendations took over %.1fs, falling back",
+            SEARCH_LATENCY_BUDGET_SECONDS,
+        )
+        return None
+    except Exception as e:
+        student_recs_breaker.record_failure()
+        logger.warning(
+            "Batched student recommendations unavailable, falling back: %s", e
+        )
+        return None
+    student_recs_breaker.record_success()
+    return batched
+
+
+def get_student_recommendations_batch(
+    session: Session, student_ids: list[str], limit: int
+) -> dict[str, list[dict]]:
+    """
+    複数の学生の事前計算済み推薦を1回の集合クエリで取得
+
+    Args:
+        session: Snowflakeセッション
+        student_ids: 学生IDのリスト
+        limit: 学生ごとの最大推薦数
+
+    Returns:
+        学生IDごとの推薦辞書のリスト（履歴のない学生は含まない）
+    """
+    results = lowercase_columns(
+        fetch_arrow(
+            session, STUDENT_RECOMMENDATIONS_BATCH, [json.dumps(student_ids), limit]
+        )
+    )
+    batched: dict[str, list[dict]] = {}
+    for student_id, rec in zip(
+        results["student_id"].to_pylist(), records_from_arrow(results)
+    ):
+        batched.setdefault(student_id, []).append(rec)
+    return batched
+
+
+def search_local_replica(query: str, limit: int) -> list[dict]:
+    """ローカルレプリカを検索して推薦辞書のリストにする（スレッドで実行）"""
+    return records_from_arrow(local_replica.search(query, limit))
 
-        # 辞書に変換し、スコアがfloatであることを保証
-        recommendations = []
-        for _, row in results.iterrows():
-            rec = row.to_dict()
-            rec["score"] = float(rec["score"])
-            recommendations.append(rec)
 
+async def get_similar_recommendations(
+    pool: SessionPool, query: str, limit: int = 5, mode: SearchMode = SearchMode.AUTO
+) -> tuple[list[dict], bool]:
+    """
+    類似度に基づいて推薦を取得
+
+    前回の正常な結果がある場合、検索がレイテンシ予算を超えるかブレーカーが
+    開いていればその結果を返します。予算を超えた検索はそのまま実行を続け、
+    完了するとキャッシュを更新します。
+
+    Args:
+        pool: Snowflakeセッションプール
+        query: 検索クエリ
+        limit: 推薦数
+        mode: 検索モード（auto / lexical / vector / hybrid）
+
+    Returns:
+        (推薦辞書のリスト, 前回の結果を返した場合はTrue)
+    """
+    if mode == SearchMode.AUTO:
+        mode = SearchMode.VECTOR if USE_CORTEX else SearchMode.LEXICAL
+
+    if mode == SearchMode.VECTOR and not USE_CORTEX:
+        raise HTTPException(status_code=400, detail="ベクトル検索にはCortexの有効化が必要です")
+
+    if mode == SearchMode.LEXICAL and local_replica and local_replica.ready:
+        # レプリカがあればSnowflakeに問い合わせずにローカルで検索する
+        # （検索と変換はCPUを使うため、イベントループを止めないようスレッドで実行）
+        return await asyncio.to_thread(search_local_replica, query, limit), False
+
+    cache_key = ("similar", mode.value, query, limit)
+    stale = result_cache.get_stale(cache_key)
+
+    if not search_breaker.allow():
+        if stale is None:
+            raise HTTPException(status_code=503, detail="検索が一時的に利用できません")
+        result_cache.record_stale_hit()
+        return stale, True
+
+    async def search() -> list[dict]:
+        try:
+            version = await run_db(pool.run, data_version.current)
+            recommendations = result_cache.get(cache_key, version)
+            if recommendations is None:
+                skipped: list[str] = []
+                if mode == SearchMode.HYBRID:
+                    recommendations, skipped = await hybrid_search(pool, query, limit)
+                elif mode == SearchMode.VECTOR:
+                    recommendations = await run_db(
+                        pool.run, vector_search, query, limit
+                    )
+                else:
+                    recommendations = await run_db(
+                        pool.run, lexical_search, query, limit
+                    )
+                # 一部のリトリーバーを除外した結果はキャッシュしない
+                # （TTLの間や前回の結果として欠けた結果を返し続けないため）
+                if not skipped:
+                    result_cache.set(cache_key, recommendations, version)
+        except Exception:
+            search_breaker.record_failure()
+            raise
+        search_breaker.record_success()
         return recommendations
 
+    # 前回の結果がなければ予算なしで待つ（返せるものがないため）
+    budget = SEARCH_LATENCY_BUDGET_SECONDS if stale is not None else None
+    try:
+        # 同じ検索が実行中ならその結果を共有する
+        return (
+            await asyncio.wait_for(search_flight.do(cache_key, search), budget),
+            False,
+        )
+    except asyncio.TimeoutError:
+        # 検索はshieldされているため中断されず、完了後にキャッシュを更新する
+        # （ブレーカーへの記録は合流した待ち手ごとではなく search() で1回だけ行う）
+        result_cache.record_stale_hit()
+        return stale, True
     except Exception as e:
+        if stale is not None:
+            result_cache.record_stale_hit()
+            return stale, True
         raise HTTPException(status_code=500, detail=f"検索エラー: {str(e)}")
 
 
@@ -187,30 +635,78 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "recommendations": "/recommend",
+            "batch": "/recommend/batch",
+            "related": "/articles/{article_id}/related",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "cache": "/cache/stats",
+            "pool": "/pool/stats",
+            "metrics": "/metrics",
             "docs": "/docs",
         },
     }
 
 
+def current_health() -> HealthResponse:
+    """最後のプローブの結果とプールの状態からヘルス状態を組み立てる（クエリなし）"""
+    snapshot = health_prober.snapshot()
+    pool = session_pool.stats() if session_pool else {}
+    return HealthResponse(
+        status="healthy" if snapshot["ready"] else "degraded",
+        database_connected=snapshot["database_connected"],
+        version="1.0.0",
+        ready=snapshot["ready"],
+        warm=snapshot["warm"],
+        last_probe_latency_ms=snapshot["last_probe_latency_ms"],
+        last_probe_age_seconds=snapshot["last_probe_age_seconds"],
+        last_error=snapshot["last_error"],
+        pool_size=pool.get("size", 0),
+        pool_in_use=pool.get("in_use", 0),
+        pool_utilization=pool.get("utilization", 0.0),
+    )
+
+
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
 async def health_check():
-    """APIとデータベースのヘルスチェック"""
-    try:
-        # データベース接続のテスト
-        if snowflake_session:
-            result = snowflake_session.sql("SELECT 1").collect()
-            db_connected = len(result) > 0
-        else:
-            db_connected = False
+    """APIとデータベースのヘルスチェック（バックグラウンドのプローブ結果を返す）"""
+    return current_health()
 
-    except Exception:
-        db_connected = False
 
-    return HealthResponse(
-        status="healthy" if db_connected else "degraded",
-        database_connected=db_connected,
-        version="1.0.0",
+@app.get("/health/live", response_model=LivenessResponse, tags=["Health"])
+async def liveness():
+    """プロセスが応答できるか（データベースの状態は見ない）"""
+    return LivenessResponse(uptime_seconds=health_prober.snapshot()["uptime_seconds"])
+
+
+@app.get("/health/ready", response_model=HealthResponse, tags=["Health"])
+async def readiness(response: Response):
+    """トラフィックを受けられるか（最後のプローブが失敗または古ければ503）"""
+    health = current_health()
+    if not session_pool or not health.ready:
+        response.status_code = 503
+    return health
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse, tags=["Health"])
+async def cache_stats():
+    """検索結果キャッシュのヒット/ミス統計"""
+    return CacheStatsResponse(**result_cache.stats())
+
+
+@app.get("/pool/stats", response_model=PoolStatsResponse, tags=["Health"])
+async def pool_stats():
+    """セッションプールのサイズ、利用率、待機時間"""
+    if not session_pool:
+        raise HTTPException(status_code=503, detail="データベース接続が利用できません")
+    return PoolStatsResponse(**session_pool.stats())
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+async def prometheus_metrics():
+    """Prometheusテキスト形式のメトリクス"""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
     )
 
 
@@ -219,6 +715,8 @@ async def get_recommendations(
     student_id: str = Query(..., description="学生ID"),
     query: Optional[str] = Query(None, description="オプションの検索クエリ"),
     limit: int = Query(5, ge=1, le=20, description="推薦数"),
+    mode: SearchMode = Query(SearchMode.AUTO, description="検索モード"),
+    recent: bool = Query(False, description="ランダム推薦で新しい記事を優先"),
 ):
     """
     学生向けの記事推薦を取得
@@ -226,38 +724,174 @@ async def get_recommendations(
     - **student_id**: 必須の学生ID
     - **query**: セマンティック検索用のオプションクエリ
     - **limit**: 推薦数 (1-20、デフォルト: 5)
+    - **mode**: 検索モード (auto / lexical / vector / hybrid、デフォルト: auto)
+    - **recent**: ランダム推薦で新しい記事ほど選ばれやすくする
 
-    クエリがない場合はランダムな推薦を返します。
+    クエリがない場合は学生ごとに事前計算された推薦を返し、
+    履歴のない学生にはランダムな推薦を返します。
     クエリがある場合は意味的に類似した記事を返します。
+    hybridモードでは語彙検索とベクトル検索を並行実行し、RRFで統合します。
     """
-    if not snowflake_session:
+    if not session_pool:
         raise HTTPException(status_code=503, detail="データベース接続が利用できません")
 
     try:
         # クエリの有無に基づいて推薦を取得
-        if query:
-            recommendations_data = get_similar_recommendations(
-                snowflake_session, query, limit
+        stale = False
+        if query is not None and not query.strip():
+            # 空白だけのクエリはどの検索モードでも何にも一致させない
+            recommendations_data = []
+        elif query:
+            recommendations_data, stale = await get_similar_recommendations(
+                session_pool, query, limit, mode
             )
         else:
-            recommendations_data = get_random_recommendations(snowflake_session, limit)
-
-        # Pydanticモデルに変換
-        recommendations = [ArticleRecommendation(**rec) for rec in recommendations_data]
+            # 事前計算済みの推薦を学生IDで1回だけ読む（読めなければNone）
+            recommendations_data = await get_personalized_recommendations(
+                session_pool, student_id, limit
+            )
+            if not recommendations_data:
+                # コールドスタートや読み込み失敗: メモリ上のプールから抽出し、
+                # 未読み込みの間だけSQLで取得
+                recommendations_data = article_sampler.sample(limit, recent)
+            if recommendations_data is None:
+                recommendations_data = await run_db(
+                    session_pool.run, get_random_recommendations, limit
+                )
 
-        return RecommendationResponse(
-            student_id=student_id,
-            recommendations=recommendations,
-            total_count=len(recommendations),
-            generated_at=datetime.now(),
+        # DBの行は信頼できるため、Pydanticモデルを経由せずに直接シリアライズする
+        return json_response(
+            recommendation_payload(
+                student_id, recommendations_data, datetime.now(), stale
+            )
         )
 
     except HTTPException:
         raise
+    except PoolTimeoutError:
+        raise HTTPException(status_code=503, detail="データベース接続が混雑しています")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"推薦の生成に失敗しました: {str(e)}")
 
 
+@app.post("/recommend/batch", tags=["Recommendations"])
+async def get_recommendations_batch(batch: BatchRecommendationRequest):
+    """
+    複数の学生の推薦を1回のリクエストで取得
+
+    - **requests**: /recommend と同じ項目の推薦リクエストのリスト (1-500件)
+
+    クエリなしのリクエストは事前計算済みの推薦を1回の集合クエリでまとめて取得し、
+    同じ (mode, query, limit) のリクエストは1回だけ検索します。
+    レスポンスはリクエスト順の RecommendationResponse を1行ずつ
+    NDJSON (application/x-ndjson) でストリーミングします。
+    失敗したリクエストは {"student_id": ..., "error": ...} の行になります。
+    """
+    if not session_pool:
+        raise HTTPException(status_code=503, detail="データベース接続が利用できません")
+
+    requests = batch.requests
+
+    # 重複を除いた検索をすべて先に開始する
+    searches: dict[tuple, asyncio.Task] = {}
+    for req in requests:
+        key = (req.mode, req.query, req.limit)
+        if req.query and key not in searches:
+            searches[key] = asyncio.create_task(
+                get_similar_recommendations(
+                    session_pool, req.query, req.limit, req.mode
+                )
+            )
+
+    student_ids = list(
+        dict.fromkeys(req.student_id for req in requests if not req.query)
+    )
+    personalized: dict[str, list[dict]] = {}
+    if student_ids:
+        limit = max(req.limit for req in requests if not req.query)
+        # 読めなければ空のまま、学生ごとにサンプリングプールから返す
+        personalized = (
+            await get_personalized_recommendations_batch(
+                session_pool, student_ids, limit
+            )
+            or {}
+        )
+
+    async def stream_responses():
+        try:
+            for req in requests:
+                try:
+                    stale = False
+                    if req.query:
+                        data, stale = await searches[(req.mode, req.query, req.limit)]
+                    else:
+                        data = personalized.get(req.student_id, [])[: req.limit]
+                        if not data:
+                            data = article_sampler.sample(req.limit)
+                        if data is None:
+                            data = await run_db(
+                                session_pool.run, get_random_recommendations, req.limit
+                            )
+                    line = dumps(
+                        recommendation_payload(
+                            req.student_id, data, datetime.now(), stale
+                        )
+                    )
+                except Exception as e:
+                    detail = e.detail if isinstance(e, HTTPException) else str(e)
+                    line = dumps({"student_id": req.student_id, "error": detail})
+                yield line + b"\n"
+        finally:
+            for task in searches.values():
+                task.cancel()
+
+    return StreamingResponse(stream_responses(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/articles/{article_id}/related",
+    response_model=RelatedArticlesResponse,
+    tags=["Recommendations"],
+)
+async def get_related(
+    article_id: str,
+    limit: int = Query(5, ge=1, le=20, description="関連記事数"),
+):
+    """
+    記事に関連する記事を取得
+
+    - **article_id**: 基準となる記事ID
+    - **limit**: 関連記事数 (1-20、デフォルト: 5)
+
+    バッチ処理（python -m src.related）で事前計算した近傍を主キーで引くため、
+    クエリの埋め込みや全件の類似度計算は行いません。
+    """
+    if not session_pool:
+        raise HTTPException(status_code=503, detail="データベース接続が利用できません")
+
+    try:
+        cache_key = ("related", article_id, limit)
+        version = await run_db(session_pool.run, data_version.current)
+        related = result_cache.get(cache_key, version)
+        if related is None:
+            related = await run_db(
+                session_pool.run, get_related_articles, article_id, limit
+            )
+            result_cache.set(cache_key, related, version)
+    except PoolTimeoutError:
+        raise HTTPException(status_code=503, detail="データベース接続が混雑しています")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"関連記事の取得に失敗しました: {str(e)}")
+
+    if not related:
+        raise HTTPException(status_code=404, detail="関連記事が見つかりません")
+
+    items = project_recommendations(related)
+    return json_response(
+        {"article_id": article_id, "related": items, "total_count": len(items)}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
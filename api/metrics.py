@@ -0,0 +1,284 @@
+"""
+APIのメトリクス（Prometheusテキスト形式）
+エンドポイントごとのレイテンシ、Snowflakeクエリのレイテンシ・コンパイル/実行時間、
+キャッシュとセッションプールの統計を集計し、遅いクエリをログに出す
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, Any, Optional
+
+from src import queries
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+logger = logging.getLogger(__name__)
+
+# この時間を超えたクエリをログに出す
+METRICS_SLOW_QUERY_MS = float(os.getenv("METRICS_SLOW_QUERY_MS", "1000"))
+# クエリ履歴からコンパイル/実行時間を取り込む間隔
+METRICS_QUERY_STATS_SECONDS = float(os.getenv("METRICS_QUERY_STATS_SECONDS", "30"))
+
+# レイテンシのヒストグラムのバケット（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 取り込み待ちのクエリIDの上限（これを超えたら古いものから捨てる）
+MAX_PENDING_QUERY_IDS = 1000
+
+QUERY_STATS = """
+SELECT query_id, compilation_time, execution_time
+FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(RESULT_LIMIT => 10000))
+WHERE query_id IN (
+    SELECT value::string FROM TABLE(FLATTEN(input => PARSE_JSON(?)))
+)
+"""
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """ラベルごとの単調増加カウンタ"""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.labelnames, labels)} "
+                    f"{_format_value(value)}"
+                )
+        return lines
+
+
+class Histogram:
+    """ラベルごとの累積バケット付きヒストグラム"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル -> (バケットごとの件数, 合計, 件数)
+        self._values: dict[LabelValues, tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts, total, count = self._values.get(
+                labels, ([0] * len(self.buckets), 0.0, 0)
+            )
+            index = bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = _format_labels(names, labels + (_format_value(bound),))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _format_labels(names, labels + ("+Inf",))
+                lines.append(f"{self.name}_bucket{le} {count}")
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+                lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class ApiMetrics:
+    """APIのメトリクスを集めてPrometheusテキスト形式で出力する"""
+
+    def __init__(self, slow_query_ms: float = METRICS_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.request_latency = Histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency by endpoint",
+            ("method", "path", "status"),
+        )
+        self.query_latency = Histogram(
+            "snowflake_query_duration_seconds",
+            "Client-side Snowflake query latency by statement",
+            ("statement",),
+        )
+        self.query_compile = Histogram(
+            "snowflake_query_compilation_seconds",
+            "Snowflake compilation time by statement (from query history)",
+            ("statement",),
+        )
+        self.query_execution = Histogram(
+            "snowflake_query_execution_seconds",
+            "Snowflake execution time by statement (from query history)",
+            ("statement",),
+        )
+        self.slow_queries = Counter(
+            "snowflake_slow_queries_total",
+            "Queries slower than the slow-query threshold",
+            ("statement",),
+        )
+        self._collectors: list[Callable[[], list[str]]] = []
+        # (クエリID, 文の名前) のコンパイル/実行時間の取り込み待ち
+        self._pending: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._statement_names = {
+            value: name.lower()
+            for name, value in vars(queries).items()
+            if name.isupper() and isinstance(value, str) and "SELECT" in value
+        }
+
+    def statement_name(self, template: str) -> str:
+        """テンプレートの src/queries.py での定数名（小文字）"""
+        return self._statement_names.get(template, "other")
+
+    def observe_request(
+        self, method: str, path: str, status: int, seconds: float
+    ) -> None:
+        """リクエストのレイテンシを記録"""
+        self.request_latency.observe(seconds, method, path, str(status))
+
+    def observe_query(
+        self, query_id: Optional[str], template: str, seconds: float
+    ) -> None:
+        """クエリのレイテンシを記録（src.queries のクエリリスナー）"""
+        statement = self.statement_name(template)
+        self.query_latency.observe(seconds, statement)
+        if query_id:
+            with self._lock:
+                self._pending.append((query_id, statement))
+                del self._pending[:-MAX_PENDING_QUERY_IDS]
+
+        if seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.inc(statement)
+            logger.warning(
+                "Slow query: %s took %.0fms (query_id=%s)",
+                statement,
+                seconds * 1000,
+                query_id,
+            )
+
+    def collect_query_stats(self, session: Session) -> int:
+        """
+        取り込み待ちのクエリのコンパイル/実行時間をクエリ履歴から取得
+
+        Returns:
+            取り込んだクエリ数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        # 記録済みのクエリは完了しているため、1回の照会で履歴から取れる
+        statements = dict(pending)
+        rows = session.sql(QUERY_STATS, params=[json.dumps(list(statements))]).collect()
+        for row in rows:
+            statement = statements.get(row["QUERY_ID"], "other")
+            self.query_compile.observe(row["COMPILATION_TIME"] / 1000, statement)
+            self.query_execution.observe(row["EXECUTION_TIME"] / 1000, statement)
+        return len(rows)
+
+    def add_collector(self, collect: Callable[[], list[str]]) -> None:
+        """描画時に呼ばれる追加のメトリクス行の生成関数を登録"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        """Prometheusテキスト形式で出力"""
+        lines: list[str] = []
+        for metric in (
+            self.request_latency,
+            self.query_latency,
+            self.query_compile,
+            self.query_execution,
+            self.slow_queries,
+        ):
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def stats_lines(
+    prefix: str, stats: dict[str, Any], counters: Sequence[str] = ()
+) -> list[str]:
+    """
+    stats() の辞書をメトリクス行に変換
+
+    Args:
+        prefix: メトリクス名の接頭辞（例: "result_cache"）
+        stats: 数値の統計の辞書
+        counters: 単調増加する項目（counterとして出力し、名前に _total を付ける）
+
+    Returns:
+        Prometheusテキスト形式の行
+    """
+    lines = []
+    for key, value in stats.items():
+        if key in counters:
+            name, kind = f"{prefix}_{key}_total", "counter"
+        else:
+            name, kind = f"{prefix}_{key}", "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+    return lines
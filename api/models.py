@@ -3,11 +3,21 @@ APIレスポンス用Pydanticモデル
 """
 
 from datetime import datetime
+from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
 
+class SearchMode(str, Enum):
+    """検索モード"""
+
+    AUTO = "auto"
+    LEXICAL = "lexical"
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+
+
 class ArticleRecommendation(BaseModel):
     """単一の記事推薦"""
 
@@ -36,6 +46,15 @@ class RecommendationRequest(BaseModel):
     student_id: str = Field(..., description="学生ID")
     query: Optional[str] = Field(None, description="オプションの検索クエリ")
     limit: int = Field(5, ge=1, le=20, description="推薦数")
+    mode: SearchMode = Field(SearchMode.AUTO, description="検索モード")
+
+
+class BatchRecommendationRequest(BaseModel):
+    """一括推薦リクエストモデル"""
+
+    requests: list[RecommendationRequest] = Field(
+        ..., min_length=1, max_length=500, description="推薦リクエストのリスト"
+    )
 
 
 class RecommendationResponse(BaseModel):
@@ -48,6 +67,7 @@ class RecommendationResponse(BaseModel):
         default_factory=datetime.now,
         description="推薦生成日時",
     )
+    stale: bool = Field(False, description="Snowflakeが遅い・停止中のため前回の結果を返した場合はTrue")
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -64,14 +84,70 @@ class RecommendationResponse(BaseModel):
                 ],
                 "total_count": 1,
                 "generated_at": "2024-06-27T10:30:00",
+                "stale": False,
             }
         }
     )
 
 
+class RelatedArticlesResponse(BaseModel):
+    """関連記事レスポンスモデル"""
+
+    article_id: str = Field(..., description="基準となる記事ID")
+    related: list[ArticleRecommendation] = Field(..., description="関連記事のリスト")
+    total_count: int = Field(..., description="関連記事の総数")
+
+
 class HealthResponse(BaseModel):
     """ヘルスチェックレスポンス"""
 
     status: str = Field("healthy", description="サービス状態")
     database_connected: bool = Field(..., description="データベース接続状態")
     version: str = Field("1.0.0", description="APIバージョン")
+    ready: bool = Field(False, description="トラフィックを受けられる状態か")
+    warm: bool = Field(False, description="起動時のウォームアップが完了したか")
+    last_probe_latency_ms: Optional[float] = Field(
+        None, description="最後のプローブのレイテンシ（ミリ秒）"
+    )
+    last_probe_age_seconds: Optional[float] = Field(None, description="最後のプローブからの経過秒数")
+    last_error: Optional[str] = Field(None, description="最後のプローブのエラー")
+    pool_size: int = Field(0, description="セッションプールのセッション数")
+    pool_in_use: int = Field(0, description="使用中のセッション数")
+    pool_utilization: float = Field(0.0, description="プールの利用率")
+
+
+class LivenessResponse(BaseModel):
+    """プロセスの生存確認レスポンス"""
+
+    status: str = Field("alive", description="プロセス状態")
+    uptime_seconds: float = Field(..., description="起動からの経過秒数")
+
+
+class CacheStatsResponse(BaseModel):
+    """検索結果キャッシュの統計"""
+
+    hits: int = Field(..., description="キャッシュヒット数")
+    misses: int = Field(..., description="キャッシュミス数")
+    evictions: int = Field(..., description="LRUによる追い出し数")
+    invalidations: int = Field(..., description="データ更新による無効化回数")
+    stale_hits: int = Field(0, description="古い結果で応答した回数")
+    size: int = Field(..., description="現在のエントリ数")
+    maxsize: int = Field(..., description="最大エントリ数")
+
+
+class PoolStatsResponse(BaseModel):
+    """セッションプールの統計"""
+
+    size: int = Field(..., description="現在のセッション数")
+    in_use: int = Field(..., description="使用中のセッション数")
+    idle: int = Field(..., description="アイドルセッション数")
+    min_size: int = Field(..., description="最小セッション数")
+    max_size: int = Field(..., description="最大セッション数")
+    utilization: float = Field(..., description="利用率 (in_use / max_size)")
+    checkouts: int = Field(..., description="チェックアウト総数")
+    waits: int = Field(..., description="空き待ちが発生したチェックアウト数")
+    wait_ms_total: float = Field(..., description="累計待機時間（ミリ秒）")
+    wait_ms_max: float = Field(..., description="最大待機時間（ミリ秒）")
+    connects: int = Field(..., description="作成したセッション数")
+    reconnects: int = Field(..., description="切断による再接続数")
+    validation_failures: int = Field(..., description="検証に失敗した回数")
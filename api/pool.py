@@ -0,0 +1,299 @@
+"""
+FastAPI用のSnowparkセッションプール
+最小/最大サイズ、アイドルセッションのキープアライブ、チェックアウト時の検証、
+切断されたセッションの透過的な再接続を提供する
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
+
+from api.executor import DB_MAX_CONCURRENCY
+from src.config import get_snowflake_session
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# プールの設定
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", str(DB_MAX_CONCURRENCY)))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# この時間以上アイドルだったセッションはチェックアウト時に検証する
+DB_POOL_VALIDATE_AFTER_SECONDS = float(
+    os.getenv("DB_POOL_VALIDATE_AFTER_SECONDS", "60")
+)
+# アイドルセッションへのキープアライブ間隔（0で無効）
+DB_POOL_KEEPALIVE_SECONDS = float(os.getenv("DB_POOL_KEEPALIVE_SECONDS", "900"))
+
+
+class PoolTimeoutError(TimeoutError):
+    """プールからセッションを取得できなかった"""
+
+
+class SessionPool:
+    """スレッドセーフなSnowparkセッションプール"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Session] = get_snowflake_session,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout_seconds: float = DB_POOL_TIMEOUT_SECONDS,
+        validate_after_seconds: float = DB_POOL_VALIDATE_AFTER_SECONDS,
+        keepalive_seconds: float = DB_POOL_KEEPALIVE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout_seconds = timeout_seconds
+        self.validate_after_seconds = validate_after_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self._clock = clock
+
+        # (セッション, 最終利用時刻) のLIFOスタック
+        self._idle: list[tuple[Session, float]] = []
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+        # 統計
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connects = 0
+        self.reconnects = 0
+        self.validation_failures = 0
+
+    def open(self) -> None:
+        """
+        最小サイズまでセッションを作成し、キープアライブを開始
+
+        途中で接続に失敗した場合は例外を送出します。再度呼び出すと不足分だけ作成します。
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    break
+            session = self._create()
+            with self._cond:
+                self._size += 1
+                self._idle.append((session, self._clock()))
+                self._cond.notify()
+
+        if self.keepalive_seconds > 0 and self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_loop, name="snowflake-keepalive", daemon=True
+            )
+            self._keepalive_thread.start()
+
+    def close(self) -> None:
+        """すべてのアイドルセッションを閉じる（使用中のものは返却時に閉じる）"""
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            idle = [session for session, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for session in idle:
+            self._close_quietly(session)
+
+    def acquire(self) -> Session:
+        """
+        セッションをチェックアウト
+
+        空きがなく最大サイズに達している場合は返却を待ちます。
+        一定時間アイドルだったセッションは検証し、切断されていれば再接続します。
+
+        Returns:
+            利用可能なセッション
+
+        Raises:
+            PoolTimeoutError: timeout_seconds以内にセッションを取得できなかった
+        """
+        start = self._clock()
+        deadline = start + self.timeout_seconds
+        session: Optional[Session] = None
+        last_used = 0.0
+
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise RuntimeError("セッションプールは閉じられています")
+                if self._idle:
+                    session, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                waited = True
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    raise PoolTimeoutError("セッションプールの待機がタイムアウトしました")
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self.checkouts += 1
+            if waited:
+                wait_seconds = self._clock() - start
+                self.waits += 1
+                self.wait_seconds_total += wait_seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+        try:
+            if session is None:
+                return self._create()
+            if self._clock() - last_used >= self.validate_after_seconds:
+                if not self._validate(session):
+                    self._close_quietly(session)
+                    self.reconnects += 1
+                    return self._create()
+            return session
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, session: Session, broken: bool = False) -> None:
+        """セッションを返却（broken=Trueなら破棄）"""
+        with self._cond:
+            self._in_use -= 1
+            discard = broken or self._closed
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((session, self._clock()))
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(session)
+
+    def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        プールのセッションで func(session, *args, **kwargs) を実行
+
+        失敗時にセッションが切断されていた場合は、新しいセッションで一度だけ
+        再試行します（期限切れセッションの透過的な再接続）。
+        """
+        session = self.acquire()
+        try:
+            result = func(session, *args, **kwargs)
+        except Exception:
+            if self._validate(session):
+                self.release(session)
+                raise
+            self.release(session, broken=True)
+            self.reconnects += 1
+        else:
+            self.release(session)
+            return result
+
+        session = self.acquire()
+        try:
+            result = func(session, *args, **kwargs)
+        except Exception:
+            self.release(session, broken=not self._validate(session))
+            raise
+        self.release(session)
+        return result
+
+    def maintain(self) -> None:
+        """
+        アイドルセッションのキープアライブ
+
+        keepalive_seconds以上アイドルなセッションに SELECT 1 を送り、
+        失敗したものは破棄して最小サイズまで補充します。
+        """
+        now = self._clock()
+        with self._cond:
+            stale = [
+                entry
+                for entry in self._idle
+                if now - entry[1] >= self.keepalive_seconds
+            ]
+            for entry in stale:
+                self._idle.remove(entry)
+            self._in_use += len(stale)
+
+        for session, _ in stale:
+            self.release(session, broken=not self._validate(session))
+
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+                self._in_use += 1
+            try:
+                session = self._create()
+            except Exception as e:
+                self._forget()
+                logger.warning("Failed to replenish Snowflake session pool: %s", e)
+                return
+            self.release(session)
+
+    def stats(self) -> dict[str, Any]:
+        """プールのサイズ、利用率、待機時間を返す"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "utilization": self._in_use / self.max_size if self.max_size else 0.0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_ms_total": self.wait_seconds_total * 1000,
+                "wait_ms_max": self.wait_seconds_max * 1000,
+                "connects": self.connects,
+                "reconnects": self.reconnects,
+                "validation_failures": self.validation_failures,
+            }
+
+    def _create(self) -> Session:
+        session = self._factory()
+        self.connects += 1
+        return session
+
+    def _forget(self) -> None:
+        """作成・検証に失敗したチェックアウトを取り消す"""
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _validate(self, session: Session) -> bool:
+        try:
+            session.sql("SELECT 1").collect()
+            return True
+        except Exception:
+            self.validation_failures += 1
+            return False
+
+    @staticmethod
+    def _close_quietly(session: Session) -> None:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def _keepalive_loop(self) -> None:
+        while not self._stop.wait(self.keepalive_seconds):
+            self.maintain()
@@ -0,0 +1,136 @@
+"""
+ランダム推薦用のインメモリ・サンプリングプール
+要約のある記事をメモリに保持し、ORDER BY RANDOM() の全件ソートなしで抽出する
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import os
+import random
+import threading
+from collections.abc import Callable
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+
+from src.cache import fetch_data_version
+from src.queries import ELIGIBLE_POSTS, run_query
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from snowflake.snowpark import Session
+
+# 新しい記事の重み付けの半減期（日）
+RANDOM_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RANDOM_RECENCY_HALF_LIFE_DAYS", "90"))
+# データバージョンを確認してプールを更新する間隔
+SAMPLER_REFRESH_SECONDS = float(os.getenv("SAMPLER_REFRESH_SECONDS", "60"))
+
+
+def load_eligible_posts(session: Session) -> pd.DataFrame:
+    """要約のある記事をすべて取得（列名は小文字に揃える）"""
+    return run_query(session, ELIGIBLE_POSTS).rename(columns=str.lower)
+
+
+class ArticleSampler:
+    """データバージョンが変わったときだけ再読み込みするサンプリングプール"""
+
+    def __init__(
+        self,
+        load: Callable[[Session], pd.DataFrame] = load_eligible_posts,
+        fetch_version: Callable[[Session], Any] = fetch_data_version,
+        half_life_days: float = RANDOM_RECENCY_HALF_LIFE_DAYS,
+        rng: Optional[random.Random] = None,
+    ):
+        self._load = load
+        self._fetch_version = fetch_version
+        self.half_life_days = half_life_days
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._version: Any = None
+        # (記事のリスト, 新しさによる累積重み) のスナップショット（差し替えのみ）
+        self._snapshot: Optional[tuple[list[dict], list[float]]] = None
+        self.refreshes = 0
+
+    @property
+    def ready(self) -> bool:
+        """プールが読み込み済みか"""
+        return self._snapshot is not None
+
+    def refresh(self, session: Session, now: Optional[datetime] = None) -> bool:
+        """
+        データバージョンが変わっていればプールを再読み込み
+
+        Args:
+            session: Snowflakeセッション
+            now: 新しさの重みの基準時刻（テスト用）
+
+        Returns:
+            再読み込みした場合はTrue
+        """
+        with self._lock:
+            version = self._fetch_version(session)
+            if self._snapshot is not None and version == self._version:
+                return False
+
+            rows = self._load(session).to_dict("records")
+            articles = []
+            weights = []
+            now = now or datetime.now()
+            for row in rows:
+                published_at = row.pop("published_at", None)
+                articles.append({**row, "score": 1.0})
+                weights.append(self._recency_weight(published_at, now))
+
+            self._snapshot = (articles, list(itertools.accumulate(weights)))
+            self._version = version
+            self.refreshes += 1
+            return True
+
+    def sample(self, limit: int, recent: bool = False) -> Optional[list[dict]]:
+        """
+        記事を重複なしでランダムに抽出
+
+        一様抽出は O(limit)、新しさの重み付き抽出は累積重みへの二分探索で
+        O(limit · log n) です。
+
+        Args:
+            limit: 推薦数
+            recent: 新しい記事ほど選ばれやすくする
+
+        Returns:
+            推薦辞書のリスト（未読み込みならNone）
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+
+        articles, cumulative = snapshot
+        k = min(limit, len(articles))
+        if not recent:
+            return [
+                dict(articles[i]) for i in self._rng.sample(range(len(articles)), k)
+            ]
+
+        total = cumulative[-1] if cumulative else 0.0
+        picked: dict[int, None] = {}
+        # 重複は捨てて引き直す（limit ≪ n なのでほぼ1回で決まる）
+        attempts = 0
+        while len(picked) < k and attempts < k * 20:
+            index = bisect.bisect_right(cumulative, self._rng.random() * total)
+            picked.setdefault(min(index, len(articles) - 1))
+            attempts += 1
+        # 重みが極端に偏っていて埋まらない場合は残りを一様抽出で補う
+        if len(picked) < k:
+            rest = [i for i in range(len(articles)) if i not in picked]
+            picked.update(dict.fromkeys(self._rng.sample(rest, k - len(picked))))
+        return [dict(articles[i]) for i in picked]
+
+    def _recency_weight(self, published_at: Any, now: datetime) -> float:
+        import pandas as pd
+
+        # 公開日不明の記事は半減期1回分の重みとする
+        if published_at is None or pd.isna(published_at):
+            return 0.5
+        age_days = max((now - pd.Timestamp(published_at)).total_seconds(), 0) / 86400
+        return 0.5 ** (age_days / self.half_life_days)
@@ -0,0 +1,201 @@
+"""
+記事検索のリトリーバーとハイブリッド検索
+語彙検索（LIKE / 用語インデックス）とベクトル検索（Cortex）を提供し、
+両者を Reciprocal Rank Fusion で統合する
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from api.executor import run_db
+from api.pool import SessionPool
+from api.serialization import records_from_arrow
+from src.queries import LIKE_SEARCH, TERM_SEARCH, VECTOR_SEARCH, fetch_arrow
+from src.query_embeddings import QueryEmbeddingCache
+from src.terms import normalize_search_text
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+logger = logging.getLogger(__name__)
+
+# Cortexの利用可能性の設定（SnowflakeアカウントでCortexが利用可能ならtrueに設定）
+USE_CORTEX = os.getenv("USE_CORTEX", "false").lower() == "true"
+
+# 用語インデックス（sql/search_terms.sql）によるBM25検索の設定
+USE_TERM_INDEX = os.getenv("SEARCH_TERM_INDEX", "false").lower() == "true"
+
+# 検索全体のレイテンシ予算（これを超えたら前回の正常な結果を返す）
+SEARCH_LATENCY_BUDGET_SECONDS = (
+    float(os.getenv("SEARCH_LATENCY_BUDGET_MS", "2000")) / 1000
+)
+
+# ハイブリッド検索の設定
+# 各リトリーバーのレイテンシ予算（これを超えたリトリーバーの結果は待たずに統合する）
+RETRIEVER_BUDGET_SECONDS = float(os.getenv("SEARCH_RETRIEVER_BUDGET_MS", "1500")) / 1000
+
+# RRFの定数k（大きいほど下位の順位の影響が相対的に大きくなる）
+RRF_K = 60
+
+# 統合前に各リトリーバーから取得する候補数の倍率
+HYBRID_CANDIDATE_FACTOR = 3
+
+# クエリの埋め込みのキャッシュ（同じクエリを毎回Cortexで埋め込まない）
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def _run_search(session: Session, template: str, query: str, limit: int) -> list[dict]:
+    """検索テンプレートを実行し、スコアをfloatにした辞書のリストを返す"""
+    return records_from_arrow(fetch_arrow(session, template, [query, limit]))
+
+
+def lexical_search(session: Session, query: str, limit: int) -> list[dict]:
+    """語彙検索（用語インデックスが有効ならBM25、それ以外は正規化済みの列の部分一致）"""
+    if USE_TERM_INDEX:
+        return _run_search(session, TERM_SEARCH, query, limit)
+    term = normalize_search_text(query)
+    if not term:
+        return []
+    return _run_search(session, LIKE_SEARCH, term, limit)
+
+
+def vector_search(session: Session, query: str, limit: int) -> list[dict]:
+    """Cortexの埋め込みによるベクトル検索（クエリの埋め込みはキャッシュから引く）"""
+    if not query.strip():
+        return []
+    vector = query_embedding_cache.get(session, query)
+    return _run_search(session, VECTOR_SEARCH, vector, limit)
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: list[list[dict]], limit: int, k: int = RRF_K
+) -> list[dict]:
+    """
+    複数のランキングを Reciprocal Rank Fusion で統合
+
+    各記事のスコアは 1 / (k + 順位) の合計で、全リストで1位のときに1.0となるよう
+    正規化します。記事のメタデータは最初に出現したリストのものを使います。
+
+    Args:
+        ranked_lists: リトリーバーごとのスコア順の推薦辞書のリスト
+        limit: 返す推薦数
+        k: RRFの定数
+
+    Returns:
+        統合スコア順の推薦辞書のリスト
+    """
+    if not ranked_lists:
+        return []
+
+    fused: dict[str, dict] = {}
+    for ranked in ranked_lists:
+        for rank, rec in enumerate(ranked, start=1):
+            entry = fused.setdefault(rec["article_id"], {**rec, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+
+    max_score = len(ranked_lists) / (k + 1)
+    for entry in fused.values():
+        entry["score"] = min(entry["score"] / max_score, 1.0)
+
+    return sorted(fused.values(), key=lambda rec: rec["score"], reverse=True)[:limit]
+
+
+class _RetrieverCall:
+    """予算超過時にクエリを取り消せるよう、実行中のセッションを保持するリトリーバー呼び出し"""
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self._session: Optional[Session] = None
+        # 取り消しの途中でセッションがプールに返却されないようにする
+        self._lock = threading.Lock()
+
+    def __call__(self, session: Session, query: str, limit: int) -> list[dict]:
+        with self._lock:
+            self._session = session
+        try:
+            return self.retriever(session, query, limit)
+        finally:
+            with self._lock:
+                self._session = None
+
+    def cancel(self) -> None:
+        """実行中のクエリを取り消す（完了済みなら何もしない）"""
+        with self._lock:
+            if self._session is None:
+                return
+            try:
+                self._session.cancel_all()
+            except Exception as e:
+                logger.warning("Failed to cancel retriever query: %s", e)
+
+
+async def hybrid_search(
+    pool: SessionPool,
+    query: str,
+    limit: int,
+    budget_seconds: Optional[float] = None,
+) -> tuple[list[dict], list[str]]:
+    """
+    語彙検索とベクトル検索をSnowflake用スレッドプールで並行実行し、RRFで統合
+
+    予算内に終わらなかった、または失敗したリトリーバーは除外して残りの結果を
+    統合します。予算を超えたリトリーバーのクエリは取り消すので、スレッドと
+    プールのセッションは取り消しが反映され次第解放されます。すべての
+    リトリーバーが失敗した場合は最初の例外を送出します。
+
+    Args:
+        pool: Snowflakeセッションプール
+        query: 検索クエリ
+        limit: 推薦数
+        budget_seconds: リトリーバーごとのレイテンシ予算（秒、省略時は
+            RETRIEVER_BUDGET_SECONDS）
+
+    Returns:
+        (推薦辞書のリスト, 除外したリトリーバーの名前のリスト)
+    """
+    if budget_seconds is None:
+        budget_seconds = RETRIEVER_BUDGET_SECONDS
+
+    retrievers = {"lexical": lexical_search}
+    if USE_CORTEX:
+        retrievers["vector"] = vector_search
+    calls = {name: _RetrieverCall(retriever) for name, retriever in retrievers.items()}
+
+    candidates = limit * HYBRID_CANDIDATE_FACTOR
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                run_db(pool.run, call, query, candidates),
+                timeout=budget_seconds,
+            )
+            for call in calls.values()
+        ),
+        return_exceptions=True,
+    )
+
+    ranked_lists = []
+    errors = []
+    skipped = []
+    for name, result in zip(calls, results):
+        if isinstance(result, BaseException):
+            timed_out = isinstance(result, TimeoutError)
+            if timed_out:
+                # 待つのをやめてもクエリは続くため取り消してセッションを空ける
+                await asyncio.to_thread(calls[name].cancel)
+            logger.warning(
+                "Retriever '%s' skipped: %s", name, "timeout" if timed_out else result
+            )
+            errors.append(result)
+            skipped.append(name)
+        else:
+            ranked_lists.append(result)
+
+    if not ranked_lists:
+        raise errors[0]
+
+    return reciprocal_rank_fusion(ranked_lists, limit), skipped
@@ -0,0 +1,84 @@
+"""
+推薦レスポンスの高速シリアライズ
+DBから取得した信頼できる行はPydanticで再検証せず、列指向のまま辞書にして
+orjsonで直接JSONバイト列にする
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+from fastapi.responses import Response
+
+# ArticleRecommendation のフィールド（これ以外の列はレスポンスに含めない）
+RECOMMENDATION_FIELDS = ("article_id", "score", "title", "summary", "url")
+
+
+def lowercase_columns(table: pa.Table) -> pa.Table:
+    """Snowflakeが大文字で返す列名をテンプレートの別名（小文字）に揃える"""
+    return table.rename_columns([name.lower() for name in table.column_names])
+
+
+def records_from_arrow(table: pa.Table) -> list[dict]:
+    """
+    Arrowのクエリ結果を推薦辞書のリストに変換（pandasを経由しない）
+
+    Args:
+        table: article_id, score, title, summary, url 列を持つクエリ結果
+
+    Returns:
+        推薦辞書のリスト（スコアはfloat、欠損値はNone）
+    """
+    table = lowercase_columns(table)
+    columns = {}
+    for field in RECOMMENDATION_FIELDS:
+        if field not in table.column_names:
+            columns[field] = [None] * table.num_rows
+        elif field == "score":
+            # NUMBER列はDecimalになるためfloatにキャストしてから取り出す
+            columns[field] = pc.cast(table[field], pa.float64()).to_pylist()
+        else:
+            columns[field] = table[field].to_pylist()
+    return [dict(zip(RECOMMENDATION_FIELDS, row)) for row in zip(*columns.values())]
+
+
+def project_recommendations(recommendations: Iterable[dict]) -> list[dict]:
+    """推薦辞書を ArticleRecommendation のフィールドだけに絞る"""
+    return [
+        {field: rec.get(field) for field in RECOMMENDATION_FIELDS}
+        for rec in recommendations
+    ]
+
+
+def recommendation_payload(
+    student_id: str,
+    recommendations: Iterable[dict],
+    generated_at: datetime,
+    stale: bool = False,
+) -> dict:
+    """RecommendationResponse と同じ形の辞書を組み立てる"""
+    items = project_recommendations(recommendations)
+    return {
+        "student_id": student_id,
+        "recommendations": items,
+        "total_count": len(items),
+        "generated_at": generated_at,
+        "stale": stale,
+    }
+
+
+def dumps(payload: Any) -> bytes:
+    """orjsonでJSONバイト列に変換（NumPyの値もそのまま扱う）"""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """検証済みの辞書をそのまま返すJSONレスポンス"""
+    return Response(
+        content=dumps(payload), status_code=status_code, media_type="application/json"
+    )
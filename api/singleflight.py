@@ -0,0 +1,58 @@
+"""
+同一リクエストの合流（シングルフライト）
+同じキーの計算が実行中なら新たに開始せず、実行中の結果を共有する
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """キーごとに実行中の計算を1つにまとめる（イベントループ内で使用）"""
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        キーの計算を実行し、実行中なら完了を待って同じ結果を返す
+
+        呼び出し元の1つがキャンセルされても、共有している計算は継続します。
+        計算が例外を送出した場合は、合流したすべての呼び出し元に同じ例外が届きます。
+
+        Args:
+            key: 同一とみなすリクエストのキー
+            func: 結果を計算するコルーチン関数
+
+        Returns:
+            計算結果
+        """
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # 呼び出し元がすべてキャンセルされた場合の未回収例外の警告を抑える
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict[str, Any]:
+        """呼び出し数、合流数、実行中の計算数を返す"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
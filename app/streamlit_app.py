@@ -3,11 +3,24 @@ Streamlit UI for MUED Snowflake AI App
 Simple vector search interface for blog posts
 """
 
+import os
+import threading
+from typing import Any, Optional
+
 import pandas as pd
 import streamlit as st
 from snowflake.snowpark import Session
 
+from src.autocomplete import AutocompleteIndex
+from src.cache import DATA_VERSION_CHECK_SECONDS, DataVersion, ResultCache
 from src.config import get_session
+from src.queries import UI_LIKE_SEARCH, UI_POST_STATS, UI_VECTOR_SEARCH, run_query
+from src.query_embeddings import QueryEmbeddingCache
+from src.replica import LOCAL_REPLICA, LocalReplica
+from src.terms import normalize_search_text
+
+# Cortexの利用可能性（APIと同じ USE_CORTEX 環境変数で切り替える）
+USE_CORTEX = os.getenv("USE_CORTEX", "false").lower() == "true"
 
 # ページ設定
 st.set_page_config(page_title="MUED ブログ検索", page_icon="🔍", layout="wide")
@@ -20,6 +33,76 @@ def init_snowflake_session() -> Session:
     return get_session()
 
 
+# 記事数と最終更新（1回のクエリで取得し、再実行をまたいでTTLの間キャッシュ）
+@st.cache_data(ttl=DATA_VERSION_CHECK_SECONDS, show_spinner=False)
+def load_post_stats(_session: Session) -> dict[str, Any]:
+    """Fetch the post count and latest update for the sidebar in one query"""
+    row = _session.sql(UI_POST_STATS).collect()[0]
+    return {"post_count": row["POST_COUNT"], "latest_update": row["LATEST_UPDATE"]}
+
+
+# 検索結果キャッシュの初期化（再実行をまたいで共有）
+@st.cache_resource
+def init_result_cache() -> tuple[ResultCache, DataVersion]:
+    """Initialize the shared search result cache and data version probe"""
+    # データバージョンはサイドバーの統計と同じキャッシュ済みの最終更新を使う
+    return ResultCache(), DataVersion(
+        fetch=lambda session: load_post_stats(session)["latest_update"]
+    )
+
+
+# 入力補完の索引の初期化（再実行をまたいで共有し、データが変わったときだけ作り直す）
+@st.cache_resource
+def init_autocomplete() -> AutocompleteIndex:
+    """Initialize the shared title/tag prefix index for suggestions"""
+    return AutocompleteIndex(
+        fetch_version=lambda session: load_post_stats(session)["latest_update"]
+    )
+
+
+def use_suggestion() -> None:
+    """Copy the picked suggestion into the query and search for it"""
+    picked = st.session_state.get("suggestion")
+    if picked:
+        st.session_state["query"] = picked
+        st.session_state["search"] = (picked, st.session_state["num_results"])
+        st.session_state["suggestion"] = None
+
+
+# クエリ埋め込みキャッシュの初期化（再実行をまたいで共有）
+@st.cache_resource
+def init_query_embedding_cache() -> QueryEmbeddingCache:
+    """Initialize the shared query-embedding cache for vector search"""
+    return QueryEmbeddingCache()
+
+
+# ローカルレプリカの初期化（LOCAL_REPLICA=true のとき、前回のスナップショットを読み込む）
+@st.cache_resource
+def init_local_replica() -> Optional[LocalReplica]:
+    """Initialize the local BLOG_POSTS replica shared across reruns"""
+    if not LOCAL_REPLICA:
+        return None
+    replica = LocalReplica()
+    replica.load()
+    return replica
+
+
+def search_local_replica(replica: LocalReplica, query: str, limit: int) -> pd.DataFrame:
+    """Keyword search on the local replica, in the shape of UI_LIKE_SEARCH"""
+    results = replica.search(query, limit, require_summary=False).to_pandas()
+    results = results.rename(columns={"article_id": "id", "score": "similarity_score"})
+    columns = [
+        "id",
+        "title",
+        "summary",
+        "url",
+        "published_at",
+        "tags",
+        "similarity_score",
+    ]
+    return results[columns].rename(columns=str.upper)
+
+
 # 類似記事検索
 def search_similar_posts(session: Session, query: str, limit: int = 5) -> pd.DataFrame:
     """
@@ -31,78 +114,36 @@ def search_similar_posts(session: Session, query: str, limit: int = 5) -> pd.Dat
         limit: Number of results to return
 
     Returns:
-        DataFrame with similar posts
+        DataFrame with similar posts (empty for a blank query)
     """
-    # Check if Cortex is available (can be toggled when account is upgraded)
-    USE_CORTEX = (
-        False  # TODO: Set to True when Cortex is available in your Snowflake account
-    )
+    if not query.strip():
+        return pd.DataFrame()
 
-    try:
-        # Escape single quotes in query
-        safe_query = query.replace("'", "''")
+    result_cache, data_version = init_result_cache()
+    replica = init_local_replica()
 
+    try:
+        # レプリカがあればSnowflakeに問い合わせずにローカルで検索する
+        if not USE_CORTEX and replica is not None and replica.ready:
+            return search_local_replica(replica, query, limit)
+
+        # Serve identical (query, limit) pairs from the cache until data changes
+        cache_key = ("search", query, limit)
+        version = data_version.current(session)
+        cached = result_cache.get(cache_key, version)
+        if cached is not None:
+            return cached
+
+        # Fixed statement templates with bind variables (see src/queries.py)
         if USE_CORTEX:
-            # ========== CORTEX VERSION (Vector Search) ==========
-            # Uncomment and use this version when Cortex is available
-            """
-            # Generate embedding for the query using Cortex
-            query_embedding_sql = f'''
-            SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_768(
-                'e5-base-v2',
-                '{safe_query}'
-            ) as query_emb
-            '''
-
-            # Search for similar posts using vector similarity
-            search_sql = f'''
-            WITH query_vector AS (
-                {query_embedding_sql}
-            )
-            SELECT
-                b.id,
-                b.title,
-                b.summary,
-                b.url,
-                b.published_at,
-                b.tags,
-                VECTOR_COSINE_DISTANCE(b.emb, q.query_emb) as similarity_score
-            FROM BLOG_POSTS b, query_vector q
-            WHERE b.emb IS NOT NULL
-            ORDER BY similarity_score DESC
-            LIMIT {limit}
-            '''
-            """
-            pass  # Remove this line when enabling Cortex
+            # The query is embedded once and bound as a vector on later searches
+            vector = init_query_embedding_cache().get(session, query)
+            results = run_query(session, UI_VECTOR_SEARCH, [vector, limit])
         else:
-            # ========== CURRENT VERSION (Text Search) ==========
-            # Traditional text-based search as fallback
-            search_sql = f"""
-            SELECT
-                id,
-                title,
-                summary,
-                url,
-                published_at,
-                tags,
-                CASE
-                    WHEN LOWER(title) LIKE LOWER('%{safe_query}%') THEN 1.0
-                    WHEN LOWER(summary) LIKE LOWER('%{safe_query}%') THEN 0.7
-                    WHEN LOWER(body_markdown) LIKE LOWER('%{safe_query}%') THEN 0.5
-                    ELSE 0.0
-                END as similarity_score
-            FROM BLOG_POSTS
-            WHERE
-                LOWER(title) LIKE LOWER('%{safe_query}%')
-                OR LOWER(summary) LIKE LOWER('%{safe_query}%')
-                OR LOWER(body_markdown) LIKE LOWER('%{safe_query}%')
-            ORDER BY
-                similarity_score DESC,
-                published_at DESC
-            LIMIT {limit}
-            """
-
-        results = session.sql(search_sql).to_pandas()
+            # Compared with the pre-folded *_norm columns (sql/search_normalization.sql)
+            term = normalize_search_text(query)
+            results = run_query(session, UI_LIKE_SEARCH, [term, limit])
+        result_cache.set(cache_key, results, version)
         return results
 
     except Exception as e:
@@ -145,6 +186,23 @@ def main():
     # Initialize session
     session = init_snowflake_session()
 
+    # Bring the local replica up to date (at most every LOCAL_REPLICA_REFRESH_SECONDS)
+    replica = init_local_replica()
+    if replica is not None:
+        try:
+            if replica.sync_if_due(session):
+                # Merge delta segments off the script thread; searches keep working
+                threading.Thread(target=replica.compact_if_due, daemon=True).start()
+        except Exception as e:
+            st.warning(f"ローカルレプリカの同期に失敗しました: {str(e)}")
+
+    # 入力補完の索引はデータバージョンが変わったときだけ読み直す
+    autocomplete = init_autocomplete()
+    try:
+        autocomplete.refresh(session)
+    except Exception as e:
+        st.warning(f"入力候補の読み込みに失敗しました: {str(e)}")
+
     # Search interface
     col1, col2 = st.columns([3, 1])
 
@@ -153,52 +211,74 @@ def main():
             "検索キーワード",
             placeholder="例: コード進行, Python, データ分析",
             help="検索したいトピックやキーワードを入力してください",
+            key="query",
         )
 
     with col2:
         num_results = st.number_input(
-            "表示件数", min_value=1, max_value=20, value=5, step=1
+            "表示件数", min_value=1, max_value=20, value=5, step=1, key="num_results"
+        )
+
+    # 入力中のキーワードに合うタイトル・タグの候補（メモリ上の索引から引くだけで
+    # Snowflakeには問い合わせない）。選ぶとそのキーワードで検索する
+    suggestions = autocomplete.suggest(query) if query else []
+    if suggestions and suggestions != [query]:
+        st.pills(
+            "候補",
+            suggestions,
+            key="suggestion",
+            on_change=use_suggestion,
+            label_visibility="collapsed",
         )
 
     # Search button
     if st.button("🔍 検索", type="primary", use_container_width=True):
         if query:
-            with st.spinner("検索中..."):
-                results = search_similar_posts(session, query, num_results)
+            st.session_state["search"] = (query, num_results)
+        else:
+            st.session_state.pop("search", None)
+            st.warning("検索キーワードを入力してください")
+
+    # 最後の検索は他のウィジェット操作による再実行でも表示し続ける
+    # （同じデータバージョンの間は結果キャッシュから返すので問い合わせない）
+    if "search" in st.session_state:
+        searched_query, searched_limit = st.session_state["search"]
+        with st.spinner("検索中..."):
+            results = search_similar_posts(session, searched_query, searched_limit)
 
-                if not results.empty:
-                    st.success(f"{len(results)}件の関連記事が見つかりました")
+        if not results.empty:
+            st.success(f"{len(results)}件の関連記事が見つかりました")
 
-                    # Display results
-                    for _, row in results.iterrows():
-                        format_result_card(row)
-                else:
-                    st.warning("関連する記事が見つかりませんでした")
+            # Display results
+            for _, row in results.iterrows():
+                format_result_card(row)
         else:
-            st.warning("検索キーワードを入力してください")
+            st.warning("関連する記事が見つかりませんでした")
 
     # Sidebar with stats
     with st.sidebar:
         st.header("📊 統計情報")
 
         try:
-            # Get post count
-            post_count = session.sql(
-                "SELECT COUNT(*) as cnt FROM BLOG_POSTS"
-            ).collect()[0]["CNT"]
-            st.metric("総記事数", f"{post_count:,}")
-
-            # Get latest update
-            latest_update = session.sql(
-                "SELECT MAX(updated_at) as latest FROM BLOG_POSTS"
-            ).collect()[0]["LATEST"]
+            if replica is not None and replica.ready:
+                # ローカルレプリカから件数と最終更新を取得
+                stats = replica.stats()
+                post_count, latest_update = stats["post_count"], stats["latest_update"]
+            else:
+                # 記事数と最終更新は1回のクエリで取得し、TTLの間はキャッシュから返す
+                stats = load_post_stats(session)
+                post_count, latest_update = stats["post_count"], stats["latest_update"]
 
+            st.metric("総記事数", f"{post_count:,}")
             if latest_update:
                 st.caption(f"最終更新: {latest_update.strftime('%Y/%m/%d %H:%M')}")
 
         except Exception as e:
             st.error(f"統計情報の取得に失敗しました: {str(e)}")
 
+        cache_stats = init_result_cache()[0].stats()
+        st.caption(f"検索キャッシュ: ヒット {cache_stats['hits']} / ミス {cache_stats['misses']}")
+
         st.divider()
         st.caption("Powered by Snowflake Cortex 🤖")
 
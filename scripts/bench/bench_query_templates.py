@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Benchmark: literal SQL vs bind-variable templates
+
+Runs the same set of distinct search queries twice: once with the query pasted
+into the SQL text (the old f-string style) and once through the fixed
+templates in src/queries.py. Reports total compilation time against the number
+of queries, and how many runs were answered from the result cache.
+
+Usage: python scripts/bench/bench_query_templates.py [distinct_queries] [repeats]
+"""
+
+import sys
+
+sys.path.insert(0, ".")
+
+from scripts.bench.common import fetch_query_stats, inline_params, run_timed, summarize
+from src.config import get_session
+from src.queries import LIKE_SEARCH
+from src.terms import normalize_search_text
+
+WORDS = ["DTM", "コード進行", "ミックス", "Python", "レコーディング", "作曲", "DAW"]
+LIMIT = 5
+
+
+def main():
+    distinct = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    queries = [
+        f"{WORDS[i % len(WORDS)]}{i // len(WORDS) or ''}" for i in range(distinct)
+    ]
+
+    session = get_session()
+
+    try:
+        for name, bound in (("literal", False), ("template", True)):
+            query_ids = []
+            latencies = []
+            for _ in range(repeats):
+                for query in queries:
+                    params = [normalize_search_text(query), LIMIT]
+                    if bound:
+                        query_id, elapsed_ms = run_timed(session, LIKE_SEARCH, params)
+                    else:
+                        sql = inline_params(LIKE_SEARCH, params)
+                        query_id, elapsed_ms = run_timed(session, sql)
+                    query_ids.append(query_id)
+                    latencies.append(elapsed_ms)
+
+            stats = fetch_query_stats(session, query_ids).values()
+            compile_ms = [float(s["COMPILATION_TIME"] or 0) for s in stats]
+            reused = sum(1 for s in stats if not s["EXECUTION_TIME"])
+
+            print(f"=== {name}: {len(query_ids)} queries ({distinct} distinct) ===")
+            print(f"  compile total:   {sum(compile_ms):,.0f}ms")
+            print(f"  compile/query:   {summarize(compile_ms)}")
+            print(f"  client latency:  {summarize(latencies)}")
+            print(f"  result reuse:    {reused}/{len(query_ids)}")
+
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Benchmark: local replica query latency against the number of delta segments
+
+Builds a synthetic BLOG_POSTS replica (src/replica.py) and syncs it from an
+in-memory warehouse that changes a few posts per sync, so each sync appends
+one delta segment. Reports, for a growing number of segments:
+- keyword search latency (base plus deltas, with tombstones applied)
+- the CPU cost of a delta sync compared with rebuilding the whole index
+- how long compaction takes to merge the segments back into one base
+No Snowflake connection is needed.
+
+Usage: python scripts/bench/bench_replica_segments.py [posts] [changed_per_sync]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, ".")
+
+import pyarrow as pa
+
+from scripts.bench.common import percentile
+from src import queries
+from src.replica import LocalReplica
+
+SEGMENT_COUNTS = (1, 2, 4, 8, 16, 32)
+QUERIES = ("dtm", "コード進行", "ミックス", "作曲", "存在しない語句")
+SEARCH_ITERATIONS = 100
+
+# 検索語は記事の一部にだけ現れるよう、ほかの語に混ぜて使う
+WORDS = ("DTM", "コード進行", "ミックス", "作曲", "ギター", "ピアノ", "理論", "録音")
+WORDS += tuple(f"用語{i}" for i in range(200))
+
+
+class FakeResult:
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    def to_arrow(self) -> pa.Table:
+        return self.table
+
+
+class FakeWarehouse:
+    """Answers the replica templates like Snowflake would"""
+
+    def __init__(self, posts: int, rng: random.Random):
+        self.rng = rng
+        self.now = datetime(2024, 7, 1)
+        self.rows = {f"n{i:012d}": self._post(f"n{i:012d}") for i in range(posts)}
+
+    def _post(self, article_id: str) -> dict:
+        title = " ".join(self.rng.sample(WORDS, 2))
+        return {
+            "ARTICLE_ID": article_id,
+            "TITLE": f"{title}の話",
+            "SUMMARY": f"{title}について解説します。" * 3,
+            "BODY_MARKDOWN": f"{' '.join(self.rng.sample(WORDS, 3))}の本文。" * 40,
+            "URL": f"https://note.com/mued/n/{article_id}",
+            "PUBLISHED_AT": self.now,
+            "UPDATED_AT": self.now,
+            "TAGS": None,
+        }
+
+    def change(self, count: int) -> None:
+        """Update count posts and add a new one, one second later than before"""
+        self.now += timedelta(seconds=1)
+        for article_id in self.rng.sample(list(self.rows), count):
+            self.rows[article_id] = self._post(article_id)
+        article_id = f"x{len(self.rows):012d}"
+        self.rows[article_id] = self._post(article_id)
+
+    def sql(self, query: str, params=None) -> FakeResult:
+        if query == queries.REPLICA_COUNT:
+            return FakeResult(pa.table({"POST_COUNT": [len(self.rows)]}))
+        rows = list(self.rows.values())
+        if query == queries.REPLICA_DELTA:
+            rows = [row for row in rows if row["UPDATED_AT"] >= params[0]]
+        return FakeResult(pa.Table.from_pylist(rows))
+
+
+def search_latencies(replica: LocalReplica) -> list[float]:
+    """Search latency in microseconds"""
+    timings = []
+    for i in range(SEARCH_ITERATIONS):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter_ns()
+        replica.search(query, 20)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    return timings
+
+
+def cpu_ms(func) -> float:
+    start = time.process_time()
+    func()
+    return (time.process_time() - start) * 1000
+
+
+def main():
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    warehouse = FakeWarehouse(posts, random.Random(0))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "blog_posts.parquet")
+        replica = LocalReplica(path=path, max_segments=max(SEGMENT_COUNTS))
+        full_ms = cpu_ms(lambda: replica.sync(warehouse))
+
+        print(f"=== search latency ({posts} posts, {changed} changed per sync) ===")
+        delta_ms = []
+        results = {}
+        for segments in SEGMENT_COUNTS:
+            while replica.segment_count < segments:
+                warehouse.change(changed)
+                delta_ms.append(cpu_ms(lambda: replica.sync(warehouse)))
+            timings = search_latencies(replica)
+            results[segments] = percentile(timings, 50)
+            print(
+                f"  {segments:>2} segments: p50={percentile(timings, 50):,.0f}µs "
+                f"p99={percentile(timings, 99):,.0f}µs"
+            )
+
+        compact_ms = cpu_ms(replica.compact)
+        timings = search_latencies(replica)
+        print(f"  compacted:   p50={percentile(timings, 50):,.0f}µs")
+
+    print()
+    print("=== index maintenance (CPU, incl. Parquet writes) ===")
+    print(f"  full rebuild:        {full_ms:,.1f}ms")
+    print(f"  delta sync (median): {percentile(delta_ms, 50):,.1f}ms")
+    print(f"  compaction of {max(SEGMENT_COUNTS)}:   {compact_ms:,.1f}ms")
+    print()
+    base = results[SEGMENT_COUNTS[0]]
+    for segments, p50 in results.items():
+        print(f"{segments:>2} segments: {p50 / base:.2f}x the single-segment latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Benchmark: per-request CPU of /recommend response serialization
+
+Builds an Arrow table shaped like a search query result (what Snowpark
+fetches) and measures the CPU time to turn it into a JSON response body, with
+the old path (pandas -> iterrows -> ArticleRecommendation ->
+RecommendationResponse -> FastAPI's JSON encoding) and the fast paths in
+api/serialization.py (columnar dicts straight from Arrow -> orjson).
+No Snowflake connection is needed.
+
+Usage: python scripts/bench/bench_serialization.py [limit] [iterations]
+"""
+
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, ".")
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.models import ArticleRecommendation, RecommendationResponse
+from api.serialization import dumps, recommendation_payload, records_from_arrow
+from scripts.bench.common import percentile
+
+
+def make_frame(limit: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "article_id": [f"n{i:012d}" for i in range(limit)],
+            "score": [1.0 - i / (limit + 1) for i in range(limit)],
+            "title": [f"DTMでコード進行を学ぶ 第{i}回" for i in range(limit)],
+            "summary": ["コード進行の基本と DAW での打ち込み方を解説します。" * 3] * limit,
+            "url": [f"https://note.com/mued/n/n{i:012d}" for i in range(limit)],
+        }
+    )
+
+
+def old_path(table: pa.Table) -> bytes:
+    df = table.to_pandas().rename(columns=str.lower)
+    recommendations = []
+    for _, row in df.iterrows():
+        rec = row.to_dict()
+        rec["score"] = float(rec["score"])
+        recommendations.append(rec)
+
+    response = RecommendationResponse(
+        student_id="12345",
+        recommendations=[ArticleRecommendation(**rec) for rec in recommendations],
+        total_count=len(recommendations),
+        generated_at=datetime.now(),
+    )
+    # FastAPIのresponse_modelによる再検証とJSONResponseでのエンコード
+    validated = RecommendationResponse.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def arrow_path(table: pa.Table) -> bytes:
+    payload = recommendation_payload("12345", records_from_arrow(table), datetime.now())
+    return dumps(payload)
+
+
+def measure(func, table: pa.Table, iterations: int) -> list[float]:
+    """Per-call CPU time in microseconds"""
+    for _ in range(50):
+        func(table)
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time_ns()
+        func(table)
+        timings.append((time.process_time_ns() - start) / 1000)
+    return timings
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    # APIが受け取るのと同じ、列名が大文字のArrowテーブルから始める
+    table = pa.Table.from_pandas(
+        make_frame(limit).rename(columns=str.upper), preserve_index=False
+    )
+
+    results = {}
+    for name, func in (
+        ("pydantic + iterrows", old_path),
+        ("arrow + orjson", arrow_path),
+    ):
+        timings = measure(func, table, iterations)
+        results[name] = sum(timings) / len(timings)
+        print(f"=== {name} (limit={limit}, {iterations} iterations) ===")
+        print(
+            f"  CPU/request: p50={percentile(timings, 50):,.0f}µs "
+            f"p99={percentile(timings, 99):,.0f}µs mean={results[name]:,.0f}µs"
+        )
+
+    old = results["pydantic + iterrows"]
+    print()
+    for name, mean in list(results.items())[1:]:
+        print(f"{name}: {old / mean:.1f}x ({old:,.0f}µs -> {mean:,.0f}µs per request)")
+
+
+if __name__ == "__main__":
+    main()
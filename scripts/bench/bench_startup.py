@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Benchmark: API import time and time to first request
+
+Measures, in fresh interpreter processes:
+- how long ``import api.main`` takes, and whether Snowpark or pandas were
+  loaded by the import (they should only load when the first session is made)
+- how long ``uvicorn api.main:app`` takes from process start until
+  /health/live answers, and until /health/ready answers (needs Snowflake
+  credentials in .env; reported as n/a when not reached within the timeout)
+
+Pass a history file to append one JSON line per run, so the numbers can be
+tracked across commits.
+
+Usage: python scripts/bench/bench_startup.py [runs] [history.jsonl]
+"""
+
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Optional
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api.main
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "snowpark": "snowflake.snowpark" in sys.modules,
+    "pandas": "pandas" in sys.modules,
+}))
+"""
+
+# /health/ready を待つ上限（Snowflakeに接続できない環境では n/a になる）
+READY_TIMEOUT_SECONDS = float(os.getenv("BENCH_READY_TIMEOUT_SECONDS", "30"))
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float) -> Optional[float]:
+    """Poll until the URL answers 200; return the time it did (None on timeout)"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_first_request() -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        live = wait_for(f"{base_url}/health/live", start + READY_TIMEOUT_SECONDS)
+        ready = wait_for(f"{base_url}/health/ready", start + READY_TIMEOUT_SECONDS)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "live_seconds": live - start if live else None,
+        "ready_seconds": ready - start if ready else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fmt(value: Optional[float]) -> str:
+    return f"{value * 1000:,.0f}ms" if value is not None else "n/a"
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    history = sys.argv[2] if len(sys.argv) > 2 else None
+
+    imports = [measure_import() for _ in range(runs)]
+    import_seconds = statistics.median(run["seconds"] for run in imports)
+    print(f"=== import api.main ({runs} runs) ===")
+    print(f"  median: {fmt(import_seconds)}")
+    print(f"  snowpark loaded at import: {imports[-1]['snowpark']}")
+    print(f"  pandas loaded at import:   {imports[-1]['pandas']}")
+
+    starts = [measure_first_request() for _ in range(runs)]
+    live = [run["live_seconds"] for run in starts if run["live_seconds"] is not None]
+    ready = [run["ready_seconds"] for run in starts if run["ready_seconds"] is not None]
+    live_seconds = statistics.median(live) if live else None
+    ready_seconds = statistics.median(ready) if ready else None
+    print(f"=== uvicorn api.main:app ({runs} runs) ===")
+    print(f"  first /health/live:  {fmt(live_seconds)}")
+    print(f"  first /health/ready: {fmt(ready_seconds)}")
+
+    if history:
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "import_ms": import_seconds * 1000,
+            "live_ms": live_seconds * 1000 if live_seconds is not None else None,
+            "ready_ms": ready_seconds * 1000 if ready_seconds is not None else None,
+            "snowpark_at_import": imports[-1]["snowpark"],
+            "pandas_at_import": imports[-1]["pandas"],
+        }
+        with open(history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nAppended to {os.path.abspath(history)}")
+
+
+if __name__ == "__main__":
+    main()
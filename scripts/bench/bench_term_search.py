@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Benchmark: LIKE search vs term index (BM25) search
+
+Compares bytes scanned and latency of the /recommend fallback queries.
+Requires sql/search_terms.sql to be deployed.
+
+Usage: python scripts/bench/bench_term_search.py [repeats]
+"""
+
+import sys
+
+sys.path.insert(0, ".")
+
+from scripts.bench.common import (
+    disable_result_cache,
+    fetch_query_stats,
+    run_timed,
+    summarize,
+)
+from src.config import get_session
+from src.queries import LIKE_SEARCH, TERM_SEARCH
+from src.terms import normalize_search_text
+
+QUERIES = ["DTM", "コード進行", "ミックス", "Python", "レコーディング"]
+LIMIT = 5
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    session = get_session()
+
+    try:
+        disable_result_cache(session)
+
+        # LIKE検索は正規化済みの列と比べるため、クエリも同じく正規化して渡す
+        templates = {
+            "LIKE": (LIKE_SEARCH, normalize_search_text),
+            "BM25": (TERM_SEARCH, str),
+        }
+
+        for name, (template, prepare) in templates.items():
+            query_ids = []
+            latencies = []
+            for query in QUERIES:
+                for _ in range(repeats):
+                    query_id, elapsed_ms = run_timed(
+                        session, template, [prepare(query), LIMIT]
+                    )
+                    query_ids.append(query_id)
+                    latencies.append(elapsed_ms)
+
+            stats = fetch_query_stats(session, query_ids)
+            scanned = [s["BYTES_SCANNED"] or 0 for s in stats.values()]
+            server = [float(s["TOTAL_ELAPSED_TIME"]) for s in stats.values()]
+
+            print(f"=== {name} ({len(latencies)} queries) ===")
+            print(f"  client latency:  {summarize(latencies)}")
+            print(f"  server elapsed:  {summarize(server)}")
+            if scanned:
+                print(f"  bytes scanned:   avg={sum(scanned) / len(scanned):,.0f}")
+
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
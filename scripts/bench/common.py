@@ -0,0 +1,77 @@
+"""Shared helpers for benchmark scripts"""
+
+import statistics
+import time
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from snowflake.snowpark import Session
+
+
+def disable_result_cache(session: Session) -> None:
+    """Make every run hit the warehouse so timings are comparable"""
+    session.sql("ALTER SESSION SET USE_CACHED_RESULT = FALSE").collect()
+
+
+def run_timed(
+    session: Session, sql: str, params: Optional[Sequence[Any]] = None
+) -> tuple[str, float]:
+    """Run a query and return (query_id, client-side latency in ms)"""
+    with session.query_history() as history:
+        start = time.perf_counter()
+        session.sql(sql, params=list(params) if params else None).collect()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return history.queries[-1].query_id, elapsed_ms
+
+
+def inline_params(template: str, params: Sequence[Any]) -> str:
+    """Paste params into a ``?`` template as literals (the pre-template style)"""
+    sql = template
+    for value in params:
+        if isinstance(value, str):
+            literal = "'" + value.replace("'", "''") + "'"
+        else:
+            literal = str(value)
+        sql = sql.replace("?", literal, 1)
+    return sql
+
+
+def fetch_query_stats(session: Session, query_ids: list[str]) -> dict[str, dict]:
+    """Look up warehouse-side statistics for the given query ids"""
+    if not query_ids:
+        return {}
+
+    id_list = ", ".join(f"'{qid}'" for qid in query_ids)
+    rows = session.sql(
+        f"""
+        SELECT
+            QUERY_ID,
+            BYTES_SCANNED,
+            TOTAL_ELAPSED_TIME,
+            COMPILATION_TIME,
+            EXECUTION_TIME
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 10000))
+        WHERE QUERY_ID IN ({id_list})
+    """
+    ).collect()
+    return {row["QUERY_ID"]: row.as_dict() for row in rows}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: list[float]) -> str:
+    """Format p50/p99/mean for a list of latencies in ms"""
+    if not values:
+        return "n/a"
+    return (
+        f"p50={percentile(values, 50):.1f}ms "
+        f"p99={percentile(values, 99):.1f}ms "
+        f"mean={statistics.mean(values):.1f}ms"
+    )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""Load test: /recommend and /health latency under concurrent clients
+
+Runs against a live server (--url), or starts the API in-process with a fake
+Snowflake session that sleeps for --fake-db-latency-ms per query. The fake
+mode shows whether one slow query stalls unrelated requests such as /health.
+
+Usage:
+    python scripts/bench/load_test_api.py --url http://localhost:8000
+    python scripts/bench/load_test_api.py --fake-db-latency-ms 200 --clients 32
+"""
+
+import argparse
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+sys.path.insert(0, ".")
+
+from scripts.bench.common import summarize
+
+QUERIES = ["DTM", "コード進行", "ミックス", "Python", "レコーディング"]
+
+
+class FakeResult:
+    """Stands in for a Snowpark DataFrame"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        time.sleep(self.latency)
+        return pa.Table.from_pylist(
+            [
+                {
+                    "ARTICLE_ID": f"n{i}",
+                    "SCORE": 1.0,
+                    "TITLE": f"記事 {i}",
+                    "SUMMARY": "要約",
+                    "URL": f"https://note.com/n/n{i}",
+                }
+                for i in range(5)
+            ]
+        )
+
+    def to_pandas(self):
+        return self.to_arrow().to_pandas()
+
+    def collect(self):
+        time.sleep(self.latency)
+        return [{"LATEST": None, "1": 1}]
+
+
+class FakeSession:
+    """Snowpark Session replacement with a fixed per-query latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def sql(self, query: str, params=None) -> FakeResult:
+        return FakeResult(self.latency)
+
+    @contextmanager
+    def query_history(self):
+        yield SimpleNamespace(queries=[])
+
+    def close(self) -> None:
+        pass
+
+
+def start_fake_server(latency_ms: float, port: int) -> str:
+    """Start the API in a background thread backed by FakeSession"""
+    import uvicorn
+
+    import api.main
+
+    api.main.get_snowflake_session = lambda: FakeSession(latency_ms / 1000)
+
+    config = uvicorn.Config(api.main.app, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def timed_get(url: str) -> float:
+    """GET a URL and return latency in ms"""
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=60) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def client(base_url: str, client_id: int, requests: int) -> dict[str, list[float]]:
+    """One client: alternates search requests and health checks"""
+    latencies = {"recommend": [], "health": []}
+    for i in range(requests):
+        # Unique queries per request so the result cache doesn't hide the warehouse
+        query = f"{QUERIES[i % len(QUERIES)]} {client_id}-{i}"
+        params = urllib.parse.urlencode(
+            {"student_id": str(client_id), "query": query, "limit": 5}
+        )
+        latencies["recommend"].append(timed_get(f"{base_url}/recommend?{params}"))
+        latencies["health"].append(timed_get(f"{base_url}/health"))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running API server")
+    parser.add_argument("--fake-db-latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="per client")
+    args = parser.parse_args()
+
+    base_url = args.url or start_fake_server(args.fake_db_latency_ms, args.port)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(
+            pool.map(
+                lambda cid: client(base_url, cid, args.requests),
+                range(args.clients),
+            )
+        )
+    wall = time.perf_counter() - start
+
+    print(f"=== {args.clients} clients x {args.requests} requests ({wall:.1f}s) ===")
+    for endpoint in ("recommend", "health"):
+        values = [v for r in results for v in r[endpoint]]
+        print(f"  /{endpoint:<10} {summarize(values)}")
+
+
+if __name__ == "__main__":
+    main()
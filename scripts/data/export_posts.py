@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Export BLOG_POSTS to a Parquet file, streaming Arrow batches
+
+Only one Arrow batch is held in memory at a time, so peak memory stays flat
+regardless of table size.
+
+Usage: python scripts/data/export_posts.py [output.parquet]
+"""
+
+import sys
+
+sys.path.insert(0, ".")
+
+import pyarrow.parquet as pq
+
+from src.config import get_session
+from src.queries import iter_arrow_batches
+
+EXPORT_POSTS = """
+SELECT id, title, url, published_at, tags, summary, body_markdown, updated_at
+FROM BLOG_POSTS
+"""
+
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else "blog_posts.parquet"
+    session = get_session()
+
+    try:
+        writer = None
+        rows = 0
+        for batch in iter_arrow_batches(session, EXPORT_POSTS):
+            if writer is None:
+                writer = pq.ParquetWriter(output, batch.schema, compression="zstd")
+            writer.write_table(batch)
+            rows += batch.num_rows
+            print(f"  {rows:,} rows written...")
+
+        if writer is not None:
+            writer.close()
+        print(f"\n✓ Exported {rows:,} posts to {output}")
+
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,11 @@ def main():
                 FROM CORE.BLOG_POSTS,
                 LATERAL SPLIT_TO_TABLE(BODY, '\n\n')
                 WHERE LENGTH(TRIM(value)) > 50  -- Minimum chunk size
+                  -- Skip near-duplicates of another article
+                  AND ID NOT IN (
+                      SELECT ARTICLE_ID FROM CORE.ARTICLE_DUPLICATES
+                      WHERE ARTICLE_ID != CANONICAL_ID
+                  )
             )
             SELECT
                 ARTICLE_ID,
@@ -39,7 +39,12 @@ def main():
                     LENGTH(TRIM(value)) as CHUNK_LENGTH
                 FROM CORE.BLOG_POSTS,
                 LATERAL SPLIT_TO_TABLE(BODY, '\n\n')
-                WHERE LENGTH(TRIM(value)) > 100;  -- Minimum chunk size
+                WHERE LENGTH(TRIM(value)) > 100  -- Minimum chunk size
+                  -- Skip near-duplicates of another article
+                  AND ID NOT IN (
+                      SELECT ARTICLE_ID FROM CORE.ARTICLE_DUPLICATES
+                      WHERE ARTICLE_ID != CANONICAL_ID
+                  );
 
                 RETURN 'Created ' || SQLROWCOUNT || ' chunks';
             END;
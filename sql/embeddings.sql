@@ -78,7 +78,12 @@ BEGIN
         CONCAT(bp.TITLE, '\n\n', bp.BODY),
         1000,  -- chunk size
         200    -- overlap
-    )) c;
+    )) c
+    -- Skip near-duplicates of another article (sql/near_duplicates.sql)
+    WHERE bp.ID NOT IN (
+        SELECT ARTICLE_ID FROM CORE.ARTICLE_DUPLICATES
+        WHERE ARTICLE_ID != CANONICAL_ID
+    );
 
     SELECT COUNT(*) INTO chunks_created FROM STG.ARTICLE_CHUNKS;
 
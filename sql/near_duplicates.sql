@@ -0,0 +1,29 @@
+-- Near-duplicate article clusters
+-- Filled by the batch job `python -m src.near_duplicates` (also run by the
+-- ingestion pipeline after each merge). Chunking (sql/embeddings.sql), the
+-- Cortex embedding in src/transform.sql and the search templates in
+-- src/queries.py skip or collapse the non-canonical members of a cluster.
+-- Run after sql/search_normalization.sql (signatures are built from BODY_NORM).
+USE DATABASE MUED;
+
+-- MinHash signature per article (128 x uint32, little-endian), recomputed only
+-- when the article's UPDATED_AT moves past SOURCE_UPDATED_AT
+CREATE TABLE IF NOT EXISTS CORE.ARTICLE_MINHASH (
+    ARTICLE_ID VARCHAR(36) NOT NULL,
+    SIGNATURE BINARY NOT NULL,
+    PUBLISHED_AT TIMESTAMP_NTZ,
+    SOURCE_UPDATED_AT TIMESTAMP_NTZ,
+    COMPUTED_AT TIMESTAMP_NTZ NOT NULL,
+    PRIMARY KEY (ARTICLE_ID)
+);
+
+-- One row per article in a cluster of two or more near-duplicates
+-- CANONICAL_ID is the earliest published member; SIMILARITY is the estimated
+-- Jaccard similarity of the article's body to the canonical one
+CREATE TABLE IF NOT EXISTS CORE.ARTICLE_DUPLICATES (
+    ARTICLE_ID VARCHAR(36) NOT NULL,
+    CANONICAL_ID VARCHAR(36) NOT NULL,
+    SIMILARITY FLOAT NOT NULL,
+    COMPUTED_AT TIMESTAMP_NTZ NOT NULL,
+    PRIMARY KEY (ARTICLE_ID)
+);
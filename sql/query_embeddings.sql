@@ -0,0 +1,12 @@
+-- Persistent tier of the query-embedding cache
+-- Filled by src/query_embeddings.py when QUERY_EMBEDDING_TABLE=true; each
+-- distinct normalized search query is embedded with Cortex only once.
+USE DATABASE MUED;
+
+-- One row per normalized query text (e5-base-v2, 768 dimensions)
+CREATE TABLE IF NOT EXISTS CORE.QUERY_EMBEDDINGS (
+    QUERY_TEXT VARCHAR(1000) NOT NULL,
+    EMB VECTOR(FLOAT, 768) NOT NULL,
+    CREATED_AT TIMESTAMP_NTZ NOT NULL,
+    PRIMARY KEY (QUERY_TEXT)
+);
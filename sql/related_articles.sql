@@ -0,0 +1,16 @@
+-- Precomputed related articles
+-- Filled by the batch job `python -m src.related`; served by GET /articles/{id}/related.
+USE DATABASE MUED;
+
+-- Top-k neighbours per article (one row per neighbour)
+-- METHOD is 'embedding' (mean chunk embedding) or 'lexical' (hashed TF-IDF)
+CREATE TABLE IF NOT EXISTS CORE.RELATED_ARTICLES (
+    ARTICLE_ID VARCHAR(36) NOT NULL,
+    RANK INTEGER NOT NULL,
+    RELATED_ID VARCHAR(36) NOT NULL,
+    SCORE FLOAT NOT NULL,
+    METHOD VARCHAR(16) NOT NULL,
+    COMPUTED_AT TIMESTAMP_NTZ NOT NULL,
+    PRIMARY KEY (ARTICLE_ID, RANK)
+)
+CLUSTER BY (ARTICLE_ID);
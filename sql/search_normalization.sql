@@ -0,0 +1,37 @@
+-- Normalized shadow columns for keyword (LIKE) search
+-- Run after the BLOG_POSTS table exists and before src/transform.sql or
+-- src/transform_basic.sql (the merges fill the columns with this function).
+-- LIKE_SEARCH / UI_LIKE_SEARCH compare the pre-folded columns with a query
+-- folded the same way in Python (src/terms.py normalize_search_text).
+USE DATABASE MUED;
+
+-- NFKC (full-width -> half-width), lower case, hiragana -> katakana and
+-- single spaces, so that "ＤＴＭ" matches "dtm" and "まいく" matches "マイク"
+CREATE OR REPLACE FUNCTION STG.NORMALIZE_SEARCH_TEXT(text VARCHAR)
+RETURNS VARCHAR
+LANGUAGE JAVASCRIPT
+AS
+$$
+    if (TEXT === null || TEXT === undefined) return null;
+    return TEXT.normalize('NFKC')
+        .toLowerCase()
+        .replace(/[ぁ-ゖゝゞ]/g, function (c) {
+            return String.fromCharCode(c.charCodeAt(0) + 0x60);
+        })
+        .replace(/\s+/g, ' ')
+        .trim();
+$$;
+
+USE SCHEMA PUBLIC;
+
+ALTER TABLE BLOG_POSTS ADD COLUMN IF NOT EXISTS title_norm VARCHAR;
+ALTER TABLE BLOG_POSTS ADD COLUMN IF NOT EXISTS summary_norm VARCHAR;
+ALTER TABLE BLOG_POSTS ADD COLUMN IF NOT EXISTS body_norm VARCHAR;
+
+-- Backfill the rows merged before the columns existed
+UPDATE BLOG_POSTS
+SET
+    title_norm = STG.NORMALIZE_SEARCH_TEXT(title),
+    summary_norm = STG.NORMALIZE_SEARCH_TEXT(summary),
+    body_norm = STG.NORMALIZE_SEARCH_TEXT(body_markdown)
+WHERE title_norm IS NULL;
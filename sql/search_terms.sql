@@ -0,0 +1,204 @@
+-- Term index extension for warehouse-side text search (BM25)
+-- Run after sql/setup.sql. /recommend uses this index when SEARCH_TERM_INDEX=true.
+USE DATABASE MUED;
+
+-- Tokenizer shared by indexing and query time
+-- ASCII words are lowercased, Japanese runs are split into character bigrams
+CREATE OR REPLACE FUNCTION STG.TOKENIZE_TERMS(text VARCHAR)
+RETURNS TABLE (term VARCHAR, tf INTEGER)
+LANGUAGE JAVASCRIPT
+AS
+$$
+{
+    processRow: function (row, rowWriter, context) {
+        if (!row.TEXT) return;
+
+        var text = row.TEXT.normalize('NFKC').toLowerCase();
+        var counts = {};
+        var add = function (term) {
+            counts[term] = (counts[term] || 0) + 1;
+        };
+
+        (text.match(/[a-z0-9]+/g) || []).forEach(add);
+
+        var runs = text.match(/[\u3041-\u30ff\u3400-\u9fff]+/g) || [];
+        runs.forEach(function (run) {
+            if (run.length === 1) {
+                add(run);
+                return;
+            }
+            for (var i = 0; i < run.length - 1; i++) {
+                add(run.substr(i, 2));
+            }
+        });
+
+        for (var term in counts) {
+            rowWriter.writeRow({TERM: term, TF: counts[term]});
+        }
+    }
+}
+$$;
+
+-- Postings: one row per (term, article, field)
+CREATE TABLE IF NOT EXISTS STG.ARTICLE_TERMS (
+    TERM VARCHAR(100),
+    ARTICLE_ID VARCHAR(36),
+    FIELD VARCHAR(16),
+    TF INTEGER
+)
+CLUSTER BY (TERM);
+
+-- Field lengths (in terms) per article, used for BM25 length normalization
+CREATE TABLE IF NOT EXISTS STG.ARTICLE_FIELD_LENGTHS (
+    ARTICLE_ID VARCHAR(36),
+    FIELD VARCHAR(16),
+    DOC_LEN INTEGER
+);
+
+-- Document frequency per (term, field)
+CREATE TABLE IF NOT EXISTS STG.TERM_STATS (
+    TERM VARCHAR(100),
+    FIELD VARCHAR(16),
+    DF INTEGER
+)
+CLUSTER BY (TERM);
+
+-- Highest BLOG_POSTS.updated_at already indexed
+CREATE TABLE IF NOT EXISTS STG.ARTICLE_TERMS_WATERMARK (
+    LAST_UPDATED_AT TIMESTAMP_NTZ,
+    REFRESHED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Change trigger for the refresh task. PUBLIC.BLOG_POSTS is written by the
+-- Python loaders, not by a task, so the refresh is scheduled and only runs when
+-- this stream has data. The procedure advances the stream itself; which rows to
+-- index is still decided by the watermark.
+CREATE STREAM IF NOT EXISTS CORE.BLOG_POSTS_TERMS_STREAM ON TABLE PUBLIC.BLOG_POSTS;
+
+-- Corpus statistics per field
+CREATE OR REPLACE VIEW STG.CORPUS_STATS AS
+SELECT
+    FIELD,
+    COUNT(*) AS N_DOCS,
+    AVG(DOC_LEN) AS AVG_DOC_LEN
+FROM STG.ARTICLE_FIELD_LENGTHS
+GROUP BY FIELD;
+
+-- Incremental refresh: re-index only articles updated since the last run and
+-- drop articles that no longer exist in BLOG_POSTS. The watermark comparison is
+-- >= so rows sharing the last-seen timestamp are not missed; re-indexing them
+-- is idempotent because an article's postings are deleted before insertion.
+CREATE OR REPLACE PROCEDURE STG.REFRESH_ARTICLE_TERMS()
+RETURNS VARCHAR
+LANGUAGE SQL
+AS
+$$
+DECLARE
+    watermark TIMESTAMP_NTZ;
+    articles_indexed INTEGER DEFAULT 0;
+    articles_removed INTEGER DEFAULT 0;
+BEGIN
+    -- Advance the trigger stream first, so changes made while this runs fire the
+    -- next task run (a DML statement reading a stream moves its offset)
+    INSERT INTO STG.ARTICLE_TERMS_WATERMARK (LAST_UPDATED_AT)
+    SELECT updated_at FROM CORE.BLOG_POSTS_TERMS_STREAM WHERE FALSE;
+
+    SELECT COALESCE(MAX(LAST_UPDATED_AT), '1970-01-01'::TIMESTAMP_NTZ)
+    INTO :watermark
+    FROM STG.ARTICLE_TERMS_WATERMARK;
+
+    CREATE OR REPLACE TEMPORARY TABLE CHANGED_ARTICLES AS
+    SELECT id, title, summary, body_markdown, updated_at
+    FROM PUBLIC.BLOG_POSTS
+    WHERE updated_at >= :watermark;
+
+    CREATE OR REPLACE TEMPORARY TABLE REMOVED_ARTICLES AS
+    SELECT DISTINCT ARTICLE_ID AS id
+    FROM STG.ARTICLE_FIELD_LENGTHS
+    WHERE ARTICLE_ID NOT IN (SELECT id FROM PUBLIC.BLOG_POSTS);
+
+    SELECT COUNT(*) INTO :articles_indexed FROM CHANGED_ARTICLES;
+    SELECT COUNT(*) INTO :articles_removed FROM REMOVED_ARTICLES;
+    IF (articles_indexed = 0 AND articles_removed = 0) THEN
+        RETURN 'No articles to index';
+    END IF;
+
+    -- Articles whose existing postings are replaced or dropped
+    CREATE OR REPLACE TEMPORARY TABLE STALE_ARTICLES AS
+    SELECT id FROM CHANGED_ARTICLES
+    UNION
+    SELECT id FROM REMOVED_ARTICLES;
+
+    -- Terms are truncated to the TERM column width here, once, so postings and
+    -- document frequencies use the same value (tokens sharing a prefix merge)
+    CREATE OR REPLACE TEMPORARY TABLE NEW_TERMS AS
+    SELECT LEFT(term, 100) AS term, article_id, field, SUM(tf) AS tf
+    FROM (
+        SELECT t.term, c.id AS article_id, 'TITLE' AS field, t.tf
+        FROM CHANGED_ARTICLES c, TABLE(STG.TOKENIZE_TERMS(c.title)) t
+        UNION ALL
+        SELECT t.term, c.id, 'SUMMARY', t.tf
+        FROM CHANGED_ARTICLES c, TABLE(STG.TOKENIZE_TERMS(c.summary)) t
+        UNION ALL
+        SELECT t.term, c.id, 'BODY', t.tf
+        FROM CHANGED_ARTICLES c, TABLE(STG.TOKENIZE_TERMS(c.body_markdown)) t
+    )
+    GROUP BY LEFT(term, 100), article_id, field;
+
+    -- Terms whose document frequency changes: old postings plus new postings
+    CREATE OR REPLACE TEMPORARY TABLE AFFECTED_TERMS AS
+    SELECT DISTINCT TERM, FIELD
+    FROM STG.ARTICLE_TERMS
+    WHERE ARTICLE_ID IN (SELECT id FROM STALE_ARTICLES)
+    UNION
+    SELECT DISTINCT term, field FROM NEW_TERMS;
+
+    DELETE FROM STG.ARTICLE_TERMS
+    WHERE ARTICLE_ID IN (SELECT id FROM STALE_ARTICLES);
+
+    INSERT INTO STG.ARTICLE_TERMS (TERM, ARTICLE_ID, FIELD, TF)
+    SELECT term, article_id, field, tf FROM NEW_TERMS;
+
+    DELETE FROM STG.ARTICLE_FIELD_LENGTHS
+    WHERE ARTICLE_ID IN (SELECT id FROM STALE_ARTICLES);
+
+    INSERT INTO STG.ARTICLE_FIELD_LENGTHS (ARTICLE_ID, FIELD, DOC_LEN)
+    SELECT article_id, field, SUM(tf)
+    FROM NEW_TERMS
+    GROUP BY article_id, field;
+
+    DELETE FROM STG.TERM_STATS s
+    USING AFFECTED_TERMS a
+    WHERE s.TERM = a.TERM AND s.FIELD = a.FIELD;
+
+    INSERT INTO STG.TERM_STATS (TERM, FIELD, DF)
+    SELECT t.TERM, t.FIELD, COUNT(*)
+    FROM STG.ARTICLE_TERMS t
+    JOIN AFFECTED_TERMS a ON t.TERM = a.TERM AND t.FIELD = a.FIELD
+    GROUP BY t.TERM, t.FIELD;
+
+    INSERT INTO STG.ARTICLE_TERMS_WATERMARK (LAST_UPDATED_AT)
+    SELECT MAX(updated_at) FROM CHANGED_ARTICLES
+    HAVING MAX(updated_at) IS NOT NULL;
+
+    RETURN 'Indexed ' || articles_indexed || ' articles, removed '
+        || articles_removed;
+END;
+$$;
+
+-- Keep the index in step with PUBLIC.BLOG_POSTS. A child task must live in its
+-- predecessor's schema, and CORE.MERGE_BLOG_POSTS_TASK maintains CORE.BLOG_POSTS,
+-- so this is a standalone task guarded by the stream above.
+DROP TASK IF EXISTS STG.REFRESH_ARTICLE_TERMS_TASK;
+CREATE OR REPLACE TASK CORE.REFRESH_ARTICLE_TERMS_TASK
+    WAREHOUSE = COMPUTE_WH
+    SCHEDULE = '5 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('CORE.BLOG_POSTS_TERMS_STREAM')
+AS
+    CALL STG.REFRESH_ARTICLE_TERMS();
+
+-- Initial build (the first call indexes every article)
+CALL STG.REFRESH_ARTICLE_TERMS();
+
+-- Enable the task
+ALTER TASK CORE.REFRESH_ARTICLE_TERMS_TASK RESUME;
@@ -0,0 +1,26 @@
+-- Per-student recommendations
+-- The LMS appends to CORE.STUDENT_INTERACTIONS; the batch job
+-- `python -m src.student_recommendations` rebuilds CORE.STUDENT_RECOMMENDATIONS
+-- from it and CORE.RELATED_ARTICLES (run sql/related_articles.sql first).
+USE DATABASE MUED;
+
+-- Student interaction log (append-only)
+-- EVENT_TYPE: view / read / bookmark / like
+CREATE TABLE IF NOT EXISTS CORE.STUDENT_INTERACTIONS (
+    STUDENT_ID VARCHAR(64) NOT NULL,
+    ARTICLE_ID VARCHAR(36) NOT NULL,
+    EVENT_TYPE VARCHAR(16) NOT NULL DEFAULT 'view',
+    OCCURRED_AT TIMESTAMP_NTZ NOT NULL DEFAULT CURRENT_TIMESTAMP()
+)
+CLUSTER BY (TO_DATE(OCCURRED_AT));
+
+-- Precomputed top-N per student (one row per recommended article)
+CREATE TABLE IF NOT EXISTS CORE.STUDENT_RECOMMENDATIONS (
+    STUDENT_ID VARCHAR(64) NOT NULL,
+    RANK INTEGER NOT NULL,
+    ARTICLE_ID VARCHAR(36) NOT NULL,
+    SCORE FLOAT NOT NULL,
+    COMPUTED_AT TIMESTAMP_NTZ NOT NULL,
+    PRIMARY KEY (STUDENT_ID, RANK)
+)
+CLUSTER BY (STUDENT_ID);
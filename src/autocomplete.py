@@ -0,0 +1,176 @@
+"""
+In-memory prefix index for search-as-you-type suggestions
+
+Article titles and tags are folded with normalize_search_text() (the same
+folding as keyword search) and kept as a sorted array of keys, so the
+suggestions for what the user has typed so far are one bisect into memory
+and never a warehouse query. Every suffix of a title is a key too, which
+makes a prefix lookup find a word in the middle of a title (Japanese titles
+have no spaces to split on). Matches at the start of a tag or title rank
+before matches inside a title; tags rank by the number of articles, titles
+by recency.
+
+The index is rebuilt only when the data version (MAX(updated_at) of
+BLOG_POSTS) changes.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+from collections import Counter
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+
+from src.cache import fetch_data_version
+from src.queries import AUTOCOMPLETE_SOURCE, run_query
+from src.terms import normalize_search_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from snowflake.snowpark import Session
+
+# 1回に返す候補の数
+AUTOCOMPLETE_LIMIT = int(os.getenv("AUTOCOMPLETE_LIMIT", "8"))
+
+# bisectの上限に使う、どの文字よりも後ろに並ぶ文字
+_MAX_CHAR = "\U0010ffff"
+
+
+def load_autocomplete_source(session: Session) -> pd.DataFrame:
+    """Titles, tags and publish dates of all posts (lower-case column names)"""
+    return run_query(session, AUTOCOMPLETE_SOURCE).rename(columns=str.lower)
+
+
+def _parse_tags(value: Any) -> list[str]:
+    """Tags as a list (ARRAY columns arrive as JSON text)"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(tag) for tag in value if tag]
+    return []
+
+
+class _Index:
+    """Sorted keys with the suggestion and rank of each key"""
+
+    def __init__(self, texts: list[str], entries: list[tuple[str, int, int]]):
+        entries.sort()
+        self.texts = texts
+        self.keys = [key for key, _, _ in entries]
+        self.items = np.array([item for _, item, _ in entries], dtype=np.int64)
+        self.ranks = np.array([rank for _, _, rank in entries], dtype=np.int64)
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> _Index:
+        import pandas as pd
+
+        tag_counts: Counter = Counter()
+        for value in frame["tags"] if "tags" in frame else ():
+            tag_counts.update(set(_parse_tags(value)))
+        titles = frame.assign(
+            published_at=pd.to_datetime(frame["published_at"], errors="coerce")
+        ).sort_values("published_at", ascending=False, na_position="last")
+        titles = list(dict.fromkeys(t for t in titles["title"] if t))
+        tags = [tag for tag, _ in sorted(tag_counts.items(), key=lambda t: -t[1])]
+
+        # 順位: 先頭一致（タグ→タイトル）の後に、タイトルの途中の一致
+        texts = tags + titles
+        inside = len(texts)
+        entries = []
+        for item, text in enumerate(texts):
+            key = normalize_search_text(text)
+            if not key:
+                continue
+            entries.append((key, item, item))
+            if item >= len(tags):
+                for start in range(1, len(key)):
+                    if key[start] != " ":
+                        entries.append((key[start:], item, inside + item))
+        return cls(texts, entries)
+
+    def suggest(self, prefix: str, limit: int) -> list[str]:
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, lo)
+        if lo == hi:
+            return []
+        ranks = self.ranks[lo:hi]
+        items = self.items[lo:hi]
+        # 同じ候補の複数の一致は最も良い順位だけ残す
+        order = np.argsort(ranks, kind="stable")
+        _, first = np.unique(items[order], return_index=True)
+        best = order[np.sort(first)]
+        best = best[np.argsort(ranks[best], kind="stable")][:limit]
+        return [self.texts[i] for i in items[best]]
+
+
+class AutocompleteIndex:
+    """Prefix index over titles and tags, rebuilt when the data version changes"""
+
+    def __init__(
+        self,
+        load: Callable[[Session], pd.DataFrame] = load_autocomplete_source,
+        fetch_version: Callable[[Session], Any] = fetch_data_version,
+    ):
+        self._load = load
+        self._fetch_version = fetch_version
+        self._lock = threading.Lock()
+        self._version: Any = None
+        # 差し替えのみのスナップショット（読み手はロック不要）
+        self._index: Optional[_Index] = None
+        self.refreshes = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index is loaded"""
+        return self._index is not None
+
+    def refresh(self, session: Session) -> bool:
+        """
+        Rebuild the index if the data version changed
+
+        Returns:
+            True if the index was rebuilt
+        """
+        with self._lock:
+            version = self._fetch_version(session)
+            if self._index is not None and version == self._version:
+                return False
+
+            self._index = _Index.build(self._load(session))
+            self._version = version
+            self.refreshes += 1
+            return True
+
+    def suggest(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[str]:
+        """
+        Titles and tags that contain a word starting with the typed text
+
+        Args:
+            prefix: Text typed so far (folded like keyword search)
+            limit: Maximum number of suggestions
+
+        Returns:
+            Suggestions, best first (empty until the index is loaded)
+        """
+        index = self._index
+        key = normalize_search_text(prefix)
+        if index is None or not key:
+            return []
+        return index.suggest(key, limit)
+
+    def stats(self) -> dict[str, int]:
+        """Index size and rebuild count"""
+        index = self._index
+        return {
+            "suggestions": len(index.texts) if index else 0,
+            "keys": len(index.keys) if index else 0,
+            "refreshes": self.refreshes,
+        }
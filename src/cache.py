@@ -0,0 +1,196 @@
+"""
+In-process result cache shared by the API and the Streamlit UI
+
+Entries are evicted in LRU order once the cache is full, expire after a TTL,
+and are all invalidated when the data version (MAX(updated_at) of BLOG_POSTS)
+changes. The last good value per key is kept separately so callers can serve
+a stale result while Snowflake is slow or unavailable.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+# 定数
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "30"))
+
+
+class ResultCache:
+    """Thread-safe LRU cache with TTL and data-version invalidation"""
+
+    def __init__(
+        self,
+        maxsize: int = RESULT_CACHE_SIZE,
+        ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # TTLやデータ更新では消さない最後の正常な値（LRUでmaxsizeまで保持）
+        self._last_good: OrderedDict[Hashable, Any] = OrderedDict()
+        self._version: Any = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    def _check_version(self, version: Any) -> None:
+        """Drop every entry when the data version changes (lock must be held)"""
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key
+            version: Current data version
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, version: Any = None) -> None:
+        """Store a value computed against the given data version"""
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+            self._last_good[key] = value
+            self._last_good.move_to_end(key)
+            while len(self._last_good) > self.maxsize:
+                self._last_good.popitem(last=False)
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the last value stored for a key, ignoring TTL and data version
+
+        Returns:
+            Last good value, or None if the key was never stored
+        """
+        with self._lock:
+            value = self._last_good.get(key)
+            if value is not None:
+                self._last_good.move_to_end(key)
+            return value
+
+    def record_stale_hit(self) -> None:
+        """Count a response served from get_stale()"""
+        with self._lock:
+            self.stale_hits += 1
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._last_good.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_hits": self.stale_hits,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def fetch_data_version(session: Session) -> Any:
+    """Return MAX(updated_at) of BLOG_POSTS (answered from table metadata)"""
+    rows = session.sql("SELECT MAX(updated_at) as latest FROM BLOG_POSTS").collect()
+    return rows[0]["LATEST"]
+
+
+class DataVersion:
+    """
+    Throttled data-version probe so cache lookups don't query every time
+
+    When the version is due, one caller refreshes it outside the lock while
+    the others keep returning the previous version, so a slow warehouse does
+    not serialize every lookup (and its pool session) behind the query. Only
+    the very first fetch is waited for, since there is nothing to return yet.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Session], Any] = fetch_data_version,
+        check_seconds: float = DATA_VERSION_CHECK_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self.check_seconds = check_seconds
+        self._clock = clock
+        self._value: Any = None
+        self._checked_at: Optional[float] = None
+        self._refreshing = False
+        self._cond = threading.Condition()
+
+    def current(self, session: Session) -> Any:
+        """Return the data version, re-checking at most every check_seconds"""
+        with self._cond:
+            while True:
+                now = self._clock()
+                if (
+                    self._checked_at is not None
+                    and now - self._checked_at < self.check_seconds
+                ):
+                    return self._value
+                if not self._refreshing:
+                    self._refreshing = True
+                    break
+                if self._checked_at is not None:
+                    # 他の呼び出し元が更新中: 前のバージョンを返す
+                    return self._value
+                self._cond.wait()
+
+        try:
+            value = self._fetch(session)
+        except BaseException:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._value = value
+            self._checked_at = now
+            self._refreshing = False
+            self._cond.notify_all()
+        return value
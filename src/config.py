@@ -1,11 +1,19 @@
+from __future__ import annotations
+
 import os
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from snowflake.snowpark import Session
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
 
 
 # セッションの初期化
 def get_session() -> Session:
+    # Snowparkの読み込みは重いため、最初のセッション作成時まで遅らせる
+    from snowflake.snowpark import Session
+
     load_dotenv()
 
     connection_params = {
@@ -19,3 +27,8 @@ def get_session() -> Session:
     }
 
     return Session.builder.configs(connection_params).create()
+
+
+# API・取り込みスクリプトから利用される別名
+def get_snowflake_session() -> Session:
+    return get_session()
@@ -2,6 +2,7 @@ import sys
 
 from .config import get_session
 from .loader import enable_task, execute_merge, get_task_status, load_rss_to_raw
+from .near_duplicates import refresh_near_duplicates
 
 
 # メイン関数
@@ -29,6 +30,17 @@ def main():
             merge_result = execute_merge(session)
             print(f"Merge result: {merge_result}")
 
+            # 準重複の検出は失敗しても取り込み自体は続ける
+            print("Detecting near-duplicate articles...")
+            try:
+                hashed, clustered = refresh_near_duplicates(session)
+                print(
+                    f"Near-duplicates: hashed {hashed} articles, "
+                    f"{clustered} articles in clusters"
+                )
+            except Exception as e:
+                print(f"⚠️ Near-duplicate detection skipped: {e}")
+
             print("Enabling automatic merge task...")
             task_result = enable_task(session)
             print(f"Task result: {task_result}")
@@ -0,0 +1,350 @@
+"""
+Near-Duplicate Detection Batch Job
+
+Finds cross-posted, lightly edited or re-published articles and stores them as
+clusters in CORE.ARTICLE_DUPLICATES (sql/near_duplicates.sql). Each article
+body (the folded BODY_NORM column) is cut into character shingles and reduced
+to a MinHash signature whose agreement with another signature estimates the
+Jaccard similarity of the two shingle sets. Locality-sensitive hashing over
+bands of the signature finds candidate pairs without comparing every pair,
+and candidates at or above NEAR_DUPLICATE_THRESHOLD are joined into clusters.
+
+The job is incremental: signatures are kept in CORE.ARTICLE_MINHASH with the
+UPDATED_AT they were computed from, so each run only fetches and hashes new
+or changed articles, then re-clusters all signatures in memory.
+
+With USE_CORTEX=true the BLOG_POSTS.emb column (src/transform.sql) follows the
+clusters: non-canonical members lose their embedding, and articles that are no
+longer a non-canonical member are embedded again right away instead of at
+their next update.
+
+Usage:
+    python -m src.near_duplicates
+"""
+
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from snowflake.snowpark import Session
+
+from src.config import get_snowflake_session
+from src.queries import fetch_arrow, to_numpy_columns
+from src.related import replace_table
+
+# 定数
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# BLOG_POSTS.emb はCortexの変換（src/transform.sql）でだけ作られる
+USE_CORTEX = os.getenv("USE_CORTEX", "false").lower() == "true"
+NUM_PERMUTATIONS = 128
+# 16バンド x 8行: 類似度0.8のペアは約97%、0.5のペアは約6%が候補になる
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+# これより短い本文は比べない（定型文だけの記事が重複扱いになるのを防ぐ）
+MIN_BODY_CHARS = 50
+SIGNATURE_TABLE = "CORE.ARTICLE_MINHASH"
+TABLE_NAME = "CORE.ARTICLE_DUPLICATES"
+
+# 2^32未満の最大の素数（ハッシュ値とパラメータが32ビットなので積は64ビットに収まる）
+_PRIME = np.uint64(4294967291)
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+CHANGED_POSTS = f"""
+SELECT b.id as article_id, b.body_norm, b.published_at, b.updated_at
+FROM BLOG_POSTS b
+LEFT JOIN {SIGNATURE_TABLE} m ON m.article_id = b.id
+WHERE m.article_id IS NULL OR b.updated_at > m.source_updated_at
+"""
+
+STORED_SIGNATURES = f"""
+SELECT m.article_id, m.signature, m.published_at
+FROM {SIGNATURE_TABLE} m
+JOIN BLOG_POSTS b ON b.id = m.article_id
+"""
+
+DELETE_STALE_SIGNATURES = f"""
+DELETE FROM {SIGNATURE_TABLE}
+WHERE article_id NOT IN (SELECT id FROM BLOG_POSTS)
+"""
+
+NON_CANONICAL = f"""
+SELECT article_id FROM {TABLE_NAME} WHERE article_id != canonical_id
+"""
+
+CLEAR_DUPLICATE_EMBEDDINGS = f"""
+UPDATE BLOG_POSTS b
+SET emb = NULL
+FROM {TABLE_NAME} d
+WHERE d.article_id = b.id
+  AND d.canonical_id != d.article_id
+  AND b.emb IS NOT NULL
+"""
+
+# params: [JSON array of article ids]
+# src/transform.sql と同じ入力で埋め込み直す
+RESTORE_EMBEDDINGS = """
+UPDATE BLOG_POSTS
+SET emb = SNOWFLAKE.CORTEX.EMBED_TEXT_768(
+    'e5-base-v2',
+    CONCAT(title, ' ', COALESCE(LEFT(body_markdown, 1000), ''))
+)
+WHERE id IN (SELECT value::string FROM TABLE(FLATTEN(input => PARSE_JSON(?))))
+  AND emb IS NULL
+"""
+
+MERGE_SIGNATURES = f"""
+MERGE INTO {SIGNATURE_TABLE} t
+USING {SIGNATURE_TABLE}_NEW s
+ON t.article_id = s.article_id
+WHEN MATCHED THEN UPDATE SET
+    signature = TO_BINARY(s.signature_hex, 'HEX'),
+    published_at = s.published_at,
+    source_updated_at = s.source_updated_at,
+    computed_at = s.computed_at
+WHEN NOT MATCHED THEN INSERT
+    (article_id, signature, published_at, source_updated_at, computed_at)
+VALUES (
+    s.article_id, TO_BINARY(s.signature_hex, 'HEX'), s.published_at,
+    s.source_updated_at, s.computed_at
+)
+"""
+
+
+def _permutations(num: int = NUM_PERMUTATIONS, seed: int = 1) -> np.ndarray:
+    """(a, b) of the hash functions (a·x + b) mod p, shape (2, num)"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(1, int(_PRIME), size=(2, num), dtype=np.uint64)
+
+
+_PERMUTATIONS = _permutations()
+
+
+def shingle_hashes(text: Optional[str], size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the distinct character shingles of a text"""
+    if not text or len(text) < size:
+        return np.zeros(0, dtype=np.uint64)
+    shingles = {text[i : i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+def minhash_signature(
+    text: Optional[str], permutations: np.ndarray = _PERMUTATIONS
+) -> np.ndarray:
+    """
+    MinHash signature of a text's shingles
+
+    Args:
+        text: Folded article body
+        permutations: Hash function parameters from _permutations()
+
+    Returns:
+        uint32 array of length NUM_PERMUTATIONS; all 0xFFFFFFFF when the text
+        is shorter than MIN_BODY_CHARS (such articles are never clustered)
+    """
+    a, b = permutations
+    if not text or len(text) < MIN_BODY_CHARS:
+        return np.full(a.shape[0], _EMPTY, dtype=np.uint32)
+    hashes = shingle_hashes(text)
+    values = (a[:, None] * hashes[None, :] + b[:, None]) % _PRIME
+    return values.min(axis=1).astype(np.uint32)
+
+
+def cluster_signatures(
+    signatures: np.ndarray,
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    bands: int = LSH_BANDS,
+) -> list[list[tuple[int, int, float]]]:
+    """
+    Group near-duplicate signatures with LSH banding and union-find
+
+    Args:
+        signatures: uint32 matrix with one signature per row
+        threshold: Minimum estimated Jaccard similarity of a duplicate pair
+        bands: Number of LSH bands (NUM_PERMUTATIONS must divide evenly)
+
+    Returns:
+        Clusters of two or more rows, each a list of (row, matched row,
+        estimated similarity of the pair that joined it)
+    """
+    n = signatures.shape[0]
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    comparable = ~(signatures == _EMPTY).all(axis=1)
+    banded = signatures.reshape(n, bands, -1)
+    best: dict[int, tuple[int, float]] = {}
+    checked: set[tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        for row in np.flatnonzero(comparable):
+            buckets.setdefault(banded[row, band].tobytes(), []).append(int(row))
+        for members in buckets.values():
+            for i, left in enumerate(members):
+                for right in members[i + 1 :]:
+                    if (left, right) in checked:
+                        continue
+                    checked.add((left, right))
+                    similarity = float(np.mean(signatures[left] == signatures[right]))
+                    if similarity < threshold:
+                        continue
+                    parent[find(right)] = find(left)
+                    for row, other in ((left, right), (right, left)):
+                        if similarity > best.get(row, (-1, 0.0))[1]:
+                            best[row] = (other, similarity)
+
+    clusters: dict[int, list[tuple[int, int, float]]] = {}
+    for row, (other, similarity) in best.items():
+        clusters.setdefault(find(row), []).append((row, other, similarity))
+    return [sorted(members) for members in clusters.values()]
+
+
+def build_duplicates_frame(
+    ids: list[str],
+    signatures: np.ndarray,
+    published_at: list[Any],
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+) -> pd.DataFrame:
+    """
+    CORE.ARTICLE_DUPLICATES rows: every clustered article with the canonical
+    member (earliest published, then smallest id) and its similarity to it
+    """
+    rows = []
+    now = datetime.now()
+    for members in cluster_signatures(signatures, threshold):
+        indices = [row for row, _, _ in members]
+        canonical = min(
+            indices,
+            key=lambda i: (
+                pd.isna(published_at[i]),
+                pd.Timestamp(published_at[i]) if not pd.isna(published_at[i]) else 0,
+                ids[i],
+            ),
+        )
+        for i in indices:
+            rows.append(
+                {
+                    "ARTICLE_ID": ids[i],
+                    "CANONICAL_ID": ids[canonical],
+                    "SIMILARITY": float(
+                        np.mean(signatures[i] == signatures[canonical])
+                    ),
+                    "COMPUTED_AT": now,
+                }
+            )
+    return pd.DataFrame(
+        rows, columns=["ARTICLE_ID", "CANONICAL_ID", "SIMILARITY", "COMPUTED_AT"]
+    )
+
+
+def update_signatures(session: Session) -> int:
+    """
+    Hash the articles that are new or changed since their stored signature
+
+    Returns:
+        Number of articles hashed
+    """
+    session.sql(DELETE_STALE_SIGNATURES).collect()
+    changed = to_numpy_columns(fetch_arrow(session, CHANGED_POSTS))
+    if not len(changed["ARTICLE_ID"]):
+        return 0
+
+    frame = pd.DataFrame(
+        {
+            "ARTICLE_ID": changed["ARTICLE_ID"],
+            "SIGNATURE_HEX": [
+                minhash_signature(text).astype("<u4").tobytes().hex()
+                for text in changed["BODY_NORM"]
+            ],
+            "PUBLISHED_AT": changed["PUBLISHED_AT"],
+            "SOURCE_UPDATED_AT": changed["UPDATED_AT"],
+            "COMPUTED_AT": datetime.now(),
+        }
+    )
+    staging = f"{SIGNATURE_TABLE}_NEW"
+    session.create_dataframe(frame).write.mode("overwrite").save_as_table(
+        staging, table_type="temporary"
+    )
+    session.sql(MERGE_SIGNATURES).collect()
+    session.sql(f"DROP TABLE IF EXISTS {staging}").collect()
+    return len(frame)
+
+
+def refresh_near_duplicates(session: Session) -> tuple[int, int]:
+    """
+    Update the signatures incrementally and recompute the clusters
+
+    Returns:
+        (articles hashed, articles in a near-duplicate cluster)
+    """
+    hashed = update_signatures(session)
+    columns = to_numpy_columns(fetch_arrow(session, STORED_SIGNATURES))
+    ids = columns["ARTICLE_ID"].tolist()
+    signatures = (
+        np.frombuffer(b"".join(columns["SIGNATURE"]), dtype="<u4")
+        .astype(np.uint32)
+        .reshape(len(ids), NUM_PERMUTATIONS)
+    )
+    published_at = list(columns["PUBLISHED_AT"])
+
+    frame = build_duplicates_frame(ids, signatures, published_at)
+    previous = _non_canonical_ids(session) if USE_CORTEX else set()
+    replace_table(session, TABLE_NAME, frame)
+    if USE_CORTEX:
+        sync_duplicate_embeddings(session, previous, frame)
+    return hashed, len(frame)
+
+
+def _non_canonical_ids(session: Session) -> set[str]:
+    return set(to_numpy_columns(fetch_arrow(session, NON_CANONICAL))["ARTICLE_ID"])
+
+
+def sync_duplicate_embeddings(
+    session: Session, previous: set[str], frame: pd.DataFrame
+) -> int:
+    """
+    Drop the embeddings of non-canonical members and re-embed articles that
+    were non-canonical before this run but are not any more
+
+    Returns:
+        Number of articles re-embedded
+    """
+    current = set(frame.loc[frame["ARTICLE_ID"] != frame["CANONICAL_ID"], "ARTICLE_ID"])
+    session.sql(CLEAR_DUPLICATE_EMBEDDINGS).collect()
+    released = sorted(previous - current)
+    if released:
+        session.sql(RESTORE_EMBEDDINGS, params=[json.dumps(released)]).collect()
+    return len(released)
+
+
+def main() -> None:
+    """Main function to refresh CORE.ARTICLE_DUPLICATES"""
+    session = get_snowflake_session()
+    try:
+        hashed, clustered = refresh_near_duplicates(session)
+        print(
+            f"✅ Hashed {hashed} new or changed articles; "
+            f"{clustered} articles are in near-duplicate clusters"
+        )
+    except Exception as e:
+        print(f"❌ Failed to refresh near-duplicate clusters: {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
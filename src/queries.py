@@ -0,0 +1,468 @@
+"""
+Query layer shared by the API and the Streamlit UI
+
+Every read uses one of the fixed statement templates below with bind variables
+(``?``) instead of pasting user input into the SQL text. Identical text lets
+Snowflake reuse compiled statements and cached results across different
+queries, and removes the need for manual quote escaping.
+
+Results are fetched as Arrow tables: small API reads convert straight to
+Python objects or NumPy columns without going through pandas, and large
+exports stream batch by batch instead of materializing the whole result.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator, Sequence
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+import pyarrow as pa
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from snowflake.snowpark import Session
+
+# クエリ完了時に (query_id, template, 経過秒数) で呼ばれるリスナー（api/metrics.py が登録）
+QueryListener = Callable[[Optional[str], str, float], None]
+_query_listeners: list[QueryListener] = []
+
+# BM25パラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# ========== API (/recommend) ==========
+
+# params: [limit]
+RANDOM_POSTS = """
+SELECT
+    id as article_id,
+    1.0 as score,
+    title,
+    summary,
+    url
+FROM BLOG_POSTS
+WHERE summary IS NOT NULL
+ORDER BY RANDOM()
+LIMIT ?
+"""
+
+# params: none
+# ランダム推薦のサンプリングプール（api/sampling.py）用
+ELIGIBLE_POSTS = """
+SELECT
+    id as article_id,
+    title,
+    summary,
+    url,
+    published_at
+FROM BLOG_POSTS
+WHERE summary IS NOT NULL
+"""
+
+# params: [normalized_query, limit]
+# 正規化済みの影の列（sql/search_normalization.sql）と、同じ正規化をした
+# クエリ（src/terms.py の normalize_search_text）を部分一致で比べる
+# 検索テンプレートは準重複記事のクラスタ（sql/near_duplicates.sql）ごとに
+# 最もスコアの高い1件だけを返す（同点なら代表記事）
+LIKE_SEARCH = """
+WITH q AS (
+    SELECT ? AS term
+)
+SELECT
+    b.id as article_id,
+    CASE
+        WHEN CONTAINS(b.title_norm, q.term) THEN 1.0
+        WHEN CONTAINS(b.summary_norm, q.term) THEN 0.7
+        WHEN CONTAINS(b.body_norm, q.term) THEN 0.5
+        ELSE 0.0
+    END as score,
+    b.title,
+    b.summary,
+    b.url
+FROM BLOG_POSTS b
+CROSS JOIN q
+LEFT JOIN CORE.ARTICLE_DUPLICATES d ON d.article_id = b.id
+WHERE
+    b.summary IS NOT NULL
+    AND (
+        CONTAINS(b.title_norm, q.term)
+        OR CONTAINS(b.summary_norm, q.term)
+        OR CONTAINS(b.body_norm, q.term)
+    )
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY COALESCE(d.canonical_id, b.id)
+    ORDER BY score DESC, IFF(d.canonical_id = b.id, 0, 1)
+) = 1
+ORDER BY
+    score DESC,
+    b.published_at DESC
+LIMIT ?
+"""
+
+# params: [query, limit]
+# 用語インデックス（sql/search_terms.sql）に対するBM25検索
+# フィールドの重みはLIKE検索のスコアに合わせ、スコアは結果内の最大値で0-1に正規化
+TERM_SEARCH = f"""
+WITH query_terms AS (
+    SELECT DISTINCT term
+    FROM TABLE(STG.TOKENIZE_TERMS(?))
+),
+field_weights AS (
+    SELECT column1 AS field, column2 AS weight
+    FROM VALUES ('TITLE', 1.0), ('SUMMARY', 0.7), ('BODY', 0.5)
+),
+scored AS (
+    SELECT
+        t.article_id,
+        SUM(
+            w.weight
+            * LN(1 + (c.n_docs - s.df + 0.5) / (s.df + 0.5))
+            * (t.tf * ({BM25_K1} + 1))
+            / (
+                t.tf
+                + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * l.doc_len / c.avg_doc_len)
+            )
+        ) AS bm25
+    FROM query_terms q
+    JOIN STG.ARTICLE_TERMS t ON t.term = q.term
+    JOIN STG.TERM_STATS s ON s.term = t.term AND s.field = t.field
+    JOIN STG.ARTICLE_FIELD_LENGTHS l
+        ON l.article_id = t.article_id AND l.field = t.field
+    JOIN STG.CORPUS_STATS c ON c.field = t.field
+    JOIN field_weights w ON w.field = t.field
+    GROUP BY t.article_id
+)
+SELECT
+    b.id as article_id,
+    s.bm25 / MAX(s.bm25) OVER () as score,
+    b.title,
+    b.summary,
+    b.url
+FROM scored s
+JOIN BLOG_POSTS b ON b.id = s.article_id
+LEFT JOIN CORE.ARTICLE_DUPLICATES d ON d.article_id = b.id
+WHERE b.summary IS NOT NULL
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY COALESCE(d.canonical_id, b.id)
+    ORDER BY s.bm25 DESC, IFF(d.canonical_id = b.id, 0, 1)
+) = 1
+ORDER BY
+    score DESC,
+    b.published_at DESC
+LIMIT ?
+"""
+
+# params: [query_vector_json, limit]
+# クエリの埋め込みは別に計算してキャッシュし（src/query_embeddings.py）、ベクトルを渡す
+VECTOR_SEARCH = """
+WITH query_vector AS (
+    SELECT PARSE_JSON(?)::ARRAY::VECTOR(FLOAT, 768) as query_emb
+)
+SELECT
+    b.id as article_id,
+    VECTOR_COSINE_DISTANCE(b.emb, q.query_emb) as score,
+    b.title,
+    b.summary,
+    b.url
+FROM BLOG_POSTS b
+CROSS JOIN query_vector q
+LEFT JOIN CORE.ARTICLE_DUPLICATES d ON d.article_id = b.id
+WHERE b.emb IS NOT NULL
+  AND b.summary IS NOT NULL
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY COALESCE(d.canonical_id, b.id)
+    ORDER BY score DESC, IFF(d.canonical_id = b.id, 0, 1)
+) = 1
+ORDER BY score DESC
+LIMIT ?
+"""
+
+# params: [article_id, limit]
+# 事前計算した関連記事（sql/related_articles.sql）の主キー検索
+RELATED_ARTICLES = """
+SELECT
+    r.related_id as article_id,
+    r.score,
+    b.title,
+    b.summary,
+    b.url
+FROM CORE.RELATED_ARTICLES r
+JOIN BLOG_POSTS b ON b.id = r.related_id
+WHERE r.article_id = ?
+ORDER BY r.rank
+LIMIT ?
+"""
+
+# params: [student_id, limit]
+# 学生ごとに事前計算した推薦（sql/student_recommendations.sql）の主キー検索
+STUDENT_RECOMMENDATIONS = """
+SELECT
+    r.article_id,
+    r.score,
+    b.title,
+    b.summary,
+    b.url
+FROM CORE.STUDENT_RECOMMENDATIONS r
+JOIN BLOG_POSTS b ON b.id = r.article_id
+WHERE r.student_id = ?
+ORDER BY r.rank
+LIMIT ?
+"""
+
+# params: [student_ids_json, limit]
+# 複数の学生の推薦を1回で取得（/recommend/batch 用、学生IDはJSON配列で渡す）
+STUDENT_RECOMMENDATIONS_BATCH = """
+WITH students AS (
+    SELECT DISTINCT value::string AS student_id
+    FROM TABLE(FLATTEN(input => PARSE_JSON(?)))
+)
+SELECT
+    r.student_id,
+    r.article_id,
+    r.score,
+    b.title,
+    b.summary,
+    b.url
+FROM CORE.STUDENT_RECOMMENDATIONS r
+JOIN students s ON s.student_id = r.student_id
+JOIN BLOG_POSTS b ON b.id = r.article_id
+WHERE r.rank <= ?
+ORDER BY r.student_id, r.rank
+"""
+
+# ========== Streamlit UI ==========
+
+# params: [normalized_query, limit]
+UI_LIKE_SEARCH = """
+WITH q AS (
+    SELECT ? AS term
+)
+SELECT
+    b.id,
+    b.title,
+    b.summary,
+    b.url,
+    b.published_at,
+    b.tags,
+    CASE
+        WHEN CONTAINS(b.title_norm, q.term) THEN 1.0
+        WHEN CONTAINS(b.summary_norm, q.term) THEN 0.7
+        WHEN CONTAINS(b.body_norm, q.term) THEN 0.5
+        ELSE 0.0
+    END as similarity_score
+FROM BLOG_POSTS b
+CROSS JOIN q
+LEFT JOIN CORE.ARTICLE_DUPLICATES d ON d.article_id = b.id
+WHERE
+    CONTAINS(b.title_norm, q.term)
+    OR CONTAINS(b.summary_norm, q.term)
+    OR CONTAINS(b.body_norm, q.term)
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY COALESCE(d.canonical_id, b.id)
+    ORDER BY similarity_score DESC, IFF(d.canonical_id = b.id, 0, 1)
+) = 1
+ORDER BY
+    similarity_score DESC,
+    b.published_at DESC
+LIMIT ?
+"""
+
+# params: [query_vector_json, limit]
+UI_VECTOR_SEARCH = """
+WITH query_vector AS (
+    SELECT PARSE_JSON(?)::ARRAY::VECTOR(FLOAT, 768) as query_emb
+)
+SELECT
+    b.id,
+    b.title,
+    b.summary,
+    b.url,
+    b.published_at,
+    b.tags,
+    VECTOR_COSINE_DISTANCE(b.emb, q.query_emb) as similarity_score
+FROM BLOG_POSTS b
+CROSS JOIN query_vector q
+LEFT JOIN CORE.ARTICLE_DUPLICATES d ON d.article_id = b.id
+WHERE b.emb IS NOT NULL
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY COALESCE(d.canonical_id, b.id)
+    ORDER BY similarity_score DESC, IFF(d.canonical_id = b.id, 0, 1)
+) = 1
+ORDER BY similarity_score DESC
+LIMIT ?
+"""
+
+# params: none
+# サイドバーの記事数と最終更新を1回で取得（どちらもテーブルのメタデータから答えられる）
+# 最終更新はUIの検索キャッシュのデータバージョンも兼ねる
+UI_POST_STATS = """
+SELECT COUNT(*) as post_count, MAX(updated_at) as latest_update
+FROM BLOG_POSTS
+"""
+
+# params: none
+# 入力補完の索引の元データ（src/autocomplete.py、データバージョンが変わったときだけ読む）
+AUTOCOMPLETE_SOURCE = """
+SELECT title, tags, published_at
+FROM BLOG_POSTS
+WHERE title IS NOT NULL
+"""
+
+
+# ========== Query embeddings (src/query_embeddings.py) ==========
+
+# params: [query]
+# 埋め込みはコンパクトなJSON配列の文字列で受け取り、そのまま検索にバインドする
+EMBED_QUERY = """
+SELECT TO_JSON(SNOWFLAKE.CORTEX.EMBED_TEXT_768('e5-base-v2', ?)::ARRAY) as query_emb
+"""
+
+# params: [query]
+# 永続キャッシュ（sql/query_embeddings.sql）の主キー検索
+QUERY_EMBEDDING_LOOKUP = """
+SELECT TO_JSON(emb::ARRAY) as query_emb
+FROM CORE.QUERY_EMBEDDINGS
+WHERE query_text = ?
+"""
+
+# params: [query, query_vector_json]
+QUERY_EMBEDDING_STORE = """
+MERGE INTO CORE.QUERY_EMBEDDINGS t
+USING (
+    SELECT ? as query_text, PARSE_JSON(?)::ARRAY::VECTOR(FLOAT, 768) as emb
+) s
+ON t.query_text = s.query_text
+WHEN NOT MATCHED THEN INSERT (query_text, emb, created_at)
+    VALUES (s.query_text, s.emb, CURRENT_TIMESTAMP())
+"""
+
+
+# ========== Local replica (src/replica.py) ==========
+
+# params: none
+# レプリカの全件スナップショット（初回と、削除で件数がずれたとき）
+REPLICA_SNAPSHOT = """
+SELECT
+    id as article_id,
+    title,
+    summary,
+    body_markdown,
+    url,
+    published_at,
+    updated_at,
+    tags
+FROM BLOG_POSTS
+"""
+
+# params: [watermark]
+# ウォーターマーク以降に更新された記事（同時刻の更新を取りこぼさないよう >=）
+REPLICA_DELTA = """
+SELECT
+    id as article_id,
+    title,
+    summary,
+    body_markdown,
+    url,
+    published_at,
+    updated_at,
+    tags
+FROM BLOG_POSTS
+WHERE updated_at >= ?
+"""
+
+# params: none
+REPLICA_COUNT = """
+SELECT COUNT(*) as post_count
+FROM BLOG_POSTS
+"""
+
+
+def fetch_arrow(
+    session: Session, template: str, params: Sequence[Any] = ()
+) -> pa.Table:
+    """
+    Run a statement template and fetch the whole result as an Arrow table
+
+    Registered query listeners are called with the query id and latency.
+
+    Args:
+        session: Snowflake session
+        template: One of the statement templates in this module
+        params: Values for the ``?`` placeholders, in order
+
+    Returns:
+        Query result (column names as returned by Snowflake, i.e. upper case)
+    """
+    df = session.sql(template, params=list(params))
+    if not _query_listeners:
+        return df.to_arrow()
+
+    start = time.perf_counter()
+    with session.query_history() as history:
+        table = df.to_arrow()
+    elapsed = time.perf_counter() - start
+    query_id = history.queries[-1].query_id if history.queries else None
+    for listener in list(_query_listeners):
+        listener(query_id, template, elapsed)
+    return table
+
+
+def add_query_listener(listener: QueryListener) -> None:
+    """Register a callback invoked after every fetch_arrow() query"""
+    _query_listeners.append(listener)
+
+
+def remove_query_listener(listener: QueryListener) -> None:
+    """Unregister a callback added with add_query_listener()"""
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+def iter_arrow_batches(
+    session: Session, template: str, params: Sequence[Any] = ()
+) -> Iterator[pa.Table]:
+    """
+    Run a statement template and stream the result as Arrow batches
+
+    Only one batch is held in memory at a time, so this is the path for
+    large exports.
+    """
+    yield from session.sql(template, params=list(params)).to_arrow_batches()
+
+
+def to_numpy_columns(table: pa.Table) -> dict[str, np.ndarray]:
+    """
+    Convert an Arrow table to NumPy arrays, one per column
+
+    Single-chunk numeric columns without nulls are wrapped without copying;
+    everything else falls back to a converting copy.
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        chunk = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        try:
+            columns[name] = chunk.to_numpy(zero_copy_only=True)
+        except (pa.ArrowInvalid, NotImplementedError):
+            columns[name] = chunk.to_numpy(zero_copy_only=False)
+    return columns
+
+
+def run_query(
+    session: Session, template: str, params: Sequence[Any] = ()
+) -> pd.DataFrame:
+    """
+    Run a statement template with bind variables
+
+    Args:
+        session: Snowflake session
+        template: One of the statement templates in this module
+        params: Values for the ``?`` placeholders, in order
+
+    Returns:
+        Query result as a DataFrame
+    """
+    table = fetch_arrow(session, template, params)
+    # Arrowのバッファを変換しながら解放してピークメモリを抑える
+    return table.to_pandas(split_blocks=True, self_destruct=True)
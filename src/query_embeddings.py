@@ -0,0 +1,120 @@
+"""
+Query-embedding cache for the Cortex vector search path
+
+Search queries are embedded with SNOWFLAKE.CORTEX.EMBED_TEXT_768 in a separate
+statement, and the search templates take the vector as a bound JSON array
+instead of embedding the query text inside the search SQL. Embeddings are
+keyed by the query folded with src.terms.normalize_search_text and kept in a
+bounded in-process LRU; the text embedded is only NFKC/whitespace-normalized,
+so kana are not folded before Cortex sees them. With
+QUERY_EMBEDDING_TABLE=true they are also stored in CORE.QUERY_EMBEDDINGS
+(sql/query_embeddings.sql), so popular queries are embedded only once across
+processes and restarts.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from src.queries import (
+    EMBED_QUERY,
+    QUERY_EMBEDDING_LOOKUP,
+    QUERY_EMBEDDING_STORE,
+    fetch_arrow,
+)
+from src.terms import normalize_query_text, normalize_search_text
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+# 定数
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_TABLE = os.getenv("QUERY_EMBEDDING_TABLE", "false").lower() == "true"
+
+# 永続キャッシュのキーの上限（sql/query_embeddings.sql の QUERY_TEXT）
+MAX_QUERY_CHARS = 1000
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query embeddings with an optional Snowflake table tier"""
+
+    def __init__(
+        self,
+        maxsize: int = QUERY_EMBEDDING_CACHE_SIZE,
+        use_table: bool = QUERY_EMBEDDING_TABLE,
+    ):
+        self.maxsize = maxsize
+        self.use_table = use_table
+        # 正規化したクエリ -> 埋め込み（JSON配列の文字列、検索にそのままバインドする）
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.table_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session: Session, query: str) -> str:
+        """
+        Embedding of a search query, computed only on a miss in both tiers
+
+        Args:
+            session: Snowflake session
+            query: Search query as typed
+
+        Returns:
+            The embedding as a JSON array, for PARSE_JSON(?) in the templates
+        """
+        key = normalize_search_text(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        # Snowflakeへの問い合わせ中はロックを持たない（同じクエリの重複計算は許容）
+        persist = self.use_table and len(key) <= MAX_QUERY_CHARS
+        vector = self._lookup(session, key) if persist else None
+        if vector is not None:
+            with self._lock:
+                self.table_hits += 1
+        else:
+            text = normalize_query_text(query)
+            vector = fetch_arrow(session, EMBED_QUERY, [text]).column(0)[0].as_py()
+            if persist:
+                fetch_arrow(session, QUERY_EMBEDDING_STORE, [key, vector])
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def clear(self) -> None:
+        """Remove all in-process entries (the table tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "table_hits": self.table_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    @staticmethod
+    def _lookup(session: Session, key: str) -> Optional[str]:
+        table = fetch_arrow(session, QUERY_EMBEDDING_LOOKUP, [key])
+        return table.column(0)[0].as_py() if table.num_rows else None
@@ -0,0 +1,270 @@
+"""
+Related Articles Batch Job
+
+Computes the top-k most similar articles for every article and stores them
+in CORE.RELATED_ARTICLES (sql/related_articles.sql), so the API can answer
+"what's similar to this article" with a primary-key lookup.
+
+Article vectors are the mean of the chunk embeddings in STG.ARTICLE_EMBEDDINGS.
+When no embeddings exist, hashed TF-IDF vectors over title, summary and body
+are used instead. Near-duplicate clusters from CORE.ARTICLE_DUPLICATES
+(python -m src.near_duplicates) are collapsed: only canonical members are
+neighbour candidates, and an article never gets a copy of itself.
+
+Usage:
+    python -m src.related
+"""
+
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from snowflake.snowpark import Session
+
+from src.config import get_snowflake_session
+from src.queries import fetch_arrow, to_numpy_columns
+from src.terms import tokenize_terms
+
+# 定数
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "10"))
+RELATED_BLOCK_SIZE = int(os.getenv("RELATED_BLOCK_SIZE", "512"))
+LEXICAL_DIMENSIONS = 4096
+TABLE_NAME = "CORE.RELATED_ARTICLES"
+
+EMBEDDING_QUERY = """
+SELECT c.ARTICLE_ID, e.EMBEDDING_VECTOR
+FROM STG.ARTICLE_CHUNKS c
+JOIN STG.ARTICLE_EMBEDDINGS e ON e.CHUNK_ID = c.CHUNK_ID
+WHERE e.EMBEDDING_VECTOR IS NOT NULL
+"""
+
+LEXICAL_QUERY = """
+SELECT id as article_id, title, summary, body_markdown
+FROM BLOG_POSTS
+"""
+
+DUPLICATES_QUERY = """
+SELECT article_id, canonical_id
+FROM CORE.ARTICLE_DUPLICATES
+WHERE article_id != canonical_id
+"""
+
+
+def _normalize_rows(X: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows stay zero)"""
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.where(norms == 0, 1.0, norms)
+
+
+def load_embedding_vectors(session: Session) -> tuple[list[str], np.ndarray]:
+    """
+    Build one vector per article from its chunk embeddings
+
+    Returns:
+        (article ids, float32 matrix with one L2-normalized row per article)
+    """
+    columns = to_numpy_columns(fetch_arrow(session, EMBEDDING_QUERY))
+    if not len(columns["ARTICLE_ID"]):
+        return [], np.zeros((0, 0), dtype=np.float32)
+
+    vectors = np.stack(
+        [
+            np.asarray(
+                json.loads(vector) if isinstance(vector, str) else vector,
+                dtype=np.float32,
+            )
+            for vector in columns["EMBEDDING_VECTOR"]
+        ]
+    )
+    # チャンクごとに正規化してから記事単位で平均する
+    ids, owner = np.unique(columns["ARTICLE_ID"], return_inverse=True)
+    X = np.zeros((len(ids), vectors.shape[1]), dtype=np.float32)
+    np.add.at(X, owner, _normalize_rows(vectors))
+    X /= np.bincount(owner)[:, None]
+    ids = ids.tolist()
+    return ids, _normalize_rows(X)
+
+
+def lexical_vectors(
+    docs: list[str], dimensions: int = LEXICAL_DIMENSIONS
+) -> np.ndarray:
+    """
+    Hashed TF-IDF vectors using the same tokenizer as the term index
+
+    Args:
+        docs: Document texts
+        dimensions: Number of hash buckets
+
+    Returns:
+        float32 matrix with one L2-normalized row per document
+    """
+    X = np.zeros((len(docs), dimensions), dtype=np.float32)
+    for row, text in enumerate(docs):
+        for term, tf in tokenize_terms(text).items():
+            X[row, zlib.crc32(term.encode("utf-8")) % dimensions] += tf
+
+    # サブリニアTFとIDF
+    df = np.count_nonzero(X, axis=0)
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1
+    X = np.log1p(X) * idf.astype(np.float32)
+    return _normalize_rows(X)
+
+
+def load_lexical_vectors(session: Session) -> tuple[list[str], np.ndarray]:
+    """Build lexical vectors from title, summary and body of BLOG_POSTS"""
+    columns = to_numpy_columns(fetch_arrow(session, LEXICAL_QUERY))
+    docs = [
+        "\n".join(field or "" for field in fields)
+        for fields in zip(
+            columns["TITLE"], columns["SUMMARY"], columns["BODY_MARKDOWN"]
+        )
+    ]
+    return columns["ARTICLE_ID"].tolist(), lexical_vectors(docs)
+
+
+def load_duplicate_map(session: Session) -> dict[str, str]:
+    """Map every non-canonical near-duplicate to its canonical article"""
+    columns = to_numpy_columns(fetch_arrow(session, DUPLICATES_QUERY))
+    return dict(zip(columns["ARTICLE_ID"].tolist(), columns["CANONICAL_ID"].tolist()))
+
+
+def duplicate_groups(
+    ids: list[str], canonical: dict[str, str]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster labels and candidate mask for top_k_neighbours
+
+    Returns:
+        (one integer label per article, shared within a near-duplicate
+        cluster; True for articles that may be returned as neighbours)
+    """
+    labels = np.asarray([canonical.get(i, i) for i in ids], dtype=object)
+    groups = pd.factorize(labels)[0]
+    candidates = np.asarray([i not in canonical for i in ids], dtype=bool)
+    return groups, candidates
+
+
+def top_k_neighbours(
+    X: np.ndarray,
+    k: int = RELATED_TOP_K,
+    block_size: int = RELATED_BLOCK_SIZE,
+    groups: Optional[np.ndarray] = None,
+    candidates: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cosine top-k neighbours of every row, excluding the row itself
+
+    Similarities are computed one block of rows at a time, so memory stays
+    at block_size x n instead of n x n.
+
+    Args:
+        X: Matrix with one vector per article
+        k: Number of neighbours per article
+        block_size: Rows per matrix multiplication
+        groups: Cluster label per row; rows sharing a label are never
+            neighbours of each other (default: every row its own cluster)
+        candidates: Rows that may be returned as neighbours (default: all)
+
+    Returns:
+        (indices, scores), both of shape (n, min(k, n - 1)), ordered by
+        descending score; scores are clipped to [0, 1]
+    """
+    n = X.shape[0]
+    groups = np.arange(n) if groups is None else np.asarray(groups)
+    candidates = (
+        np.ones(n, dtype=bool) if candidates is None else np.asarray(candidates)
+    )
+    # 各クラスタの候補は正規の1件だけなので、どの行にも候補数-1件は残る
+    k = min(k, int(candidates.sum()) - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32)
+
+    X = _normalize_rows(np.asarray(X, dtype=np.float32))
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = X[start:stop] @ X.T
+        # 自分自身・同じ準重複クラスタ・候補でない記事を除外
+        sims[groups[start:stop, None] == groups[None, :]] = -np.inf
+        sims[:, ~candidates] = -np.inf
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_sims, order, axis=1)
+
+    return indices, np.clip(scores, 0.0, 1.0)
+
+
+def build_related_frame(
+    ids: list[str], indices: np.ndarray, scores: np.ndarray, method: str
+) -> pd.DataFrame:
+    """Flatten neighbour matrices into CORE.RELATED_ARTICLES rows"""
+    n, k = indices.shape
+    id_array = np.asarray(ids, dtype=object)
+    return pd.DataFrame(
+        {
+            "ARTICLE_ID": np.repeat(id_array, k),
+            "RANK": np.tile(np.arange(1, k + 1), n),
+            "RELATED_ID": id_array[indices.ravel()],
+            "SCORE": scores.ravel().astype(float),
+            "METHOD": method,
+            "COMPUTED_AT": datetime.now(),
+        }
+    )
+
+
+def replace_table(session: Session, table_name: str, frame: pd.DataFrame) -> None:
+    """Replace the contents of a table atomically via a staging table swap"""
+    staging = f"{table_name}_NEW"
+    session.sql(f"CREATE OR REPLACE TABLE {staging} LIKE {table_name}").collect()
+    if not frame.empty:
+        session.create_dataframe(frame).write.mode("append").save_as_table(staging)
+    session.sql(f"ALTER TABLE {table_name} SWAP WITH {staging}").collect()
+    session.sql(f"DROP TABLE IF EXISTS {staging}").collect()
+
+
+def refresh_related_articles(session: Session, k: int = RELATED_TOP_K) -> int:
+    """
+    Recompute and store the related articles for every article
+
+    Returns:
+        Number of rows written
+    """
+    ids, X = load_embedding_vectors(session)
+    method = "embedding"
+    if not ids:
+        print("No embeddings found, falling back to lexical vectors")
+        ids, X = load_lexical_vectors(session)
+        method = "lexical"
+
+    groups, candidates = duplicate_groups(ids, load_duplicate_map(session))
+    indices, scores = top_k_neighbours(X, k, groups=groups, candidates=candidates)
+    frame = build_related_frame(ids, indices, scores, method)
+    replace_table(session, TABLE_NAME, frame)
+    return len(frame)
+
+
+def main() -> None:
+    """Main function to refresh CORE.RELATED_ARTICLES"""
+    session = get_snowflake_session()
+    try:
+        count = refresh_related_articles(session)
+        print(f"✅ Stored {count} related-article rows")
+    except Exception as e:
+        print(f"❌ Failed to refresh related articles: {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
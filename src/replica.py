@@ -0,0 +1,604 @@
+"""
+Local read replica of BLOG_POSTS
+
+Keeps a Parquet snapshot of BLOG_POSTS on local disk and in memory as an
+Arrow table, and syncs it incrementally: each sync fetches only the rows whose
+updated_at is at or after the newest updated_at already held (the watermark).
+If the row count no longer matches the warehouse (rows were deleted), the
+snapshot is reloaded in full.
+
+The changed rows of each sync become a delta segment next to the base
+(blog_posts.delta-000007.parquet on disk) rather than a rebuilt table, and
+compaction merges the segments back into one base once there are more than
+LOCAL_REPLICA_MAX_SEGMENTS.
+
+With LOCAL_REPLICA=true the API and the Streamlit UI answer keyword search,
+random picks and post stats from the replica. Snowflake is only queried to
+sync it.
+
+Usage:
+    python -m src.replica
+"""
+
+from __future__ import annotations
+
+import glob
+import mmap
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.config import get_snowflake_session
+from src.queries import REPLICA_COUNT, REPLICA_DELTA, REPLICA_SNAPSHOT, fetch_arrow
+from src.shared_index import PublisherLock, attach, current_generation
+from src.shared_index import publish as publish_generation
+from src.terms import normalize_search_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from snowflake.snowpark import Session
+
+# 定数
+LOCAL_REPLICA = os.getenv("LOCAL_REPLICA", "false").lower() == "true"
+LOCAL_REPLICA_PATH = os.getenv("LOCAL_REPLICA_PATH", "data/replica/blog_posts.parquet")
+LOCAL_REPLICA_REFRESH_SECONDS = float(os.getenv("LOCAL_REPLICA_REFRESH_SECONDS", "300"))
+# 複数ワーカーで共有する場合の共有メモリ上のディレクトリ（例: /dev/shm/mued-replica）
+LOCAL_REPLICA_SHARED_DIR = os.getenv("LOCAL_REPLICA_SHARED_DIR", "")
+# 公開役でないワーカーが新しい世代を確認する間隔
+LOCAL_REPLICA_FOLLOW_SECONDS = float(os.getenv("LOCAL_REPLICA_FOLLOW_SECONDS", "5"))
+# 差分セグメントがこの数を超えたら1つのベースに圧縮する
+LOCAL_REPLICA_MAX_SEGMENTS = int(os.getenv("LOCAL_REPLICA_MAX_SEGMENTS", "8"))
+
+# LIKE検索と同じフィールドごとのスコア
+FIELD_SCORES = (("title", 1.0), ("summary", 0.7), ("body_markdown", 0.5))
+
+
+# 検索用コーパスで行を区切るバイト（UTF-8のテキストには現れない）
+ROW_SEPARATOR = b"\x00"
+
+# ベースのParquetに含まれる最新のセグメント番号（スキーマのメタデータ）
+SEQ_METADATA_KEY = b"replica_seq"
+
+
+def _lowercase_columns(table: pa.Table) -> pa.Table:
+    return table.rename_columns([name.lower() for name in table.column_names])
+
+
+class _Corpus:
+    """
+    One folded UTF-8 buffer per field (normalize_search_text, as in the
+    *_norm columns of BLOG_POSTS) with rows separated by ROW_SEPARATOR
+
+    A single find over one buffer is much faster than a per-row substring
+    match, and each matching row costs one more find. The buffer may be a
+    bytes object or a read-only memory map shared between workers.
+    """
+
+    def __init__(self, text: Union[bytes, mmap.mmap], starts: np.ndarray):
+        self.text = text
+        self.starts = starts
+
+    @classmethod
+    def build(cls, values: list[Optional[str]]) -> _Corpus:
+        encoded = [
+            (normalize_search_text(value) or "").encode("utf-8") for value in values
+        ]
+        starts = np.zeros(len(encoded), dtype=np.int64)
+        if encoded:
+            np.cumsum([len(chunk) + 1 for chunk in encoded[:-1]], out=starts[1:])
+        return cls(ROW_SEPARATOR.join(encoded), starts)
+
+    def find_rows(self, pattern: str) -> list[int]:
+        """Indices of the rows containing the pattern, in row order"""
+        if not len(self.starts):
+            return []
+        needle = pattern.encode("utf-8")
+        rows = []
+        position = self.text.find(needle)
+        while position != -1:
+            row = int(np.searchsorted(self.starts, position, side="right")) - 1
+            rows.append(row)
+            if row + 1 >= len(self.starts):
+                break
+            # 同じ行の2回目以降の出現は飛ばして次の行から探す
+            position = self.text.find(needle, int(self.starts[row + 1]))
+        return rows
+
+
+class _Segment:
+    """
+    An immutable run of replica rows with its search corpora
+
+    Segments are numbered in the order they were written. A row is superseded
+    (tombstoned) by any newer segment holding the same article_id.
+    """
+
+    def __init__(
+        self,
+        seq: int,
+        table: pa.Table,
+        corpora: Optional[dict[str, _Corpus]] = None,
+    ):
+        self.seq = seq
+        self.table = table
+        if corpora is None:
+            corpora = {
+                field: _Corpus.build(table[field].to_pylist())
+                for field, _ in FIELD_SCORES
+            }
+        self.corpora = corpora
+
+    @property
+    def name(self) -> str:
+        return f"seg-{self.seq:06d}"
+
+
+class _Snapshot:
+    """The base segment plus delta segments, with the live rows of each"""
+
+    def __init__(self, segments: list[_Segment]):
+        self.segments = tuple(segments)
+        # 新しいセグメントから順に、それより新しいセグメントにあるIDの行を墓標にする
+        # （Noneはすべての行が生きている）
+        self.live: list[Optional[np.ndarray]] = [None] * len(segments)
+        newer_ids: list[pa.Array] = []
+        for i in range(len(segments) - 1, -1, -1):
+            ids = segments[i].table["article_id"]
+            if newer_ids:
+                dead = pc.is_in(ids, value_set=pa.concat_arrays(newer_ids)).to_numpy()
+                if dead.any():
+                    self.live[i] = ~dead
+            newer_ids.append(ids.combine_chunks())
+
+        self.num_rows = sum(
+            segment.table.num_rows if live is None else int(live.sum())
+            for segment, live in zip(self.segments, self.live)
+        )
+        watermarks = [
+            pc.max(segment.table["updated_at"]).as_py() for segment in self.segments
+        ]
+        watermarks = [value for value in watermarks if value is not None]
+        self.watermark = max(watermarks) if watermarks else None
+
+    def table(self) -> pa.Table:
+        """Live rows of all segments as one table"""
+        parts = [
+            segment.table if live is None else segment.table.filter(pa.array(live))
+            for segment, live in zip(self.segments, self.live)
+        ]
+        if len(parts) == 1:
+            return parts[0]
+        columns = parts[0].column_names
+        return pa.concat_tables(
+            [part.select(columns) for part in parts], promote_options="permissive"
+        )
+
+    def column(self, name: str) -> pa.ChunkedArray:
+        """Live values of one column across the segments"""
+        return pa.chunked_array(
+            [
+                chunk
+                for segment, live in zip(self.segments, self.live)
+                for chunk in (
+                    segment.table[name]
+                    if live is None
+                    else segment.table[name].filter(pa.array(live))
+                ).chunks
+            ],
+            type=self.segments[0].table.schema.field(name).type,
+        )
+
+
+class LocalReplica:
+    """
+    Thread-safe, watermark-synced local copy of BLOG_POSTS
+
+    The replica is log-structured: a sync appends the changed rows as a delta
+    segment instead of rebuilding the whole table, newer segments tombstone
+    older copies of the same article, and search reads every segment.
+    compact_if_due() merges the segments back into one base once there are
+    more than max_segments.
+
+    With a shared_dir, one process syncs and publishes each snapshot to shared
+    memory (src/shared_index.py) and every process maps it read-only.
+    """
+
+    def __init__(
+        self,
+        path: str = LOCAL_REPLICA_PATH,
+        refresh_seconds: float = LOCAL_REPLICA_REFRESH_SECONDS,
+        shared_dir: Optional[str] = LOCAL_REPLICA_SHARED_DIR or None,
+        max_segments: int = LOCAL_REPLICA_MAX_SEGMENTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.shared_dir = shared_dir
+        self.max_segments = max_segments
+        self._publisher_lock = PublisherLock(shared_dir) if shared_dir else None
+        self._generation: Optional[str] = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        # セグメントのスナップショット（差し替えのみ）
+        self._snapshot: Optional[_Snapshot] = None
+        # ディスク上のParquetに書き込み済みの最新のセグメント番号
+        self._persisted_seq: Optional[int] = None
+        self._synced_at: Optional[float] = None
+        self.syncs = 0
+        self.full_reloads = 0
+        self.rows_fetched = 0
+        self.follows = 0
+        self.compactions = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether a snapshot is loaded"""
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> Any:
+        """The watermark (newest updated_at held), usable as a data version"""
+        snapshot = self._snapshot
+        return snapshot.watermark if snapshot else None
+
+    @property
+    def generation(self) -> Optional[str]:
+        """Shared-memory generation in use (None without a shared_dir)"""
+        return self._generation
+
+    @property
+    def segment_count(self) -> int:
+        """Number of segments searched (the base plus the deltas)"""
+        snapshot = self._snapshot
+        return len(snapshot.segments) if snapshot else 0
+
+    def claim_publisher(self) -> bool:
+        """
+        Whether this process syncs from Snowflake (always True without a
+        shared_dir; otherwise only the process holding the publisher lock)
+        """
+        if self._publisher_lock is None:
+            return True
+        return self._publisher_lock.acquire()
+
+    def follow(self) -> bool:
+        """
+        Map the newest generation published by another process
+
+        Returns:
+            True if a newer generation was attached
+        """
+        if not self.shared_dir:
+            return False
+        if current_generation(self.shared_dir) in (None, self._generation):
+            return False
+        attached = attach(self.shared_dir, tuple(field for field, _ in FIELD_SCORES))
+        if attached is None:
+            return False
+        generation, buffers = attached
+        segments = [
+            _Segment(
+                int(name.split("-")[1]),
+                table,
+                {field: _Corpus(*corpora[field]) for field, _ in FIELD_SCORES},
+            )
+            for name, table, corpora in buffers
+        ]
+        self._snapshot = _Snapshot(segments)
+        self._generation = generation
+        self.follows += 1
+        return True
+
+    def load(self) -> bool:
+        """
+        Load the shared generation or the segments written by previous syncs
+
+        Returns:
+            True if a snapshot was found
+        """
+        if self.follow():
+            return True
+        if not os.path.exists(self.path):
+            return False
+        # Parquetの読み書きは起動を遅くしないよう必要になるまで読み込まない
+        import pyarrow.parquet as pq
+
+        base = pq.read_table(self.path)
+        seq = int((base.schema.metadata or {}).get(SEQ_METADATA_KEY, b"0"))
+        segments = [_Segment(seq, base.replace_schema_metadata(None))]
+        # ベースより古い差分は圧縮済み（削除前に止まった場合に残る）
+        for delta_seq, delta_path in self._delta_files():
+            if delta_seq > seq:
+                segments.append(_Segment(delta_seq, pq.read_table(delta_path)))
+        self._snapshot = _Snapshot(segments)
+        self._persisted_seq = segments[-1].seq
+        return True
+
+    def sync(self, session: Session) -> int:
+        """
+        Fetch rows changed since the watermark and append them as a delta segment
+
+        Returns:
+            Number of rows fetched from Snowflake
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            watermark = self.version
+            updated: Optional[_Snapshot] = None
+            if snapshot is None or watermark is None:
+                table = _lowercase_columns(fetch_arrow(session, REPLICA_SNAPSHOT))
+                updated = _Snapshot([_Segment(self._next_seq(), table)])
+                fetched = table.num_rows
+                self.full_reloads += 1
+            else:
+                delta = _lowercase_columns(
+                    fetch_arrow(session, REPLICA_DELTA, [watermark])
+                )
+                fetched = delta.num_rows
+                changed = self._unseen(snapshot, delta, watermark)
+                if changed.num_rows:
+                    columns = snapshot.segments[0].table.column_names
+                    segment = _Segment(self._next_seq(), changed.select(columns))
+                    updated = _Snapshot([*snapshot.segments, segment])
+
+                # 削除は更新日時では検知できないため、件数がずれたら全件を取り直す
+                count = fetch_arrow(session, REPLICA_COUNT)
+                if count.column(0)[0].as_py() != (updated or snapshot).num_rows:
+                    table = _lowercase_columns(fetch_arrow(session, REPLICA_SNAPSHOT))
+                    updated = _Snapshot([_Segment(self._next_seq(), table)])
+                    fetched += table.num_rows
+                    self.full_reloads += 1
+
+            # ウォーターマーク時刻の行を取り直しただけなら書き込みも世代交代もしない
+            if updated is not None:
+                self._persist(updated)
+                self._publish(updated)
+            self._synced_at = self._clock()
+            self.syncs += 1
+            self.rows_fetched += fetched
+            return fetched
+
+    def sync_if_due(self, session: Session) -> bool:
+        """
+        Sync when the last sync is older than refresh_seconds
+
+        Returns:
+            True if a sync ran
+        """
+        if (
+            self._synced_at is not None
+            and self._clock() - self._synced_at < self.refresh_seconds
+        ):
+            return False
+        self.sync(session)
+        return True
+
+    def compact(self) -> bool:
+        """
+        Merge all segments into a new base, dropping tombstoned rows
+
+        Searches keep reading the old segments until the merged one is swapped
+        in; only syncs wait for the compaction.
+
+        Returns:
+            True if there was more than one segment to merge
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or len(snapshot.segments) <= 1:
+                return False
+            compacted = _Snapshot([_Segment(self._next_seq(), snapshot.table())])
+            self._persist(compacted)
+            self._publish(compacted)
+            self.compactions += 1
+            return True
+
+    def compact_if_due(self) -> bool:
+        """
+        Compact when there are more than max_segments segments
+
+        Returns:
+            True if a compaction ran
+        """
+        if self.segment_count <= self.max_segments:
+            return False
+        return self.compact()
+
+    def search(self, query: str, limit: int, require_summary: bool = True) -> pa.Table:
+        """
+        Folded substring search with the same matching and scoring as LIKE_SEARCH
+
+        Args:
+            query: Search text
+            limit: Maximum number of rows
+            require_summary: Skip posts without a summary (as /recommend does)
+
+        Returns:
+            Matching rows with a score column, ordered by score and recency
+        """
+        snapshot = self._require_snapshot()
+        pattern = normalize_search_text(query)
+        fields = FIELD_SCORES if pattern else ()
+        parts = []
+        for segment, live in zip(snapshot.segments, snapshot.live):
+            scores: dict[int, float] = {}
+            # スコアの高いフィールドから順に、最初に一致したフィールドのスコアを採る
+            for field, field_score in fields:
+                for row in segment.corpora[field].find_rows(pattern):
+                    if live is None or live[row]:
+                        scores.setdefault(row, field_score)
+            part = segment.table.take(pa.array(list(scores), type=pa.int64()))
+            parts.append(
+                part.append_column(
+                    "score", pa.array(list(scores.values()), type=pa.float64())
+                )
+            )
+
+        matches = parts[0]
+        if len(parts) > 1:
+            columns = matches.column_names
+            matches = pa.concat_tables(
+                [part.select(columns) for part in parts], promote_options="permissive"
+            )
+        if require_summary:
+            matches = matches.filter(pc.is_valid(matches["summary"]))
+        order = pc.sort_indices(
+            matches,
+            sort_keys=[("score", "descending"), ("published_at", "descending")],
+            null_placement="at_end",
+        )
+        return matches.take(order[:limit])
+
+    def eligible_posts(self) -> pd.DataFrame:
+        """Posts with a summary, in the shape of ELIGIBLE_POSTS (for the sampler)"""
+        table = self._require_snapshot().table()
+        columns = ["article_id", "title", "summary", "url", "published_at"]
+        return table.filter(pc.is_valid(table["summary"])).select(columns).to_pandas()
+
+    def stats(self) -> dict[str, Any]:
+        """Post count and the latest update (the sidebar stats of the UI)"""
+        snapshot = self._require_snapshot()
+        return {"post_count": snapshot.num_rows, "latest_update": snapshot.watermark}
+
+    def sync_stats(self) -> dict[str, Any]:
+        """Sync counters and the age of the last sync"""
+        snapshot = self._snapshot
+        return {
+            "rows": snapshot.num_rows if snapshot else 0,
+            "segments": len(snapshot.segments) if snapshot else 0,
+            "syncs": self.syncs,
+            "full_reloads": self.full_reloads,
+            "rows_fetched": self.rows_fetched,
+            "follows": self.follows,
+            "compactions": self.compactions,
+            "age_seconds": (
+                self._clock() - self._synced_at if self._synced_at is not None else -1
+            ),
+        }
+
+    @staticmethod
+    def _unseen(snapshot: _Snapshot, delta: pa.Table, watermark: Any) -> pa.Table:
+        """
+        Rows of the delta that are not already held (the delta query also
+        returns the rows updated exactly at the watermark, which are)
+        """
+        if delta.num_rows == 0:
+            return delta
+        held_at_watermark = snapshot.column("article_id").filter(
+            pc.equal(snapshot.column("updated_at"), watermark)
+        )
+        return delta.filter(
+            pc.or_(
+                pc.greater(delta["updated_at"], watermark),
+                pc.invert(
+                    pc.is_in(
+                        delta["article_id"],
+                        value_set=held_at_watermark.combine_chunks(),
+                    )
+                ),
+            )
+        )
+
+    def _next_seq(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.segments[-1].seq + 1 if snapshot else 1
+
+    def _publish(self, snapshot: _Snapshot) -> None:
+        """Swap in a new snapshot (through shared memory when shared_dir is set)"""
+        if not self.shared_dir:
+            self._snapshot = snapshot
+            return
+        publish_generation(
+            self.shared_dir,
+            [
+                (
+                    segment.name,
+                    segment.table,
+                    {
+                        field: (corpus.text, corpus.starts)
+                        for field, corpus in segment.corpora.items()
+                    },
+                )
+                for segment in snapshot.segments
+            ],
+        )
+        # 公開役自身も共有メモリ上の世代を使い、プロセス内のコピーを捨てる
+        self.follow()
+
+    def _persist(self, snapshot: _Snapshot) -> None:
+        """
+        Write the new delta segment, or the whole snapshot as a new base when
+        the files on disk do not end right before it (each write is atomic)
+        """
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        segments = snapshot.segments
+        if len(segments) > 1 and segments[-2].seq == self._persisted_seq:
+            self._write_parquet(pq, segments[-1].table, self._delta_path(segments[-1]))
+        else:
+            base = snapshot.table().replace_schema_metadata(
+                {SEQ_METADATA_KEY: str(segments[-1].seq)}
+            )
+            self._write_parquet(pq, base, self.path)
+            for _, delta_path in self._delta_files():
+                os.remove(delta_path)
+        self._persisted_seq = segments[-1].seq
+
+    @staticmethod
+    def _write_parquet(pq: Any, table: pa.Table, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _delta_path(self, segment: _Segment) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.delta-{segment.seq:06d}{ext}"
+
+    def _delta_files(self) -> list[tuple[int, str]]:
+        """(seq, path) of the delta segments on disk, oldest first"""
+        root, ext = os.path.splitext(self.path)
+        files = []
+        for delta_path in glob.glob(f"{glob.escape(root)}.delta-*{ext}"):
+            seq = delta_path[len(root) + len(".delta-") : len(delta_path) - len(ext)]
+            if seq.isdigit():
+                files.append((int(seq), delta_path))
+        return sorted(files)
+
+    def _require_snapshot(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Local replica is not loaded")
+        return snapshot
+
+
+def main() -> None:
+    """Main function to sync the local replica"""
+    replica = LocalReplica()
+    replica.load()
+    session = get_snowflake_session()
+    try:
+        fetched = replica.sync(session)
+        # 手動同期では差分セグメントをすべてベースに圧縮する
+        replica.compact()
+        stats = replica.stats()
+        print(
+            f"✅ Synced local replica ({fetched} rows fetched, "
+            f"{stats['post_count']} posts, latest update {stats['latest_update']})"
+        )
+    except Exception as e:
+        print(f"❌ Failed to sync local replica: {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Shared-memory snapshots of the local replica for multiple API workers
+
+With several uvicorn workers, each process would otherwise hold its own copy of
+the replica table and its search corpora. Instead, one worker (the publisher,
+chosen with a file lock) writes every new snapshot as a generation directory
+under LOCAL_REPLICA_SHARED_DIR (/dev/shm on Linux is memory-backed):
+
+    gen-000042/seg-000007/posts.arrow           rows (Arrow IPC file)
+    gen-000042/seg-000007/<field>.corpus        folded UTF-8 text, rows
+                                                separated by NUL
+    gen-000042/seg-000007/<field>.starts.npy    byte offset of each row
+    CURRENT                                     name of the live generation
+
+A generation holds the replica's segments (the base and its delta segments).
+Segments never change once written, so a segment already in the live
+generation is hard-linked into the next one instead of being written again.
+
+A generation is written under a temporary name and renamed into place, and the
+CURRENT pointer is replaced atomically, so readers see either the old or the
+new generation and never a partial one. Every worker, the publisher included,
+memory-maps the files read-only, so the data lives once in the page cache no
+matter how many workers attach. Mapped files stay valid after a newer
+generation replaces them, so readers can switch at their own pace.
+"""
+
+import mmap
+import os
+import shutil
+from typing import IO, Optional, Union
+
+import numpy as np
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - fcntlが無い環境では全ワーカーが公開する
+    fcntl = None
+
+# 公開後も残す古い世代の数（切り替え中の読み手のため）
+KEEP_GENERATIONS = 2
+
+CURRENT_FILE = "CURRENT"
+TABLE_FILE = "posts.arrow"
+
+# (コーパスのバイト列, 各行の開始オフセット)
+CorpusBuffers = tuple[Union[bytes, mmap.mmap], np.ndarray]
+# (セグメント名, テーブル, フィールドごとのコーパス)
+SegmentBuffers = tuple[str, pa.Table, dict[str, CorpusBuffers]]
+
+
+def current_generation(directory: str) -> Optional[str]:
+    """Name of the live generation, or None if nothing was published yet"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(directory: str, segments: list[SegmentBuffers]) -> str:
+    """
+    Write a new generation and make it the live one
+
+    Args:
+        directory: Shared directory (e.g. /dev/shm/mued-replica)
+        segments: (name, table, corpus buffers per field) per segment, oldest
+            first; segments already in the live generation are linked as is
+
+    Returns:
+        Name of the published generation
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = f"gen-{_latest_number(directory) + 1:06d}"
+    live = current_generation(directory)
+
+    tmp_dir = os.path.join(directory, f".tmp-{generation}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    for name, table, corpora in segments:
+        previous = os.path.join(directory, live, name) if live else None
+        if previous and os.path.isdir(previous):
+            _link_segment(previous, os.path.join(tmp_dir, name))
+        else:
+            _write_segment(os.path.join(tmp_dir, name), table, corpora)
+    os.rename(tmp_dir, os.path.join(directory, generation))
+
+    pointer = os.path.join(directory, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+
+    _prune(directory, generation)
+    return generation
+
+
+def attach(
+    directory: str, fields: tuple[str, ...]
+) -> Optional[tuple[str, list[SegmentBuffers]]]:
+    """
+    Memory-map the live generation read-only
+
+    Returns:
+        (generation, segments oldest first), or None if nothing was published yet
+    """
+    generation = current_generation(directory)
+    if generation is None:
+        return None
+
+    path = os.path.join(directory, generation)
+    segments = []
+    for name in sorted(os.listdir(path)):
+        segment_dir = os.path.join(path, name)
+        source = pa.memory_map(os.path.join(segment_dir, TABLE_FILE), "r")
+        table = pa.ipc.open_file(source).read_all()
+        corpora = {}
+        for field in fields:
+            corpora[field] = (
+                _map_readonly(os.path.join(segment_dir, f"{field}.corpus")),
+                np.load(
+                    os.path.join(segment_dir, f"{field}.starts.npy"), mmap_mode="r"
+                ),
+            )
+        segments.append((name, table, corpora))
+    return generation, segments
+
+
+class PublisherLock:
+    """Non-blocking file lock that elects one publisher among the workers"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._file: Optional[IO[str]] = None
+
+    def acquire(self) -> bool:
+        """
+        Try to become the publisher (the lock is held until the process exits)
+
+        Returns:
+            True if this process is the publisher
+        """
+        if self._file is not None or fcntl is None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, ".publisher.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+def _latest_number(directory: str) -> int:
+    numbers = [
+        int(name.split("-")[1])
+        for name in os.listdir(directory)
+        if name.startswith("gen-")
+    ]
+    return max(numbers, default=0)
+
+
+def _write_segment(
+    path: str, table: pa.Table, corpora: dict[str, CorpusBuffers]
+) -> None:
+    os.makedirs(path)
+    with pa.OSFile(os.path.join(path, TABLE_FILE), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    for field, (text, starts) in corpora.items():
+        with open(os.path.join(path, f"{field}.corpus"), "wb") as f:
+            f.write(text)
+        np.save(os.path.join(path, f"{field}.starts.npy"), starts)
+
+
+def _link_segment(source: str, target: str) -> None:
+    os.makedirs(target)
+    for name in os.listdir(source):
+        try:
+            os.link(os.path.join(source, name), os.path.join(target, name))
+        except OSError:
+            # ハードリンクできないファイルシステムではコピーする
+            shutil.copy2(os.path.join(source, name), os.path.join(target, name))
+
+
+def _map_readonly(path: str) -> Union[bytes, mmap.mmap]:
+    # 空のファイルはmmapできない
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _prune(directory: str, live: str) -> None:
+    """Remove generations older than the last KEEP_GENERATIONS"""
+    generations = sorted(
+        name for name in os.listdir(directory) if name.startswith("gen-")
+    )
+    for name in generations[:-KEEP_GENERATIONS]:
+        if name != live:
+            # マップ済みのファイルは削除後も読み手が使い続けられる
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
@@ -0,0 +1,169 @@
+"""
+Per-Student Recommendations Batch Job
+
+Precomputes each student's top-N articles from their interaction history
+(CORE.STUDENT_INTERACTIONS) and the article neighbour graph
+(CORE.RELATED_ARTICLES), and stores them in CORE.STUDENT_RECOMMENDATIONS
+(sql/student_recommendations.sql). /recommend serves these lists with one
+keyed read and only falls back to live results for cold-start students.
+
+A candidate's score is the sum, over the articles the student interacted with,
+of (event weight x recency decay x neighbour similarity). Articles the student
+has already seen are excluded.
+
+Usage:
+    python -m src.student_recommendations
+"""
+
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from snowflake.snowpark import Session
+
+from src.config import get_snowflake_session
+from src.queries import fetch_arrow, to_numpy_columns
+from src.related import replace_table
+
+# 定数
+STUDENT_RECS_TOP_N = int(os.getenv("STUDENT_RECS_TOP_N", "20"))
+STUDENT_HISTORY_DAYS = int(os.getenv("STUDENT_HISTORY_DAYS", "180"))
+STUDENT_HISTORY_HALF_LIFE_DAYS = float(
+    os.getenv("STUDENT_HISTORY_HALF_LIFE_DAYS", "30")
+)
+TABLE_NAME = "CORE.STUDENT_RECOMMENDATIONS"
+
+# イベント種別ごとの重み（未知の種別は1.0）
+EVENT_WEIGHTS = {
+    "view": 1.0,
+    "read": 2.0,
+    "bookmark": 3.0,
+    "like": 3.0,
+}
+
+INTERACTIONS_QUERY = """
+SELECT student_id, article_id, event_type, occurred_at
+FROM CORE.STUDENT_INTERACTIONS
+WHERE occurred_at >= DATEADD('day', -?, CURRENT_TIMESTAMP())
+"""
+
+NEIGHBOURS_QUERY = """
+SELECT article_id, related_id, score
+FROM CORE.RELATED_ARTICLES
+"""
+
+
+def score_students(
+    interactions: pd.DataFrame,
+    neighbours: pd.DataFrame,
+    top_n: int = STUDENT_RECS_TOP_N,
+    half_life_days: float = STUDENT_HISTORY_HALF_LIFE_DAYS,
+    now: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """
+    Rank unseen articles for every student
+
+    Args:
+        interactions: Rows of (student_id, article_id, event_type, occurred_at)
+        neighbours: Rows of (article_id, related_id, score)
+        top_n: Articles to keep per student
+        half_life_days: Half-life of the recency decay on interactions
+        now: Reference time for the decay (for tests)
+
+    Returns:
+        CORE.STUDENT_RECOMMENDATIONS rows; scores are normalized so each
+        student's best article has 1.0
+    """
+    columns = ["STUDENT_ID", "RANK", "ARTICLE_ID", "SCORE", "COMPUTED_AT"]
+    if interactions.empty or neighbours.empty:
+        return pd.DataFrame(columns=columns)
+
+    now = now or datetime.now()
+    age_days = (
+        pd.Timestamp(now) - pd.to_datetime(interactions["occurred_at"])
+    ).dt.total_seconds().clip(lower=0) / 86400
+    weights = interactions["event_type"].map(EVENT_WEIGHTS).fillna(1.0)
+    history = (
+        interactions.assign(affinity=weights * 0.5 ** (age_days / half_life_days))
+        .groupby(["student_id", "article_id"], as_index=False)["affinity"]
+        .sum()
+    )
+
+    candidates = history.merge(neighbours, on="article_id")
+    candidates["score"] = candidates["affinity"] * candidates["score"]
+    scored = candidates.groupby(["student_id", "related_id"], as_index=False)[
+        "score"
+    ].sum()
+
+    # 既読の記事を除外
+    seen = history.rename(columns={"article_id": "related_id"})
+    scored = scored.merge(
+        seen[["student_id", "related_id"]],
+        on=["student_id", "related_id"],
+        how="left",
+        indicator=True,
+    )
+    scored = scored[(scored["_merge"] == "left_only") & (scored["score"] > 0)]
+    if scored.empty:
+        return pd.DataFrame(columns=columns)
+
+    scored = scored.sort_values(
+        ["student_id", "score", "related_id"], ascending=[True, False, True]
+    )
+    scored["rank"] = scored.groupby("student_id").cumcount() + 1
+    scored = scored[scored["rank"] <= top_n]
+    best = scored.groupby("student_id")["score"].transform("max")
+
+    return pd.DataFrame(
+        {
+            "STUDENT_ID": scored["student_id"].to_numpy(),
+            "RANK": scored["rank"].to_numpy(),
+            "ARTICLE_ID": scored["related_id"].to_numpy(),
+            "SCORE": np.clip(scored["score"] / best, 0.0, 1.0).to_numpy(),
+            "COMPUTED_AT": now,
+        },
+        columns=columns,
+    )
+
+
+def _load_frame(session: Session, query: str, params: tuple = ()) -> pd.DataFrame:
+    """Fetch a query result as a DataFrame with lower-case column names"""
+    columns = to_numpy_columns(fetch_arrow(session, query, params))
+    return pd.DataFrame({name.lower(): values for name, values in columns.items()})
+
+
+def refresh_student_recommendations(
+    session: Session, top_n: int = STUDENT_RECS_TOP_N
+) -> int:
+    """
+    Recompute and store the recommendations for every active student
+
+    Returns:
+        Number of rows written
+    """
+    interactions = _load_frame(session, INTERACTIONS_QUERY, (STUDENT_HISTORY_DAYS,))
+    neighbours = _load_frame(session, NEIGHBOURS_QUERY)
+
+    frame = score_students(interactions, neighbours, top_n)
+    replace_table(session, TABLE_NAME, frame)
+    return len(frame)
+
+
+def main() -> None:
+    """Main function to refresh CORE.STUDENT_RECOMMENDATIONS"""
+    session = get_snowflake_session()
+    try:
+        count = refresh_student_recommendations(session)
+        print(f"✅ Stored {count} student recommendation rows")
+    except Exception as e:
+        print(f"❌ Failed to refresh student recommendations: {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Python ports of the warehouse-side text functions
+
+tokenize_terms() mirrors STG.TOKENIZE_TERMS (sql/search_terms.sql): ASCII
+words are lowercased; runs of Japanese characters are split into character
+bigrams (a single character stays as a unigram). normalize_search_text()
+mirrors STG.NORMALIZE_SEARCH_TEXT (sql/search_normalization.sql), which fills
+the pre-folded columns of keyword search. Keeping both sides identical lets
+local indexes and warehouse-side indexes agree.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile("[\u3041-\u30ff\u3400-\u9fff]+")
+_WHITESPACE = re.compile(r"\s+")
+
+# ひらがな（ぁ-ゖ、ゝゞ）をカタカナに寄せる
+_KANA_FOLD = {code: code + 0x60 for code in [*range(0x3041, 0x3097), 0x309D, 0x309E]}
+
+
+def normalize_search_text(text: Optional[str]) -> Optional[str]:
+    """
+    Fold text for keyword search: NFKC, lower case, hiragana to katakana and
+    single spaces ("ＤＴＭ" -> "dtm", "まいく" -> "マイク")
+
+    Args:
+        text: Column value or search query (None stays None)
+
+    Returns:
+        Folded text
+    """
+    if text is None:
+        return None
+    text = unicodedata.normalize("NFKC", text).lower().translate(_KANA_FOLD)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    NFKC and single spaces only, keeping case and kana (the text sent to the
+    embedding model, so queries are embedded like the article text)
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def tokenize_terms(text: Optional[str]) -> Counter:
+    """
+    Split text into search terms with their frequencies
+
+    Args:
+        text: Text to tokenize (None is treated as empty)
+
+    Returns:
+        Counter mapping term -> term frequency
+    """
+    counts: Counter = Counter()
+    if not text:
+        return counts
+
+    text = unicodedata.normalize("NFKC", text).lower()
+    counts.update(_WORD.findall(text))
+
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            counts[run] += 1
+        else:
+            counts.update(run[i : i + 2] for i in range(len(run) - 1))
+
+    return counts
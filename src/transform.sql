@@ -78,12 +78,22 @@ USING (
             ) AS summary,
 
             -- Generate embedding vector using Cortex
-            SNOWFLAKE.CORTEX.EMBED_TEXT_768(
-                'e5-base-v2',
-                CONCAT(title, ' ', COALESCE(LEFT(body_markdown, 1000), ''))
+            -- (skipped for known near-duplicates of another article, see
+            -- sql/near_duplicates.sql; vector search only matches the canonical one;
+            -- python -m src.near_duplicates re-embeds articles that leave a cluster)
+            IFF(
+                dup.article_id IS NULL,
+                SNOWFLAKE.CORTEX.EMBED_TEXT_768(
+                    'e5-base-v2',
+                    CONCAT(title, ' ', COALESCE(LEFT(body_markdown, 1000), ''))
+                ),
+                NULL
             ) AS emb
 
         FROM parsed_articles
+        LEFT JOIN CORE.ARTICLE_DUPLICATES dup
+            ON dup.article_id = parsed_articles.id
+           AND dup.canonical_id != dup.article_id
         WHERE title IS NOT NULL
           AND LENGTH(TRIM(body_markdown)) > 0
     )
@@ -113,16 +123,24 @@ WHEN MATCHED THEN
         target.emb = source.emb,
         target.url = source.url,
         target.published_at = source.published_at,
-        target.updated_at = source.updated_at
+        target.updated_at = source.updated_at,
+        -- Pre-folded copies for keyword search (sql/search_normalization.sql)
+        target.title_norm = STG.NORMALIZE_SEARCH_TEXT(source.title),
+        target.summary_norm = STG.NORMALIZE_SEARCH_TEXT(source.summary),
+        target.body_norm = STG.NORMALIZE_SEARCH_TEXT(source.body_markdown)
 WHEN NOT MATCHED THEN
     INSERT (
         id, title, body_markdown, level, tags,
-        summary, emb, url, published_at, created_at, updated_at
+        summary, emb, url, published_at, created_at, updated_at,
+        title_norm, summary_norm, body_norm
     )
     VALUES (
         source.id, source.title, source.body_markdown, source.level, source.tags,
         source.summary, source.emb, source.url, source.published_at,
-        source.created_at, source.updated_at
+        source.created_at, source.updated_at,
+        STG.NORMALIZE_SEARCH_TEXT(source.title),
+        STG.NORMALIZE_SEARCH_TEXT(source.summary),
+        STG.NORMALIZE_SEARCH_TEXT(source.body_markdown)
     );
 
 -- Clean up processed records from stream
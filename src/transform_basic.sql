@@ -77,16 +77,24 @@ WHEN MATCHED THEN
         target.emb = source.emb,
         target.url = source.url,
         target.published_at = source.published_at,
-        target.updated_at = source.updated_at
+        target.updated_at = source.updated_at,
+        -- Pre-folded copies for keyword search (sql/search_normalization.sql)
+        target.title_norm = STG.NORMALIZE_SEARCH_TEXT(source.title),
+        target.summary_norm = STG.NORMALIZE_SEARCH_TEXT(source.summary),
+        target.body_norm = STG.NORMALIZE_SEARCH_TEXT(source.body_markdown)
 WHEN NOT MATCHED THEN
     INSERT (
         id, title, body_markdown, level, tags,
-        summary, emb, url, published_at, created_at, updated_at
+        summary, emb, url, published_at, created_at, updated_at,
+        title_norm, summary_norm, body_norm
     )
     VALUES (
         source.id, source.title, source.body_markdown, source.level, source.tags,
         source.summary, source.emb, source.url, source.published_at,
-        source.created_at, source.updated_at
+        source.created_at, source.updated_at,
+        STG.NORMALIZE_SEARCH_TEXT(source.title),
+        STG.NORMALIZE_SEARCH_TEXT(source.summary),
+        STG.NORMALIZE_SEARCH_TEXT(source.body_markdown)
     );
 
 -- Log transformation results
@@ -0,0 +1,162 @@
+"""
+Shared test doubles: a manual clock, Snowpark session/result stand-ins, a
+session pool stand-in and BLOG_POSTS rows for the local replica
+"""
+
+from datetime import datetime
+
+import pytest
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResult:
+    """Snowpark DataFrame stand-in holding an Arrow table or a list of rows"""
+
+    def __init__(self, table=None, rows=None):
+        self.table = table
+        self.rows = rows if rows is not None else []
+
+    def to_arrow(self):
+        return self.table
+
+    def to_arrow_batches(self):
+        import pyarrow as pa
+
+        yield from (pa.Table.from_batches([b]) for b in self.table.to_batches(2))
+
+    def collect(self):
+        return self.rows
+
+
+class FakeSession:
+    """
+    Session stand-in that records (query, params) of every statement
+
+    Statements are answered by respond(query, params) when given (an Arrow
+    table, a list of rows or a FakeResult), otherwise by the fixed table and
+    rows. Setting error makes every statement raise it (an expired session).
+    """
+
+    def __init__(self, table=None, rows=None, respond=None, error=None):
+        self.table = table
+        self.rows = rows if rows is not None else [(1,)]
+        self.respond = respond
+        self.error = error
+        self.calls = []
+        self.closed = False
+        self.cancelled = 0
+
+    def sql(self, query, params=None):
+        self.calls.append((query, params))
+        if self.error is not None:
+            raise self.error
+        if self.respond is None:
+            return FakeResult(self.table, self.rows)
+        answer = self.respond(query, params)
+        if isinstance(answer, FakeResult):
+            return answer
+        if isinstance(answer, list):
+            return FakeResult(rows=answer)
+        return FakeResult(table=answer)
+
+    def close(self):
+        self.closed = True
+
+    def cancel_all(self):
+        self.cancelled += 1
+
+
+class FakePool:
+    """Session pool stand-in that calls the function with a fixed session"""
+
+    def __init__(self, session=None, stats=None):
+        self.session = session
+        self._stats = stats or {}
+
+    def run(self, func, *args, **kwargs):
+        return func(self.session, *args, **kwargs)
+
+    def stats(self):
+        return self._stats
+
+
+class FakeVersion:
+    """Data-version probe stand-in with a fixed version"""
+
+    def __init__(self, value=1):
+        self.value = value
+
+    def current(self, session):
+        return self.value
+
+
+def post_row(article_id, title, summary="要約", body="", day=1, updated=1):
+    """One BLOG_POSTS row in the column order of the replica templates"""
+    return (
+        article_id,
+        title,
+        summary,
+        body,
+        f"https://note.com/mued/n/{article_id}",
+        datetime(2024, 6, day),
+        datetime(2024, 7, updated),
+        None,
+    )
+
+
+def posts_table(*rows):
+    """Upper-case Arrow result like Snowflake returns for the replica templates"""
+    import pyarrow as pa
+
+    columns = ["ARTICLE_ID", "TITLE", "SUMMARY", "BODY_MARKDOWN", "URL"]
+    columns += ["PUBLISHED_AT", "UPDATED_AT", "TAGS"]
+    return pa.table(
+        {
+            name: pa.array(
+                [row[i] for row in rows],
+                type=pa.timestamp("us") if name.endswith("_AT") else pa.string(),
+            )
+            for i, name in enumerate(columns)
+        }
+    )
+
+
+class ReplicaSession(FakeSession):
+    """Answers the replica templates from post_row() rows held as the warehouse"""
+
+    def __init__(self, posts):
+        super().__init__(respond=self._answer)
+        self.posts = list(posts)
+
+    def _answer(self, query, params):
+        import pyarrow as pa
+
+        from src import queries
+
+        if query == queries.REPLICA_COUNT:
+            return pa.table({"POST_COUNT": [len(self.posts)]})
+        posts = self.posts
+        if query == queries.REPLICA_DELTA:
+            posts = [row for row in posts if row[6] >= params[0]]
+        return posts_table(*posts)
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at 0"""
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_pool():
+    """A FakePool that runs functions without a session"""
+    return FakePool()
@@ -0,0 +1,75 @@
+"""
+Test the in-memory autocomplete prefix index
+"""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+autocomplete = pytest.importorskip("src.autocomplete")
+
+
+def _posts():
+    return pd.DataFrame(
+        {
+            "title": [
+                "DTMのためのマイク選び",
+                "マイクの置き方で変わる宅録",
+                "コード進行の基本",
+                "DTMのためのマイク選び",
+            ],
+            "tags": ['["DTM", "録音"]', '["録音"]', '["作曲"]', None],
+            "published_at": ["2024-01-01", "2024-03-01", "2023-06-01", None],
+        }
+    )
+
+
+def _index(calls=None, versions=None):
+    versions = versions if versions is not None else ["v1"]
+
+    def load(session):
+        if calls is not None:
+            calls.append(session)
+        return _posts()
+
+    return autocomplete.AutocompleteIndex(
+        load=load, fetch_version=lambda session: versions[-1]
+    )
+
+
+def test_suggest_ranks_prefix_matches_before_matches_inside_titles():
+    """Test that start-of-title matches come first, newest title first"""
+    index = _index()
+    index.refresh(session=None)
+
+    assert index.suggest("まいく") == [
+        "マイクの置き方で変わる宅録",
+        "DTMのためのマイク選び",
+    ]
+    assert index.suggest("ｄｔｍ") == ["DTM", "DTMのためのマイク選び"]
+    assert index.suggest("録") == ["録音", "マイクの置き方で変わる宅録"]
+    assert index.suggest("存在しない") == []
+    assert index.suggest("  ") == []
+
+
+def test_suggest_ranks_tags_by_article_count_and_respects_limit():
+    """Test tag ranking by number of articles and the limit"""
+    index = _index()
+    index.refresh(session=None)
+
+    assert index.suggest("録音", limit=1) == ["録音"]
+    assert index.stats()["suggestions"] == 6
+
+
+def test_refresh_rebuilds_only_on_data_version_change():
+    """Test that the index is loaded once per data version"""
+    calls = []
+    versions = ["v1"]
+    index = _index(calls, versions)
+
+    assert index.suggest("dtm") == []
+    assert index.refresh("session") is True
+    assert index.refresh("session") is False
+    versions.append("v2")
+    assert index.refresh("session") is True
+    assert len(calls) == 2
+    assert index.refreshes == 2
@@ -0,0 +1,102 @@
+"""
+Test the batch recommendation endpoint
+"""
+
+import json
+
+import pytest
+
+from tests.conftest import FakePool
+
+pytest.importorskip("httpx")
+main = pytest.importorskip("api.main")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+def _rec(article_id):
+    return {
+        "article_id": article_id,
+        "score": 1.0,
+        "title": None,
+        "summary": None,
+        "url": None,
+    }
+
+
+def test_batch_dedupes_and_streams_in_request_order(monkeypatch):
+    """Test one set-based student read, one search per unique query, ordered lines"""
+    student_calls = []
+    search_calls = []
+
+    def fake_students(session, student_ids, limit):
+        student_calls.append((student_ids, limit))
+        return {"s1": [_rec("p1"), _rec("p2"), _rec("p3")]}
+
+    async def fake_search(pool, query, limit, mode):
+        search_calls.append((query, limit, mode))
+        return [_rec(f"q-{query}")], False
+
+    monkeypatch.setattr(main, "session_pool", FakePool())
+    monkeypatch.setattr(main, "get_student_recommendations_batch", fake_students)
+    monkeypatch.setattr(main, "get_similar_recommendations", fake_search)
+    monkeypatch.setattr(main.article_sampler, "sample", lambda limit: [_rec("rand")])
+
+    body = {
+        "requests": [
+            {"student_id": "s1", "limit": 2},
+            {"student_id": "s2", "query": "DTM"},
+            {"student_id": "s3", "query": "DTM"},
+            {"student_id": "s4"},
+            {"student_id": "s1", "limit": 3},
+        ]
+    }
+    response = TestClient(main.app).post("/recommend/batch", json=body)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["student_id"] for line in lines] == ["s1", "s2", "s3", "s4", "s1"]
+    assert [r["article_id"] for r in lines[0]["recommendations"]] == ["p1", "p2"]
+    assert lines[1]["recommendations"][0]["article_id"] == "q-DTM"
+    assert lines[3]["recommendations"][0]["article_id"] == "rand"  # cold start
+    assert lines[4]["total_count"] == 3
+
+    assert student_calls == [(["s1", "s4"], 5)]  # max limit across requests
+    assert len(search_calls) == 1
+
+
+def test_batch_reports_failed_items_inline(monkeypatch):
+    """Test that one failing search becomes an error line instead of a 500"""
+
+    async def failing_search(pool, query, limit, mode):
+        raise main.HTTPException(status_code=400, detail="bad query")
+
+    monkeypatch.setattr(main, "session_pool", FakePool())
+    monkeypatch.setattr(main, "get_similar_recommendations", failing_search)
+
+    body = {"requests": [{"student_id": "s1", "query": "x"}]}
+    response = TestClient(main.app).post("/recommend/batch", json=body)
+
+    assert json.loads(response.text) == {"student_id": "s1", "error": "bad query"}
+
+
+def test_batch_falls_back_to_sampler_when_personalized_read_fails(monkeypatch):
+    """Test that a failing set-based read serves random picks per student"""
+    breaker = pytest.importorskip("api.breaker")
+
+    def failing_students(session, student_ids, limit):
+        raise RuntimeError("Object 'CORE.STUDENT_RECOMMENDATIONS' does not exist")
+
+    monkeypatch.setattr(main, "session_pool", FakePool())
+    monkeypatch.setattr(main, "student_recs_breaker", breaker.CircuitBreaker())
+    monkeypatch.setattr(main, "get_student_recommendations_batch", failing_students)
+    monkeypatch.setattr(main.article_sampler, "sample", lambda limit: [_rec("rand")])
+
+    body = {"requests": [{"student_id": "s1"}, {"student_id": "s2", "limit": 2}]}
+    response = TestClient(main.app).post("/recommend/batch", json=body)
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["student_id"] for line in lines] == ["s1", "s2"]
+    assert all(line["recommendations"][0]["article_id"] == "rand" for line in lines)
+    assert main.student_recs_breaker.stats()["consecutive_failures"] == 1
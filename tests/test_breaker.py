@@ -0,0 +1,191 @@
+"""
+Test the circuit breaker and stale results for slow searches
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from tests.conftest import FakePool, FakeVersion
+
+breaker = pytest.importorskip("api.breaker")
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    """Test that the breaker opens at the threshold and rejects calls"""
+    cb = breaker.CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=clock)
+
+    cb.record_failure()
+    cb.record_success()
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == breaker.CLOSED
+    cb.record_failure()
+
+    assert cb.state == breaker.OPEN
+    assert not cb.allow()
+    assert cb.stats() == {
+        "state": 1,
+        "consecutive_failures": 3,
+        "opens": 1,
+        "rejected": 1,
+    }
+
+
+def test_breaker_allows_one_trial_after_reset(clock):
+    """Test that only one half-open trial runs and its result decides the state"""
+    cb = breaker.CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+    cb.record_failure()
+
+    clock.now = 10
+    assert cb.allow()
+    assert not cb.allow()
+    cb.record_failure()
+    assert cb.state == breaker.OPEN
+    assert cb.opens == 2
+
+    clock.now = 20
+    assert cb.allow()
+    cb.record_success()
+    assert cb.state == breaker.CLOSED
+    assert cb.allow()
+
+
+def test_slow_search_serves_stale_result_and_refreshes(monkeypatch):
+    """Test that a search over budget returns the last good result marked stale"""
+    main = pytest.importorskip("api.main")
+    cache_module = pytest.importorskip("src.cache")
+
+    delays = [0.0, 0.3]
+
+    def fake_lexical(session, query, limit):
+        time.sleep(delays.pop(0))
+        return [{"article_id": f"p{len(delays)}", "score": 1.0}]
+
+    cache = cache_module.ResultCache(ttl_seconds=0)
+    monkeypatch.setattr(main, "result_cache", cache)
+    monkeypatch.setattr(main, "data_version", FakeVersion())
+    monkeypatch.setattr(main, "search_flight", main.SingleFlight())
+    monkeypatch.setattr(main, "search_breaker", breaker.CircuitBreaker())
+    monkeypatch.setattr(main, "SEARCH_LATENCY_BUDGET_SECONDS", 0.05)
+    monkeypatch.setattr(main, "USE_CORTEX", False)
+    monkeypatch.setattr(main, "lexical_search", fake_lexical)
+
+    async def search_twice():
+        first = await main.get_similar_recommendations(FakePool(), "DTM", 5)
+        second = await main.get_similar_recommendations(FakePool(), "DTM", 5)
+        await asyncio.sleep(0.4)
+        return first, second
+
+    first, second = asyncio.run(search_twice())
+
+    assert first == ([{"article_id": "p1", "score": 1.0}], False)
+    assert second == ([{"article_id": "p1", "score": 1.0}], True)
+    # 予算を超えた検索は裏で完了し、前回の結果を更新している
+    key = ("similar", "lexical", "DTM", 5)
+    assert cache.get_stale(key) == [{"article_id": "p0", "score": 1.0}]
+    assert cache.stats()["stale_hits"] == 1
+    assert main.search_breaker.stats()["consecutive_failures"] == 0
+
+
+def test_coalesced_waiters_over_budget_do_not_open_the_breaker(monkeypatch):
+    """Test that one slow search counts once, not once per timed-out waiter"""
+    main = pytest.importorskip("api.main")
+    cache_module = pytest.importorskip("src.cache")
+
+    delays = [0.0, 0.3]
+
+    def fake_lexical(session, query, limit):
+        time.sleep(delays.pop(0))
+        return [{"article_id": "p", "score": 1.0}]
+
+    cache = cache_module.ResultCache(ttl_seconds=0)
+    monkeypatch.setattr(main, "result_cache", cache)
+    monkeypatch.setattr(main, "data_version", FakeVersion())
+    monkeypatch.setattr(main, "search_flight", main.SingleFlight())
+    monkeypatch.setattr(
+        main, "search_breaker", breaker.CircuitBreaker(failure_threshold=2)
+    )
+    monkeypatch.setattr(main, "SEARCH_LATENCY_BUDGET_SECONDS", 0.05)
+    monkeypatch.setattr(main, "USE_CORTEX", False)
+    monkeypatch.setattr(main, "lexical_search", fake_lexical)
+
+    async def popular_query():
+        await main.get_similar_recommendations(FakePool(), "DTM", 5)
+        waiters = await asyncio.gather(
+            *(main.get_similar_recommendations(FakePool(), "DTM", 5) for _ in range(6))
+        )
+        state = main.search_breaker.state  # 遅い検索はまだ実行中
+        await asyncio.sleep(0.4)
+        return waiters, state
+
+    waiters, state = asyncio.run(popular_query())
+
+    assert all(stale for _, stale in waiters)
+    assert state == breaker.CLOSED
+    assert main.search_breaker.stats()["consecutive_failures"] == 0
+
+
+def test_query_less_recommend_falls_back_to_sampler(monkeypatch):
+    """Test that a failing per-student lookup serves random picks, then is cached"""
+    pytest.importorskip("httpx")
+    main = pytest.importorskip("api.main")
+    cache_module = pytest.importorskip("src.cache")
+    from fastapi.testclient import TestClient
+
+    calls = []
+
+    def missing_table(session, student_id, limit):
+        calls.append(student_id)
+        raise RuntimeError("Object 'CORE.STUDENT_RECOMMENDATIONS' does not exist")
+
+    def stored(session, student_id, limit):
+        calls.append(student_id)
+        return [{"article_id": "p1", "score": 1.0}]
+
+    monkeypatch.setattr(main, "session_pool", FakePool())
+    monkeypatch.setattr(main, "result_cache", cache_module.ResultCache())
+    monkeypatch.setattr(main, "data_version", FakeVersion())
+    monkeypatch.setattr(main, "student_recs_breaker", breaker.CircuitBreaker())
+    monkeypatch.setattr(main, "get_student_recommendations", missing_table)
+    monkeypatch.setattr(
+        main.article_sampler,
+        "sample",
+        lambda limit, recent=False: [{"article_id": "rand", "score": 1.0}],
+    )
+    client = TestClient(main.app)
+
+    response = client.get("/recommend", params={"student_id": "s1"})
+    assert response.status_code == 200
+    assert response.json()["recommendations"][0]["article_id"] == "rand"
+    assert main.student_recs_breaker.stats()["consecutive_failures"] == 1
+
+    monkeypatch.setattr(main, "get_student_recommendations", stored)
+    for _ in range(2):
+        response = client.get("/recommend", params={"student_id": "s1"})
+        assert response.json()["recommendations"][0]["article_id"] == "p1"
+    assert calls == ["s1", "s1"]  # the second read is served from the cache
+
+
+def test_slow_personalized_read_falls_back_within_budget(monkeypatch):
+    """Test that the query-less path serves random picks instead of waiting"""
+    main = pytest.importorskip("api.main")
+    cache_module = pytest.importorskip("src.cache")
+
+    def slow(session, student_id, limit):
+        time.sleep(0.3)
+        return [{"article_id": "p1", "score": 1.0}]
+
+    monkeypatch.setattr(main, "result_cache", cache_module.ResultCache())
+    monkeypatch.setattr(main, "data_version", FakeVersion())
+    monkeypatch.setattr(main, "student_recs_breaker", breaker.CircuitBreaker())
+    monkeypatch.setattr(main, "SEARCH_LATENCY_BUDGET_SECONDS", 0.05)
+    monkeypatch.setattr(main, "get_student_recommendations", slow)
+
+    start = time.monotonic()
+    result = asyncio.run(main.get_personalized_recommendations(FakePool(), "s1", 5))
+
+    assert result is None
+    assert time.monotonic() - start < 0.25
+    assert main.student_recs_breaker.stats()["consecutive_failures"] == 1
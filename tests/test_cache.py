@@ -0,0 +1,107 @@
+"""
+Test the shared result cache
+"""
+
+import threading
+
+import pytest
+
+cache_module = pytest.importorskip("src.cache")
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = cache_module.ResultCache(maxsize=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(clock):
+    """Test that entries expire after the TTL"""
+    cache = cache_module.ResultCache(maxsize=10, ttl_seconds=5, clock=clock)
+    cache.set("q", [1])
+
+    clock.now = 4.9
+    assert cache.get("q") == [1]
+    clock.now = 5.0
+    assert cache.get("q") is None
+
+
+def test_version_change_invalidates_entries():
+    """Test that a new data version drops all cached results"""
+    cache = cache_module.ResultCache(maxsize=10, ttl_seconds=60)
+    cache.set("q", [1], version="2024-06-27 10:00")
+
+    assert cache.get("q", version="2024-06-27 10:00") == [1]
+    assert cache.get("q", version="2024-06-27 12:00") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["invalidations"] == 1
+
+
+def test_data_version_is_throttled(clock):
+    """Test that the version probe queries at most once per interval"""
+    calls = []
+
+    def fetch(session):
+        calls.append(clock.now)
+        return len(calls)
+
+    version = cache_module.DataVersion(fetch=fetch, check_seconds=30, clock=clock)
+    assert version.current(None) == 1
+    clock.now = 10
+    assert version.current(None) == 1
+    clock.now = 30
+    assert version.current(None) == 2
+    assert len(calls) == 2
+
+
+def test_data_version_refresh_does_not_block_other_callers(clock):
+    """Test that callers get the previous version while one caller refreshes"""
+    started = threading.Event()
+    release = threading.Event()
+    values = iter([1, 2])
+
+    def fetch(session):
+        value = next(values)
+        if value == 2:
+            started.set()
+            release.wait()
+        return value
+
+    version = cache_module.DataVersion(fetch=fetch, check_seconds=30, clock=clock)
+    assert version.current(None) == 1
+
+    clock.now = 30
+    refresher = threading.Thread(target=version.current, args=(None,))
+    refresher.start()
+    started.wait()
+    try:
+        assert version.current(None) == 1  # ロック待ちにならない
+    finally:
+        release.set()
+        refresher.join()
+    assert version.current(None) == 2
+
+
+def test_stale_value_survives_expiry_and_invalidation(clock):
+    """Test that the last good value outlives TTL and data version changes"""
+    cache = cache_module.ResultCache(maxsize=10, ttl_seconds=5, clock=clock)
+    cache.set("q", [1], version="v1")
+
+    clock.now = 10
+    assert cache.get("q", version="v2") is None
+    assert cache.get_stale("q") == [1]
+    assert cache.get_stale("other") is None
+
+    cache.clear()
+    assert cache.get_stale("q") is None
@@ -0,0 +1,105 @@
+"""
+Test the background health prober and the cached health endpoints
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from tests.conftest import FakeClock, FakePool, FakeSession
+
+health = pytest.importorskip("api.health")
+
+
+def test_prober_is_ready_only_after_a_recent_success(clock):
+    """Test that readiness needs a successful probe no older than stale_seconds"""
+    prober = health.HealthProber(stale_seconds=30, clock=clock)
+    assert not prober.ready
+
+    assert prober.probe(FakeSession())
+    assert not prober.ready  # ウォームアップ完了まではreadyにならない
+    prober.mark_warm()
+    assert prober.ready
+
+    clock.now = 31
+    assert not prober.ready
+    snapshot = prober.snapshot()
+    assert snapshot["database_connected"]
+    assert snapshot["last_probe_age_seconds"] == 31
+
+
+def test_failed_probe_is_recorded():
+    """Test that a failing probe clears readiness and keeps the error"""
+    prober = health.HealthProber(clock=FakeClock())
+    prober.probe(FakeSession())
+
+    assert not prober.probe(FakeSession(error=RuntimeError("warehouse suspended")))
+    assert not prober.ready
+    assert prober.snapshot()["last_error"] == "warehouse suspended"
+    assert prober.stats()["probe_failures"] == 1
+    assert prober.stats()["probes"] == 2
+
+
+def test_dedicated_probe_reconnects_after_a_broken_session():
+    """Test that the probe uses its own session and reopens it after a failure"""
+    sessions = [FakeSession(error=RuntimeError("session expired")), FakeSession()]
+    prober = health.HealthProber(
+        clock=FakeClock(), session_factory=lambda: sessions.pop(0)
+    )
+
+    try:
+        assert not asyncio.run(prober.probe_dedicated(timeout=1))
+        assert asyncio.run(prober.probe_dedicated(timeout=1))
+    finally:
+        prober.close()
+
+    assert not sessions
+    assert prober.stats()["probe_failures"] == 1
+
+
+def test_dedicated_probe_times_out_without_queueing():
+    """Test that a hung probe is a failure and is not stacked up behind"""
+    release = threading.Event()
+    hung = FakeSession(respond=lambda query, params: release.wait() and [(1,)])
+    prober = health.HealthProber(clock=FakeClock(), session_factory=lambda: hung)
+
+    try:
+        assert not asyncio.run(prober.probe_dedicated(timeout=0.05))
+        assert not asyncio.run(prober.probe_dedicated(timeout=0.05))
+        assert prober.snapshot()["last_error"] == "前回のプローブが完了していません"
+        assert len(hung.calls) == 1
+    finally:
+        release.set()
+        prober.close()
+
+
+def test_health_endpoints_answer_from_cached_state(monkeypatch):
+    """Test that /health/ready follows the last probe without querying"""
+    pytest.importorskip("httpx")
+    main = pytest.importorskip("api.main")
+    from fastapi.testclient import TestClient
+
+    prober = health.HealthProber(clock=FakeClock())
+    monkeypatch.setattr(main, "health_prober", prober)
+    monkeypatch.setattr(
+        main,
+        "session_pool",
+        FakePool(stats={"size": 2, "in_use": 1, "utilization": 0.25}),
+    )
+    client = TestClient(main.app)
+
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+
+    session = FakeSession()
+    prober.probe(session)
+    prober.mark_warm()
+    response = client.get("/health/ready")
+    client.get("/health")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and body["status"] == "healthy"
+    assert body["pool_size"] == 2
+    assert len(session.calls) == 1
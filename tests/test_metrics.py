@@ -0,0 +1,63 @@
+"""
+Test the Prometheus metrics
+"""
+
+import pytest
+
+from tests.conftest import FakeSession
+
+metrics_module = pytest.importorskip("api.metrics")
+queries = pytest.importorskip("src.queries")
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test Prometheus histogram lines with cumulative counts, sum and count"""
+    histogram = metrics_module.Histogram("latency", "test", ("path",), (0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+
+    assert 'latency_bucket{path="/a",le="0.1"} 1' in lines
+    assert 'latency_bucket{path="/a",le="1.0"} 2' in lines
+    assert 'latency_bucket{path="/a",le="+Inf"} 3' in lines
+    assert 'latency_sum{path="/a"} 5.55' in lines
+    assert 'latency_count{path="/a"} 3' in lines
+
+
+def test_observe_query_names_statements_and_counts_slow_queries(caplog):
+    """Test statement names from src.queries and the slow-query log"""
+    metrics = metrics_module.ApiMetrics(slow_query_ms=100)
+
+    metrics.observe_query("q1", queries.LIKE_SEARCH, 0.01)
+    metrics.observe_query("q2", queries.LIKE_SEARCH, 0.5)
+
+    assert metrics.query_latency.count("like_search") == 2
+    assert metrics.slow_queries.value("like_search") == 1
+    assert "query_id=q2" in caplog.text
+
+
+def test_collect_query_stats_records_compile_and_execution_time():
+    """Test that pending query ids are looked up once in query history"""
+    metrics = metrics_module.ApiMetrics()
+    metrics.observe_query("q1", queries.RANDOM_POSTS, 0.01)
+    session = FakeSession(
+        rows=[{"QUERY_ID": "q1", "COMPILATION_TIME": 120, "EXECUTION_TIME": 30}]
+    )
+
+    assert metrics.collect_query_stats(session) == 1
+    assert session.calls[-1][1] == ['["q1"]']
+    assert metrics.query_compile.count("random_posts") == 1
+    assert metrics.collect_query_stats(session) == 0  # nothing pending
+
+
+def test_stats_lines_marks_counters():
+    """Test that monotonic stats become *_total counters"""
+    lines = metrics_module.stats_lines("cache", {"hits": 3, "size": 2}, ("hits",))
+    assert lines == [
+        "# TYPE cache_hits_total counter",
+        "cache_hits_total 3",
+        "# TYPE cache_size gauge",
+        "cache_size 2",
+    ]
@@ -0,0 +1,116 @@
+"""
+Test the MinHash/LSH near-duplicate detection
+"""
+
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import FakeSession
+
+near_duplicates = pytest.importorskip("src.near_duplicates")
+terms = pytest.importorskip("src.terms")
+
+
+def _article(seed: int, length: int = 2000) -> str:
+    rng = random.Random(seed)
+    # ひらがな80文字からの無作為な本文（別の記事とは5-gramがほぼ重ならない）
+    return "".join(chr(0x3041 + rng.randrange(80)) for _ in range(length))
+
+
+def _jaccard(left: str, right: str) -> float:
+    a = set(near_duplicates.shingle_hashes(left).tolist())
+    b = set(near_duplicates.shingle_hashes(right).tolist())
+    return len(a & b) / len(a | b)
+
+
+def test_signature_agreement_estimates_jaccard():
+    """Test that signature agreement tracks the shingle Jaccard similarity"""
+    original = _article(1)
+    edited = original[:900] + "（追記あり）" + original[900:1900]
+
+    left = near_duplicates.minhash_signature(original)
+    right = near_duplicates.minhash_signature(edited)
+
+    assert left.dtype == np.uint32
+    assert left.shape == (near_duplicates.NUM_PERMUTATIONS,)
+    assert abs(np.mean(left == right) - _jaccard(original, edited)) < 0.15
+    assert np.mean(left == near_duplicates.minhash_signature(_article(2))) < 0.3
+
+
+def test_duplicates_frame_clusters_near_duplicates_only():
+    """Test clustering of edited re-posts, canonical choice and short bodies"""
+    original = terms.normalize_search_text(_article(1))
+    texts = {
+        "repost": original,
+        "original": original,
+        "edited": original[:800] + " 追記 " + original[800:],
+        "other": terms.normalize_search_text(_article(2)),
+        "short": "dtm",
+        "short2": "dtm",
+    }
+    published_at = {
+        "repost": "2024-03-01",
+        "original": "2024-01-01",
+        "edited": "2024-02-01",
+        "other": "2023-01-01",
+        "short": None,
+        "short2": None,
+    }
+    ids = list(texts)
+    signatures = np.array(
+        [near_duplicates.minhash_signature(texts[i]) for i in ids], dtype=np.uint32
+    )
+
+    frame = near_duplicates.build_duplicates_frame(
+        ids, signatures, [published_at[i] for i in ids]
+    )
+
+    rows = frame.set_index("ARTICLE_ID")
+    assert sorted(rows.index) == ["edited", "original", "repost"]
+    assert set(rows["CANONICAL_ID"]) == {"original"}
+    assert rows.loc["original", "SIMILARITY"] == 1.0
+    assert rows.loc["repost", "SIMILARITY"] == 1.0
+    assert rows.loc["edited", "SIMILARITY"] >= near_duplicates.NEAR_DUPLICATE_THRESHOLD
+
+
+def test_duplicates_frame_is_empty_without_duplicates():
+    """Test that distinct articles produce no clusters"""
+    ids = [f"n{i}" for i in range(5)]
+    signatures = np.array(
+        [near_duplicates.minhash_signature(_article(i)) for i in range(5)],
+        dtype=np.uint32,
+    )
+
+    frame = near_duplicates.build_duplicates_frame(ids, signatures, [None] * 5)
+
+    assert frame.empty
+    assert list(frame.columns) == [
+        "ARTICLE_ID",
+        "CANONICAL_ID",
+        "SIMILARITY",
+        "COMPUTED_AT",
+    ]
+
+
+def test_sync_embeddings_restores_articles_that_left_a_cluster():
+    """Test that only articles no longer non-canonical are re-embedded"""
+    frame = pd.DataFrame(
+        {
+            "ARTICLE_ID": ["a", "b", "c"],
+            "CANONICAL_ID": ["a", "a", "a"],
+            "SIMILARITY": [1.0, 0.9, 0.85],
+        }
+    )
+    session = FakeSession()
+
+    restored = near_duplicates.sync_duplicate_embeddings(session, {"b", "x"}, frame)
+
+    assert restored == 1
+    assert session.calls == [
+        (near_duplicates.CLEAR_DUPLICATE_EMBEDDINGS, None),
+        (near_duplicates.RESTORE_EMBEDDINGS, [json.dumps(["x"])]),
+    ]
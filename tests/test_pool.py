@@ -0,0 +1,137 @@
+"""
+Test the Snowpark session pool
+"""
+
+import threading
+
+import pytest
+
+from tests.conftest import FakeSession
+
+pool_module = pytest.importorskip("api.pool")
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        session = FakeSession(rows=[1])
+        created.append(session)
+        return session
+
+    options = {"min_size": 1, "max_size": 2, "keepalive_seconds": 0}
+    options.update(kwargs)
+    pool = pool_module.SessionPool(factory=factory, **options)
+    pool.open()
+    return pool, created
+
+
+def test_open_creates_min_size_sessions():
+    """Test that the pool starts with min_size sessions"""
+    pool, created = make_pool(min_size=2, max_size=4)
+    assert len(created) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_open_retry_only_creates_missing_sessions():
+    """Test that calling open again after a failed login tops up to min_size"""
+    created = []
+
+    def factory():
+        if len(created) == 1 and not getattr(factory, "failed", False):
+            factory.failed = True
+            raise ConnectionError("login failed")
+        created.append(FakeSession(rows=[1]))
+        return created[-1]
+
+    pool = pool_module.SessionPool(
+        factory=factory, min_size=2, max_size=4, keepalive_seconds=0
+    )
+    with pytest.raises(ConnectionError):
+        pool.open()
+    pool.open()
+    pool.open()
+
+    assert len(created) == 2
+    assert pool.stats()["size"] == 2
+
+
+def test_acquire_grows_to_max_size_then_times_out():
+    """Test that checkout waits once max_size sessions are in use"""
+    pool, created = make_pool(min_size=1, max_size=2, timeout_seconds=0.05)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert len(created) == 2
+    assert pool.stats()["utilization"] == 1.0
+
+    with pytest.raises(pool_module.PoolTimeoutError):
+        pool.acquire()
+
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_waiting_checkout_gets_released_session():
+    """Test that a blocked checkout is served when a session is returned"""
+    pool, _ = make_pool(min_size=1, max_size=1, timeout_seconds=5)
+    session = pool.acquire()
+
+    threading.Timer(0.05, pool.release, args=(session,)).start()
+    assert pool.acquire() is session
+
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["wait_ms_max"] > 0
+
+
+def test_run_reconnects_expired_session():
+    """Test that an expired session is replaced and the call retried"""
+    pool, created = make_pool(min_size=1, max_size=2)
+    created[0].error = ConnectionError("session expired")
+
+    result = pool.run(lambda session: session.sql("SELECT 1").collect())
+
+    assert result == [1]
+    assert created[0].closed
+    assert pool.stats()["reconnects"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_run_reraises_query_errors_on_healthy_session():
+    """Test that SQL errors on a live session are not retried"""
+    pool, created = make_pool()
+
+    def failing(session):
+        raise ValueError("syntax error")
+
+    with pytest.raises(ValueError):
+        pool.run(failing)
+    assert len(created) == 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_idle_session_is_validated_on_checkout(clock):
+    """Test that a session idle past the threshold is checked and replaced"""
+    pool, created = make_pool(validate_after_seconds=60, clock=clock)
+    created[0].error = ConnectionError("session expired")
+
+    clock.now = 61
+    session = pool.acquire()
+
+    assert session is created[1]
+    assert pool.stats()["validation_failures"] == 1
+
+
+def test_maintain_replaces_dead_idle_sessions(clock):
+    """Test that keep-alive drops dead sessions and refills to min_size"""
+    pool, created = make_pool(min_size=1, clock=clock)
+    pool.keepalive_seconds = 300
+    created[0].error = ConnectionError("session expired")
+
+    clock.now = 301
+    pool.maintain()
+
+    assert len(created) == 2
+    assert pool.stats()["size"] == 1
+    assert pool.stats()["idle"] == 1
@@ -0,0 +1,42 @@
+"""
+Test the Arrow-based query helpers
+"""
+
+import numpy as np
+import pytest
+
+from tests.conftest import FakeSession
+
+pa = pytest.importorskip("pyarrow")
+queries = pytest.importorskip("src.queries")
+
+
+def _table():
+    # run_query releases the Arrow buffers while converting, so build a fresh table
+    return pa.table({"ID": ["a", "b", "c"], "N": [1, 2, 3], "X": [1.5, None, 2.5]})
+
+
+def test_run_query_binds_params_and_returns_frame():
+    """Test that run_query passes binds through and converts Arrow to pandas"""
+    session = FakeSession(table=_table())
+    df = queries.run_query(session, queries.RANDOM_POSTS, (5,))
+
+    assert session.calls == [(queries.RANDOM_POSTS, [5])]
+    assert df["ID"].tolist() == ["a", "b", "c"]
+
+
+def test_to_numpy_columns_wraps_numeric_buffers_without_copy():
+    """Test zero-copy for null-free numeric columns and fallback for the rest"""
+    table = _table()
+    columns = queries.to_numpy_columns(table)
+
+    buffer = np.frombuffer(table["N"].chunk(0).buffers()[1], dtype=np.int64)
+    assert np.shares_memory(columns["N"], buffer)
+    assert columns["ID"].tolist() == ["a", "b", "c"]
+    assert np.isnan(columns["X"][1])
+
+
+def test_iter_arrow_batches_streams_all_rows():
+    """Test that batches cover the whole result"""
+    batches = list(queries.iter_arrow_batches(FakeSession(table=_table()), "SELECT 1"))
+    assert sum(batch.num_rows for batch in batches) == 3
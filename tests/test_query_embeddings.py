@@ -0,0 +1,68 @@
+"""
+Test the query-embedding cache
+"""
+
+import json
+
+import pytest
+
+from tests.conftest import FakeSession
+
+pa = pytest.importorskip("pyarrow")
+embeddings = pytest.importorskip("src.query_embeddings")
+queries = pytest.importorskip("src.queries")
+
+
+class FakeCortex:
+    """Embeds with Cortex by text length and holds CORE.QUERY_EMBEDDINGS"""
+
+    def __init__(self, stored=None):
+        self.stored = stored if stored is not None else {}
+        self.embedded = []
+
+    def __call__(self, query, params):
+        if query == queries.EMBED_QUERY:
+            self.embedded.append(params[0])
+            vector = json.dumps([float(len(params[0]))] * 3)
+            return pa.table({"QUERY_EMB": [vector]})
+        if query == queries.QUERY_EMBEDDING_LOOKUP:
+            rows = [self.stored[params[0]]] if params[0] in self.stored else []
+            return pa.table({"QUERY_EMB": pa.array(rows, pa.string())})
+        if query == queries.QUERY_EMBEDDING_STORE:
+            self.stored.setdefault(params[0], params[1])
+            return pa.table({"ROWS_INSERTED": [1]})
+        raise AssertionError(f"unexpected query: {query}")
+
+
+def test_lru_is_keyed_by_normalized_query():
+    """Test that variants of a query are embedded once and the LRU is bounded"""
+    cortex = FakeCortex()
+    session = FakeSession(respond=cortex)
+    cache = embeddings.QueryEmbeddingCache(maxsize=2, use_table=False)
+
+    first = cache.get(session, "DTM 入門")
+    assert cache.get(session, "  ｄｔｍ　入門") == first
+    cache.get(session, "みっくす")
+    assert cache.get(session, "ミックス") == cache.get(session, "ﾐｯｸｽ")
+    cache.get(session, "作曲")
+
+    # 折り畳んだキーで引くが、埋め込むのは NFKC と空白だけ正規化した元の文字列
+    assert cortex.embedded == ["DTM 入門", "みっくす", "作曲"]
+    assert json.loads(first) == [6.0, 6.0, 6.0]
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["evictions"] == 1
+    assert cortex.stored == {}
+
+
+def test_table_tier_is_shared_between_caches():
+    """Test that a cold process reads embeddings stored by another one"""
+    stored = {}
+    warm = embeddings.QueryEmbeddingCache(use_table=True)
+    vector = warm.get(FakeSession(respond=FakeCortex(stored)), "DTM")
+
+    cortex = FakeCortex(stored)
+    cold = embeddings.QueryEmbeddingCache(use_table=True)
+
+    assert cold.get(FakeSession(respond=cortex), "dtm") == vector
+    assert cortex.embedded == []
+    assert cold.stats()["table_hits"] == 1
@@ -0,0 +1,113 @@
+"""
+Test the related-articles batch computation and the shared tokenizer
+"""
+
+import numpy as np
+import pytest
+
+related = pytest.importorskip("src.related")
+terms = pytest.importorskip("src.terms")
+
+
+def test_tokenize_terms_matches_index_tokenizer():
+    """Test ASCII folding and Japanese bigrams like STG.TOKENIZE_TERMS"""
+    counts = terms.tokenize_terms("ＤＴＭで作曲 DTM 曲")
+
+    assert counts["dtm"] == 2
+    assert counts["で作"] == 1
+    assert counts["作曲"] == 1
+    assert counts["曲"] == 1
+    assert not terms.tokenize_terms(None)
+
+
+def test_normalize_search_text_folds_width_case_and_kana():
+    """Test the folding of STG.NORMALIZE_SEARCH_TEXT"""
+    assert terms.normalize_search_text("ＤＴＭ　の\n まいく") == "dtm ノ マイク"
+    assert terms.normalize_search_text("ﾏｲｸ") == "マイク"
+    assert terms.normalize_search_text(None) is None
+
+
+def test_top_k_neighbours_matches_brute_force():
+    """Test that blocked top-k equals a full similarity sort, excluding self"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(37, 8)).astype(np.float32)
+
+    indices, scores = related.top_k_neighbours(X, k=5, block_size=8)
+
+    normed = X / np.linalg.norm(X, axis=1, keepdims=True)
+    sims = normed @ normed.T
+    np.fill_diagonal(sims, -np.inf)
+    expected = np.argsort(-sims, axis=1)[:, :5]
+
+    assert indices.shape == (37, 5)
+    assert (indices == expected).all()
+    assert (indices != np.arange(37)[:, None]).all()
+    assert ((scores >= 0.0) & (scores <= 1.0)).all()
+
+
+def test_top_k_neighbours_caps_k_at_corpus_size():
+    """Test that k is reduced when there are fewer other articles"""
+    indices, _ = related.top_k_neighbours(np.eye(3, dtype=np.float32), k=10)
+    assert indices.shape == (3, 2)
+
+
+def test_lexical_vectors_rank_shared_terms_first():
+    """Test the lexical fallback finds the article with overlapping terms"""
+    X = related.lexical_vectors(["Python データ分析", "Python データ分析 入門", "DTM 作曲 コード進行"])
+    indices, _ = related.top_k_neighbours(X, k=1)
+    assert indices[0, 0] == 1
+    assert indices[1, 0] == 0
+
+
+def test_load_embedding_vectors_averages_normalized_chunks():
+    """Test one L2-normalized mean vector per article from Arrow chunk rows"""
+    pa = pytest.importorskip("pyarrow")
+    from tests.conftest import FakeSession
+
+    table = pa.table(
+        {
+            "ARTICLE_ID": ["b", "a", "b"],
+            "EMBEDDING_VECTOR": [[3.0, 0.0], [0.0, 2.0], [0.0, 5.0]],
+        }
+    )
+
+    ids, X = related.load_embedding_vectors(FakeSession(table=table))
+
+    assert ids == ["a", "b"]
+    np.testing.assert_allclose(X, [[0.0, 1.0], [2**-0.5, 2**-0.5]], atol=1e-6)
+
+
+def test_load_lexical_vectors_reads_arrow_columns_with_nulls():
+    """Test lexical vectors are built from Arrow columns, treating nulls as empty"""
+    pa = pytest.importorskip("pyarrow")
+    from tests.conftest import FakeSession
+
+    table = pa.table(
+        {
+            "ARTICLE_ID": ["a", "b"],
+            "TITLE": ["Python データ分析", "Python データ分析"],
+            "SUMMARY": [None, "入門"],
+            "BODY_MARKDOWN": ["", None],
+        }
+    )
+
+    ids, X = related.load_lexical_vectors(FakeSession(table=table))
+
+    assert ids == ["a", "b"]
+    np.testing.assert_allclose(
+        X, related.lexical_vectors(["Python データ分析\n\n", "Python データ分析\n入門\n"])
+    )
+
+
+def test_top_k_neighbours_collapses_near_duplicates():
+    """Test that copies are never neighbours and clusters show only canonical"""
+    X = np.array([[1.0, 0.0], [1.0, 0.01], [0.9, 0.1], [0.0, 1.0]], dtype=np.float32)
+    ids = ["orig", "copy", "other", "far"]
+    groups, candidates = related.duplicate_groups(ids, {"copy": "orig"})
+
+    indices, _ = related.top_k_neighbours(X, k=5, groups=groups, candidates=candidates)
+
+    names = [[ids[i] for i in row] for row in indices]
+    assert names[0] == ["other", "far"]
+    assert names[1] == ["other", "far"]
+    assert names[2] == ["orig", "far"]
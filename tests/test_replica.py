@@ -0,0 +1,161 @@
+"""
+Test the local BLOG_POSTS replica
+"""
+
+from datetime import datetime
+
+import pytest
+
+from tests.conftest import ReplicaSession, post_row
+
+pa = pytest.importorskip("pyarrow")
+replica_module = pytest.importorskip("src.replica")
+queries = pytest.importorskip("src.queries")
+
+
+def test_sync_fetches_only_rows_since_watermark(tmp_path):
+    """Test the full first sync, then a delta sync that merges by article_id"""
+    session = ReplicaSession([post_row("a", "DTM入門"), post_row("b", "ミックス")])
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    assert replica.sync(session) == 2
+
+    session.posts = [
+        post_row("a", "DTM入門 改訂版", updated=3),
+        post_row("b", "ミックス"),
+        post_row("c", "コード進行", updated=3),
+    ]
+    replica.sync(session)
+
+    query, params = session.calls[1]
+    assert query == queries.REPLICA_DELTA
+    assert params == [datetime(2024, 7, 1)]
+    assert replica.stats() == {"post_count": 3, "latest_update": datetime(2024, 7, 3)}
+    result = replica.search("改訂版", 10).to_pydict()
+    assert result["article_id"] == ["a"]
+    assert replica.full_reloads == 1
+
+    # 同じパスから読み直すと同じスナップショットになる
+    reloaded = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    assert reloaded.load()
+    assert reloaded.stats() == replica.stats()
+
+
+def test_deleted_rows_trigger_full_reload(tmp_path):
+    """Test that a row-count mismatch reloads the whole snapshot"""
+    session = ReplicaSession([post_row("a", "DTM"), post_row("b", "ミックス")])
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    replica.sync(session)
+
+    session.posts = [post_row("a", "DTM")]
+    replica.sync(session)
+
+    assert replica.stats()["post_count"] == 1
+    assert replica.full_reloads == 2
+
+
+def test_search_matches_like_search_scoring(tmp_path):
+    """Test field scores, summary filter and recency tie-breaking"""
+    session = ReplicaSession(
+        [
+            post_row("body", "別の話", body="dtmの話", day=5),
+            post_row("old", "DTM 入門", day=1),
+            post_row("new", "はじめてのDTM", day=9),
+            post_row("nosum", "DTM", summary=None),
+            post_row("summary", "ミックス", summary="DTMで仕上げる"),
+        ]
+    )
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    replica.sync(session)
+
+    result = replica.search("dtm", 10).to_pydict()
+
+    assert result["article_id"] == ["new", "old", "summary", "body"]
+    assert result["score"] == [1.0, 1.0, 0.7, 0.5]
+    assert replica.search("dtm", 10, require_summary=False).num_rows == 5
+    assert replica.search("dtm", 1).num_rows == 1
+    assert replica.search(" 　", 10, require_summary=False).num_rows == 0
+
+
+def test_delta_segments_tombstone_updated_rows(tmp_path):
+    """Test that a sync appends a delta segment that hides older copies"""
+    session = ReplicaSession([post_row("a", "DTM入門"), post_row("b", "ミックス")])
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    replica.sync(session)
+
+    session.posts = [post_row("a", "作曲入門", updated=3), post_row("b", "ミックス")]
+    replica.sync(session)
+
+    assert replica.segment_count == 2
+    assert replica.search("dtm", 10).num_rows == 0
+    assert replica.search("作曲", 10).to_pydict()["article_id"] == ["a"]
+    assert replica.stats()["post_count"] == 2
+    assert sorted(replica.eligible_posts()["title"]) == ["ミックス", "作曲入門"]
+
+    # ベースと差分のファイルから同じセグメントを読み直せる
+    reloaded = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    assert reloaded.load()
+    assert reloaded.segment_count == 2
+    assert reloaded.search("dtm", 10).num_rows == 0
+
+
+def test_compaction_merges_segments(tmp_path):
+    """Test that compaction keeps only live rows in one base segment"""
+    session = ReplicaSession([post_row("a", "DTM入門"), post_row("b", "ミックス")])
+    replica = replica_module.LocalReplica(
+        path=str(tmp_path / "posts.parquet"), max_segments=2
+    )
+    replica.sync(session)
+    for updated in (3, 4):
+        session.posts[0] = post_row("a", f"DTM入門 第{updated}版", updated=updated)
+        replica.sync(session)
+    before = replica.search("dtm", 10).to_pydict()
+
+    assert replica.segment_count == 3
+    assert replica.compact_if_due()
+    assert not replica.compact_if_due()
+
+    assert replica.segment_count == 1
+    assert replica.search("dtm", 10).to_pydict() == before
+    assert replica.stats() == {"post_count": 2, "latest_update": datetime(2024, 7, 4)}
+    assert [p.name for p in tmp_path.iterdir()] == ["posts.parquet"]
+    reloaded = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    assert reloaded.load()
+    assert reloaded.segment_count == 1
+    assert reloaded.stats() == replica.stats()
+
+
+def test_search_folds_width_and_kana(tmp_path):
+    """Test that full-width and hiragana queries match like the *_norm columns"""
+    session = ReplicaSession([post_row("a", "DTMのマイク選び"), post_row("b", "ミックス")])
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    replica.sync(session)
+
+    assert replica.search("ＤＴＭ", 10).to_pydict()["article_id"] == ["a"]
+    assert replica.search("まいく", 10).to_pydict()["article_id"] == ["a"]
+
+
+def test_api_searches_the_replica_off_the_event_loop(tmp_path, monkeypatch):
+    """Test that lexical requests read the replica in a worker thread"""
+    import asyncio
+    import threading
+
+    main = pytest.importorskip("api.main")
+    replica = replica_module.LocalReplica(path=str(tmp_path / "posts.parquet"))
+    replica.sync(ReplicaSession([post_row("a", "DTM 入門")]))
+    threads = []
+    search = replica.search
+
+    def recording_search(query, limit):
+        threads.append(threading.current_thread())
+        return search(query, limit)
+
+    monkeypatch.setattr(replica, "search", recording_search)
+    monkeypatch.setattr(main, "local_replica", replica)
+
+    results, stale = asyncio.run(
+        main.get_similar_recommendations(None, "dtm", 5, main.SearchMode.LEXICAL)
+    )
+
+    assert [r["article_id"] for r in results] == ["a"]
+    assert not stale
+    assert threads and threads[0] is not threading.main_thread()
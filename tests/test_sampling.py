@@ -0,0 +1,91 @@
+"""
+Test the in-memory random recommendation pool
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+sampling = pytest.importorskip("api.sampling")
+
+NOW = datetime(2024, 6, 27)
+
+
+def make_posts(n):
+    return pd.DataFrame(
+        {
+            "article_id": [f"n{i}" for i in range(n)],
+            "title": [f"記事 {i}" for i in range(n)],
+            "summary": ["要約"] * n,
+            "url": [f"https://note.com/n/n{i}" for i in range(n)],
+            # n0 is the newest article
+            "published_at": [NOW - timedelta(days=30 * i) for i in range(n)],
+        }
+    )
+
+
+def make_sampler(n=50, versions=None):
+    versions = versions if versions is not None else ["v1"]
+    loads = []
+
+    def load(session):
+        loads.append(1)
+        return make_posts(n)
+
+    sampler = sampling.ArticleSampler(
+        load=load,
+        fetch_version=lambda session: versions[0],
+        half_life_days=30,
+        rng=random.Random(42),
+    )
+    return sampler, loads
+
+
+def test_sample_before_refresh_returns_none():
+    """Test that callers fall back to SQL until the pool is loaded"""
+    sampler, _ = make_sampler()
+    assert not sampler.ready
+    assert sampler.sample(5) is None
+
+
+def test_sample_returns_unique_articles():
+    """Test that picks are distinct and shaped like SQL results"""
+    sampler, _ = make_sampler(n=10)
+    sampler.refresh(None, now=NOW)
+
+    picks = sampler.sample(5)
+    assert len({p["article_id"] for p in picks}) == 5
+    assert all(p["score"] == 1.0 for p in picks)
+    assert all("published_at" not in p for p in picks)
+
+    assert len(sampler.sample(20)) == 10
+    assert len(sampler.sample(20, recent=True)) == 10
+
+
+def test_refresh_only_when_version_changes():
+    """Test that the pool is reloaded only for a new data version"""
+    versions = ["v1"]
+    sampler, loads = make_sampler(versions=versions)
+
+    assert sampler.refresh(None, now=NOW)
+    assert not sampler.refresh(None, now=NOW)
+    versions[0] = "v2"
+    assert sampler.refresh(None, now=NOW)
+    assert len(loads) == 2
+
+
+def test_recent_weighting_prefers_new_articles():
+    """Test that recency weighting favours recently published articles"""
+    sampler, _ = make_sampler(n=50)
+    sampler.refresh(None, now=NOW)
+
+    counts = {"uniform": 0, "recent": 0}
+    for _ in range(200):
+        counts["uniform"] += "n0" in {p["article_id"] for p in sampler.sample(3)}
+        counts["recent"] += "n0" in {
+            p["article_id"] for p in sampler.sample(3, recent=True)
+        }
+
+    assert counts["recent"] > counts["uniform"] * 2
@@ -0,0 +1,209 @@
+"""
+Test hybrid search and reciprocal rank fusion
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from tests.conftest import FakePool, FakeSession, FakeVersion
+
+search = pytest.importorskip("api.search")
+
+
+def _rec(article_id, score=1.0):
+    return {
+        "article_id": article_id,
+        "score": score,
+        "title": f"title {article_id}",
+        "summary": None,
+        "url": None,
+    }
+
+
+def test_rrf_prefers_articles_ranked_by_both_retrievers():
+    """Test that an article found by both retrievers ranks first"""
+    lexical = [_rec("a"), _rec("b"), _rec("c")]
+    vector = [_rec("d"), _rec("b"), _rec("a")]
+
+    fused = search.reciprocal_rank_fusion([lexical, vector], limit=10)
+
+    assert [rec["article_id"] for rec in fused[:2]] == ["a", "b"]
+    assert len(fused) == 4
+    assert all(0.0 <= rec["score"] <= 1.0 for rec in fused)
+
+
+def test_rrf_normalizes_top_score_to_one():
+    """Test that rank 1 in every list gives a score of 1.0"""
+    fused = search.reciprocal_rank_fusion([[_rec("a")], [_rec("a")]], limit=5)
+    assert fused[0]["score"] == pytest.approx(1.0)
+
+
+def test_rrf_respects_limit():
+    """Test that the fused list is truncated to limit"""
+    ranked = [_rec(str(i)) for i in range(10)]
+    assert len(search.reciprocal_rank_fusion([ranked], limit=3)) == 3
+
+
+def test_hybrid_search_skips_slow_retriever(monkeypatch):
+    """Test that a retriever over budget does not block the response"""
+
+    def slow_vector(session, query, limit):
+        time.sleep(0.5)
+        return [_rec("slow")]
+
+    monkeypatch.setattr(search, "USE_CORTEX", True)
+    monkeypatch.setattr(search, "lexical_search", lambda s, q, n: [_rec("fast")])
+    monkeypatch.setattr(search, "vector_search", slow_vector)
+
+    monkeypatch.setattr(search, "RETRIEVER_BUDGET_SECONDS", 0.05)
+
+    async def timed_search():
+        start = time.perf_counter()
+        results, skipped = await search.hybrid_search(FakePool(), "DTM", limit=5)
+        return results, skipped, time.perf_counter() - start
+
+    results, skipped, elapsed = asyncio.run(timed_search())
+
+    assert elapsed < 0.5
+    assert [rec["article_id"] for rec in results] == ["fast"]
+    assert skipped == ["vector"]
+
+
+def test_hybrid_search_cancels_timed_out_retriever(monkeypatch):
+    """Test that the query of a retriever over budget is cancelled"""
+    session = FakeSession()
+
+    def slow_vector(session, query, limit):
+        time.sleep(0.2)
+        return [_rec("slow")]
+
+    monkeypatch.setattr(search, "USE_CORTEX", True)
+    monkeypatch.setattr(search, "lexical_search", lambda s, q, n: [_rec("fast")])
+    monkeypatch.setattr(search, "vector_search", slow_vector)
+
+    results, skipped = asyncio.run(
+        search.hybrid_search(FakePool(session), "DTM", limit=5, budget_seconds=0.05)
+    )
+
+    assert skipped == ["vector"]
+    assert session.cancelled == 1
+
+
+def test_degraded_hybrid_result_is_not_cached(monkeypatch):
+    """Test that a fusion missing a retriever is returned but not cached"""
+    main = pytest.importorskip("api.main")
+    cache_module = pytest.importorskip("src.cache")
+    breaker = pytest.importorskip("api.breaker")
+
+    async def degraded(pool, query, limit):
+        return [_rec("fast")], ["vector"]
+
+    cache = cache_module.ResultCache()
+    monkeypatch.setattr(main, "result_cache", cache)
+    monkeypatch.setattr(main, "data_version", FakeVersion())
+    monkeypatch.setattr(main, "search_flight", main.SingleFlight())
+    monkeypatch.setattr(main, "search_breaker", breaker.CircuitBreaker())
+    monkeypatch.setattr(main, "hybrid_search", degraded)
+
+    results, stale = asyncio.run(
+        main.get_similar_recommendations(
+            FakePool(), "DTM", 5, mode=main.SearchMode.HYBRID
+        )
+    )
+
+    assert [rec["article_id"] for rec in results] == ["fast"]
+    assert not stale
+    assert cache.stats()["size"] == 0
+    assert cache.get_stale(("similar", "hybrid", "DTM", 5)) is None
+
+
+def test_hybrid_search_raises_when_all_retrievers_fail(monkeypatch):
+    """Test that an error is raised when no retriever succeeds"""
+
+    def broken(session, query, limit):
+        raise RuntimeError("warehouse suspended")
+
+    monkeypatch.setattr(search, "USE_CORTEX", False)
+    monkeypatch.setattr(search, "lexical_search", broken)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(search.hybrid_search(FakePool(), "DTM", limit=5))
+
+
+def test_search_templates_bind_query_and_limit():
+    """Test that every search template takes exactly (query or vector, limit) binds"""
+    queries = pytest.importorskip("src.queries")
+    for template in (
+        queries.LIKE_SEARCH,
+        queries.TERM_SEARCH,
+        queries.VECTOR_SEARCH,
+        queries.UI_LIKE_SEARCH,
+        queries.UI_VECTOR_SEARCH,
+    ):
+        assert template.count("?") == 2
+    assert queries.RANDOM_POSTS.count("?") == 1
+    assert queries.RELATED_ARTICLES.count("?") == 2
+    assert queries.STUDENT_RECOMMENDATIONS.count("?") == 2
+    assert queries.STUDENT_RECOMMENDATIONS_BATCH.count("?") == 2
+    assert queries.UI_POST_STATS.count("?") == 0
+
+
+def test_vector_search_binds_cached_embedding(monkeypatch):
+    """Test that vector search binds the cached query vector, not the text"""
+    calls = []
+
+    class FakeEmbeddings:
+        def get(self, session, query):
+            return "[0.1,0.2]"
+
+    def fake_fetch(session, template, params):
+        calls.append((template, params))
+        return pytest.importorskip("pyarrow").table(
+            {"ARTICLE_ID": ["a"], "SCORE": [0.9], "TITLE": ["t"]}
+        )
+
+    monkeypatch.setattr(search, "query_embedding_cache", FakeEmbeddings())
+    monkeypatch.setattr(search, "fetch_arrow", fake_fetch)
+
+    assert search.vector_search(None, "DTM", 5)[0]["article_id"] == "a"
+    assert search.vector_search(None, " 　\n", 5) == []
+    assert calls == [(search.VECTOR_SEARCH, ["[0.1,0.2]", 5])]
+
+
+def test_lexical_search_binds_folded_query(monkeypatch):
+    """Test the folded LIKE binds and that a blank query does not search"""
+    calls = []
+
+    def fake_fetch(session, template, params):
+        calls.append((template, params))
+        return pytest.importorskip("pyarrow").table({"ARTICLE_ID": ["a"]})
+
+    monkeypatch.setattr(search, "USE_TERM_INDEX", False)
+    monkeypatch.setattr(search, "fetch_arrow", fake_fetch)
+    search.lexical_search(None, "ＤＴＭ まいく", 5)
+    assert search.lexical_search(None, " 　\n", 5) == []
+
+    assert calls == [(search.LIKE_SEARCH, ["dtm マイク", 5])]
+
+
+def test_blank_query_returns_nothing_in_every_mode(monkeypatch):
+    """Test that /recommend answers a whitespace-only query without searching"""
+    pytest.importorskip("httpx")
+    main = pytest.importorskip("api.main")
+    from fastapi.testclient import TestClient
+
+    async def no_search(*args):
+        raise AssertionError("blank query was searched")
+
+    monkeypatch.setattr(main, "session_pool", FakePool())
+    monkeypatch.setattr(main, "get_similar_recommendations", no_search)
+    client = TestClient(main.app)
+
+    for mode in ("auto", "lexical", "vector", "hybrid"):
+        response = client.get(
+            "/recommend", params={"student_id": "s1", "query": "  ", "mode": mode}
+        )
+        assert response.status_code == 200
+        assert response.json()["recommendations"] == []
@@ -0,0 +1,50 @@
+"""
+Test the fast response serialization path
+"""
+
+from datetime import datetime
+
+import pytest
+
+serialization = pytest.importorskip("api.serialization")
+models = pytest.importorskip("api.models")
+
+
+def test_payload_matches_response_model():
+    """Test that the orjson body parses as a RecommendationResponse"""
+    recs = [
+        {"article_id": "a", "score": 0.9, "title": "t", "summary": None, "url": None},
+        {"article_id": "b", "score": 0.1, "extra": "dropped"},
+    ]
+    body = serialization.dumps(
+        serialization.recommendation_payload("s1", recs, datetime(2024, 6, 1, 10))
+    )
+
+    response = models.RecommendationResponse.model_validate_json(body)
+
+    assert response.total_count == 2
+    assert response.recommendations[1].title is None
+    assert response.generated_at == datetime(2024, 6, 1, 10)
+    assert b"extra" not in body
+
+
+def test_records_from_arrow_handles_snowflake_columns():
+    """Test upper-case column names and NUMBER (decimal) scores from Arrow"""
+    pa = pytest.importorskip("pyarrow")
+    from decimal import Decimal
+
+    table = pa.table(
+        {
+            "ARTICLE_ID": ["a"],
+            "SCORE": pa.array([Decimal("0.70")], type=pa.decimal128(3, 2)),
+            "TITLE": ["t"],
+            "SUMMARY": pa.array([None], type=pa.string()),
+            "URL": ["u"],
+        }
+    )
+
+    [record] = serialization.records_from_arrow(table)
+
+    assert record["score"] == pytest.approx(0.7)
+    assert type(record["score"]) is float
+    assert (record["article_id"], record["summary"]) == ("a", None)
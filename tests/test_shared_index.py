@@ -0,0 +1,108 @@
+"""
+Test the shared-memory generations of the local replica
+"""
+
+import os
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+np = pytest.importorskip("numpy")
+shared_index = pytest.importorskip("src.shared_index")
+replica_module = pytest.importorskip("src.replica")
+
+from tests.conftest import ReplicaSession, post_row  # noqa: E402
+
+
+def _corpus(*texts):
+    text = b"\x00".join(t.encode() for t in texts)
+    starts = np.array([0, len(texts[0].encode()) + 1], dtype=np.int64)[: len(texts)]
+    return text, starts
+
+
+def test_publish_and_attach_round_trip(tmp_path):
+    """Test that a published generation maps back to the same table and corpus"""
+    directory = str(tmp_path)
+    table = pa.table({"article_id": ["a", "b"], "title": ["dtm", "mix"]})
+
+    generation = shared_index.publish(
+        directory, [("seg-000001", table, {"title": _corpus("dtm", "mix")})]
+    )
+    attached_generation, segments = shared_index.attach(directory, ("title",))
+
+    assert generation == attached_generation == "gen-000001"
+    [(name, attached, corpora)] = segments
+    assert name == "seg-000001"
+    assert attached.equals(table)
+    text, starts = corpora["title"]
+    assert bytes(text) == b"dtm\x00mix"
+    assert starts.tolist() == [0, 4]
+
+
+def test_publish_prunes_old_generations(tmp_path):
+    """Test that generations advance and only the newest ones are kept"""
+    directory = str(tmp_path)
+    table = pa.table({"title": ["dtm"]})
+
+    for _ in range(4):
+        generation = shared_index.publish(
+            directory, [("seg-000001", table, {"title": _corpus("dtm")})]
+        )
+
+    assert generation == "gen-000004"
+    assert shared_index.current_generation(directory) == generation
+    assert sorted(
+        name for name in os.listdir(directory) if name.startswith("gen-")
+    ) == [
+        "gen-000003",
+        "gen-000004",
+    ]
+
+
+def test_publish_links_unchanged_segments(tmp_path):
+    """Test that segments already published are hard-linked, not rewritten"""
+    directory = str(tmp_path)
+    base = ("seg-000001", pa.table({"title": ["dtm"]}), {"title": _corpus("dtm")})
+    delta = ("seg-000002", pa.table({"title": ["mix"]}), {"title": _corpus("mix")})
+
+    first = shared_index.publish(directory, [base])
+    second = shared_index.publish(directory, [base, delta])
+
+    def inode(generation):
+        path = os.path.join(directory, generation, "seg-000001", "posts.arrow")
+        return os.stat(path).st_ino
+
+    assert inode(first) == inode(second)
+    _, segments = shared_index.attach(directory, ("title",))
+    assert [name for name, _, _ in segments] == ["seg-000001", "seg-000002"]
+
+
+def test_follower_attaches_publisher_sync(tmp_path):
+    """Test that only one replica publishes and the other follows its generations"""
+    shared_dir = str(tmp_path / "shm")
+    publisher = replica_module.LocalReplica(
+        path=str(tmp_path / "a.parquet"), shared_dir=shared_dir
+    )
+    follower = replica_module.LocalReplica(
+        path=str(tmp_path / "b.parquet"), shared_dir=shared_dir
+    )
+    assert publisher.claim_publisher()
+    if shared_index.fcntl is not None:
+        # flockはファイルを開いたものごとにかかるため、同じプロセスでも取れない
+        assert not follower.claim_publisher()
+
+    session = ReplicaSession([post_row("a", "DTM入門"), post_row("b", "ミックス")])
+    publisher.sync(session)
+    assert follower.follow()
+    assert follower.generation == publisher.generation
+    assert follower.search("dtm", 10).to_pydict()["article_id"] == ["a"]
+
+    # 変更がなければ世代は進まない
+    publisher.sync(session)
+    assert not follower.follow()
+
+    session.posts.append(post_row("c", "DTMのコード進行", updated=3))
+    publisher.sync(session)
+    assert follower.follow()
+    assert follower.stats() == publisher.stats()
+    assert sorted(follower.search("dtm", 10).to_pydict()["article_id"]) == ["a", "c"]
@@ -0,0 +1,70 @@
+"""
+Test single-flight coalescing of identical concurrent calls
+"""
+
+import asyncio
+
+import pytest
+
+singleflight = pytest.importorskip("api.singleflight")
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    """Test that 50 concurrent calls with one key run the function once"""
+    flight = singleflight.SingleFlight()
+    runs = []
+
+    async def search():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return ["a", "b"]
+
+    async def main():
+        return await asyncio.gather(*(flight.do("DTM", search) for _ in range(50)))
+
+    results = asyncio.run(main())
+
+    assert len(runs) == 1
+    assert all(result == ["a", "b"] for result in results)
+    assert flight.stats() == {"calls": 50, "coalesced": 49, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_run_separately():
+    """Test that only in-flight calls with the same key are coalesced"""
+    flight = singleflight.SingleFlight()
+    runs = []
+
+    async def search(key):
+        runs.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        await asyncio.gather(
+            flight.do("a", lambda: search("a")), flight.do("b", lambda: search("b"))
+        )
+        await flight.do("a", lambda: search("a"))
+
+    asyncio.run(main())
+
+    assert runs == ["a", "b", "a"]
+    assert flight.coalesced == 0
+
+
+def test_errors_reach_every_waiter():
+    """Test that a failing computation raises in all coalesced callers"""
+    flight = singleflight.SingleFlight()
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("warehouse suspended")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("k", broken) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()["in_flight"] == 0
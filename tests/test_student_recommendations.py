@@ -0,0 +1,76 @@
+"""
+Test the per-student recommendation scoring
+"""
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+student_recs = pytest.importorskip("src.student_recommendations")
+
+NOW = datetime(2024, 6, 1)
+
+
+def _interactions(rows):
+    return pd.DataFrame(
+        rows, columns=["student_id", "article_id", "event_type", "occurred_at"]
+    )
+
+
+def _neighbours(rows):
+    return pd.DataFrame(rows, columns=["article_id", "related_id", "score"])
+
+
+def test_score_students_ranks_neighbours_of_history():
+    """Test that neighbours of stronger interactions rank higher"""
+    interactions = _interactions(
+        [
+            ("s1", "a", "bookmark", NOW),
+            ("s1", "b", "view", NOW),
+        ]
+    )
+    neighbours = _neighbours([("a", "x", 0.5), ("b", "y", 0.9), ("a", "b", 0.8)])
+
+    frame = student_recs.score_students(interactions, neighbours, now=NOW)
+
+    assert frame["ARTICLE_ID"].tolist() == ["x", "y"]  # "b" is already seen
+    assert frame["RANK"].tolist() == [1, 2]
+    assert frame["SCORE"].iloc[0] == pytest.approx(1.0)
+    assert 0.0 < frame["SCORE"].iloc[1] < 1.0
+
+
+def test_score_students_decays_old_interactions():
+    """Test that recent history outweighs an old interaction of the same type"""
+    interactions = _interactions(
+        [
+            ("s1", "old", "view", datetime(2023, 6, 1)),
+            ("s1", "new", "view", NOW),
+        ]
+    )
+    neighbours = _neighbours([("old", "x", 0.9), ("new", "y", 0.9)])
+
+    frame = student_recs.score_students(interactions, neighbours, now=NOW)
+
+    assert frame["ARTICLE_ID"].tolist() == ["y", "x"]
+
+
+def test_score_students_keeps_top_n_per_student():
+    """Test per-student truncation and that students are ranked independently"""
+    interactions = _interactions([("s1", "a", "view", NOW), ("s2", "b", "view", NOW)])
+    neighbours = _neighbours(
+        [("a", f"x{i}", 0.9 - i / 10) for i in range(5)] + [("b", "y", 0.3)]
+    )
+
+    frame = student_recs.score_students(interactions, neighbours, top_n=2, now=NOW)
+
+    assert frame.groupby("STUDENT_ID").size().to_dict() == {"s1": 2, "s2": 1}
+    assert frame[frame["STUDENT_ID"] == "s2"]["SCORE"].iloc[0] == pytest.approx(1.0)
+
+
+def test_score_students_without_history_is_empty():
+    """Test that cold-start input produces no rows"""
+    frame = student_recs.score_students(
+        _interactions([]), _neighbours([("a", "b", 0.5)]), now=NOW
+    )
+    assert frame.empty